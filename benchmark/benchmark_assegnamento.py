@@ -0,0 +1,55 @@
+"""
+Benchmark dell'assegnamento ottimale su molte coppie di squadre: confronta il ciclo
+su SolverScontro.assegnamento_ottimale (SCIP e algoritmo ungherese) con il batch
+che valuta in blocco tutte le permutazioni.
+
+Le matrici sono casuali ma con i valori dei punteggi reali (multipli di 0.25 in [-4, 4]),
+quindi con molti pareggi; il benchmark non richiede il KG.
+
+Esempio: python -m benchmark.benchmark_assegnamento --matrici 5000 --matrici-scip 200
+"""
+import argparse
+import time
+
+import numpy as np
+
+from csp.problemi.battaglia_pokemon.solver_scontro import SolverScontro
+
+
+def _misura(etichetta: str, k: int, funzione) -> np.ndarray:
+    inizio = time.perf_counter()
+    punteggi = funzione()
+    durata = time.perf_counter() - inizio
+    print(f"{etichetta:<28} {durata:8.3f}s  {k / durata:10.0f} matrici/s  ({durata / k * 1e6:8.1f} us/matrice)")
+    return punteggi
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dell'assegnamento ottimale in batch")
+    parser.add_argument("--matrici", type=int, default=5000)
+    parser.add_argument("--dimensione", type=int, default=6, help="Pokémon per squadra")
+    parser.add_argument("--matrici-scip", type=int, default=200,
+                        help="matrici risolte con SCIP (il più lento: ne basta un campione)")
+    parser.add_argument("--seme", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seme)
+    matrici = rng.integers(-16, 17, size=(args.matrici, args.dimensione, args.dimensione)) / 4.0
+    campione = matrici[:args.matrici_scip]
+    print(f"{args.matrici} matrici {args.dimensione}x{args.dimensione}, SCIP su {len(campione)}")
+
+    punteggi_scip = _misura("ciclo SCIP", len(campione), lambda: np.array(
+        [SolverScontro.assegnamento_ottimale(matrice.tolist())[1] for matrice in campione]))
+    punteggi_ungherese = _misura("ciclo ungherese", len(matrici), lambda: np.array(
+        [SolverScontro.assegnamento_ottimale(matrice, metodo="ungherese")[1] for matrice in matrici]))
+    SolverScontro.assegnamento_ottimale_batch(matrici[:1])  # prepara la tabella delle permutazioni
+    punteggi_batch = _misura("batch permutazioni", len(matrici),
+                             lambda: SolverScontro.assegnamento_ottimale_batch(matrici)[1])
+
+    # Gli assegnamenti possono differire a parità di punteggio, i punteggi ottimi no
+    assert np.allclose(punteggi_scip, punteggi_batch[:len(campione)]), "SCIP e batch non coincidono"
+    assert np.allclose(punteggi_ungherese, punteggi_batch), "Ungherese e batch non coincidono"
+
+
+if __name__ == "__main__":
+    main()
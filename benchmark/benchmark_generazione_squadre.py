@@ -0,0 +1,79 @@
+"""
+Benchmark della generazione di molte squadre diverse: confronta le chiamate ripetute
+a genera_squadra_personale (diversità ottenuta escludendo la squadra precedente)
+con genera_squadre_diverse, che produce tutte le squadre da un unico modello CP-SAT
+con tagli di distanza minima.
+
+Per default usa un Pokédex sintetico (nessun KG richiesto); con --kg usa la mappa del KG.
+
+Esempio: python -m benchmark.benchmark_generazione_squadre --squadre 300 --distanze 1 2 3
+"""
+import argparse
+import random
+import time
+
+from csp.problemi.generazione_squadra import GeneratoreSquadre
+from entita.tipo_pokemon import TipoPokemonHelper, URI_TIPI
+
+
+def pokedex_sintetico(numero: int, probabilita_doppio_tipo: float, seme: int) -> dict[str, list[str]]:
+    generatore = random.Random(seme)
+    mappa = {}
+    for i in range(numero):
+        tipi = [generatore.choice(URI_TIPI)]
+        if generatore.random() < probabilita_doppio_tipo:
+            secondario = generatore.choice(URI_TIPI)
+            if secondario != tipi[0]:
+                tipi.append(secondario)
+        mappa[f"https://pokemonkg.org/instance/pokemon/sintetico-{i}"] = tipi
+    return mappa
+
+
+def _riporta(etichetta: str, squadre: list[list[str]], durata: float) -> None:
+    distinte = len({tuple(squadra) for squadra in squadre})
+    print(f"{etichetta:<34} {len(squadre):6d} squadre ({distinte} distinte) {durata:8.2f}s  "
+          f"{len(squadre) / durata:8.1f} squadre/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark della generazione di squadre diverse")
+    parser.add_argument("--squadre", type=int, default=300)
+    parser.add_argument("--distanze", type=int, nargs="+", default=[1, 2, 3],
+                        help="distanze di Hamming minime tra le squadre generate")
+    parser.add_argument("--pokemon", type=int, default=1000, help="specie del Pokédex sintetico")
+    parser.add_argument("--worker", type=int, default=1, help="thread di ricerca CP-SAT")
+    parser.add_argument("--seme", type=int, default=0)
+    parser.add_argument("--kg", action="store_true", help="usa la mappa Pokémon -> tipi del KG")
+    args = parser.parse_args()
+
+    if not args.kg:
+        TipoPokemonHelper.imposta_mappa_pokemon_tipi(pokedex_sintetico(args.pokemon, 0.55, args.seme))
+    random.seed(args.seme)
+    tipi_strategici = TipoPokemonHelper.genera_tipi_strategici([1, 2, 0, 1, 3, 4])
+    print(f"{len(TipoPokemonHelper.ottieni_mappa_pokemon_tipi())} Pokémon, tipi strategici: "
+          + ", ".join(tipo.rsplit(":", 1)[-1] for tipo in tipi_strategici))
+
+    # Riferimento: una chiamata per squadra, escludendo i Pokémon della squadra precedente
+    squadre, precedente = [], set()
+    inizio = time.perf_counter()
+    for _ in range(args.squadre):
+        squadra = GeneratoreSquadre.genera_squadra_personale(tipi_strategici, precedente, backend="cpsat",
+                                                             num_worker=args.worker)
+        if not squadra:
+            break
+        squadre.append(squadra)
+        precedente = set(squadra)
+    _riporta("chiamate ripetute (cpsat)", squadre, time.perf_counter() - inizio)
+
+    for distanza in args.distanze:
+        inizio = time.perf_counter()
+        squadre = list(GeneratoreSquadre.genera_squadre_diverse(tipi_strategici, args.squadre, distanza_minima=distanza,
+                                                                num_worker=args.worker))
+        durata = time.perf_counter() - inizio
+        _riporta(f"genera_squadre_diverse (distanza {distanza})", squadre, durata)
+        assert all(sum(a != b for a, b in zip(prima, seconda)) >= distanza
+                   for i, prima in enumerate(squadre) for seconda in squadre[i + 1:]), "Distanza minima violata"
+
+
+if __name__ == "__main__":
+    main()
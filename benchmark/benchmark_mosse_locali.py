@@ -0,0 +1,136 @@
+"""
+Benchmark della generazione locale delle quadruple di mosse: confronta i nodi esplorati e il tempo
+di python-constraint (vincoli come funzioni opache, verificati solo a quadrupla completa) con
+RisolutoreMossePropagazione (vincoli di somma e di categoria propagati durante la ricerca).
+
+Per ogni tipo primario (e con --doppi per ogni coppia di tipi) genera NUM_SET_MOSSE quadruple
+di seguito, escludendo le mosse già usate come in main_csp: le ultime quadruple hanno domini
+ridotti e sono spesso impossibili, il caso in cui il backtracking senza propagazione esplora di più.
+
+Per default usa un catalogo di mosse sintetico; con --kg usa il catalogo del KG. I tipi compatibili
+dei domini vengono comunque dal KG (es. POKEMONKG_BACKEND=locale). Come main_csp richiede csp nel path.
+
+Esempio: POKEMONKG_BACKEND=locale PYTHONPATH=csp python -m benchmark.benchmark_mosse_locali --doppi
+"""
+import argparse
+import random
+import time
+
+import constraint
+
+from config.costanti_globali import NUM_SET_MOSSE, URI_MOSSA_CAT_FISICO, URI_MOSSA_CAT_SPECIALE, \
+    URI_MOSSA_CAT_STATO
+from problemi.assegnazione_mosse_locale import AssegnatoreMosseLocale, RisolutoreMossePropagazione
+from entita.mossa import CatalogoMosse, RigaMossaKG
+from entita.tipo_pokemon import URI_TIPI, TipoPokemon
+
+
+def catalogo_sintetico(seme: int) -> CatalogoMosse:
+    generatore = random.Random(seme)
+    righe = []
+    for tipo in URI_TIPI:
+        # Tipi con poche mosse accanto a tipi con domini ampi, come nel KG
+        for i in range(generatore.choice([6, 15, 40, 90])):
+            categoria = generatore.choice([URI_MOSSA_CAT_FISICO, URI_MOSSA_CAT_SPECIALE, URI_MOSSA_CAT_STATO])
+            potenza = 0 if categoria == URI_MOSSA_CAT_STATO else generatore.randint(20, 150)
+            righe.append(RigaMossaKG(f"https://pokemonkg.org/instance/move/sintetica-{tipo.rsplit(':', 1)[-1]}-{i}",
+                                     potenza, generatore.choice([0, 50, 70, 85, 90, 100]),
+                                     generatore.choice([1, 5, 10, 15, 20, 35]), tipo, categoria))
+    return CatalogoMosse(righe)
+
+
+class _ContatoreNodi:
+    """
+    Nodi esplorati da python-constraint: le assegnazioni (AllDifferentConstraint è verificato a ognuna)
+    più le quadruple complete provate dal forward checking sull'ultimo slot (_vincolo_categoria, il primo
+    vincolo a funzione, le vede tutte). Sono gli stessi nodi contati da RisolutoreMossePropagazione.
+    """
+
+    def __init__(self):
+        self.nodi = 0
+        self._all_different = constraint.AllDifferentConstraint.__call__
+        self._vincolo_categoria = AssegnatoreMosseLocale.__dict__["_vincolo_categoria"]
+
+    def __enter__(self) -> "_ContatoreNodi":
+        all_different, vincolo_categoria = self._all_different, self._vincolo_categoria.__func__
+
+        def conta_assegnazione(vincolo, *args, **kwargs):
+            self.nodi += 1
+            return all_different(vincolo, *args, **kwargs)
+
+        def conta_quadrupla(cls, *mosse):
+            self.nodi += 1
+            return vincolo_categoria(cls, *mosse)
+
+        constraint.AllDifferentConstraint.__call__ = conta_assegnazione
+        AssegnatoreMosseLocale._vincolo_categoria = classmethod(conta_quadrupla)
+        return self
+
+    def __exit__(self, *_) -> None:
+        constraint.AllDifferentConstraint.__call__ = self._all_different
+        AssegnatoreMosseLocale._vincolo_categoria = self._vincolo_categoria
+
+
+def _genera(tipo1: str, tipo2: str | None, backend: str, numero: int) -> tuple[int, int, float]:
+    """Genera `numero` quadruple di seguito; restituisce (nodi, quadruple trovate, secondi)."""
+    nodi, trovate, durata = 0, 0, 0.0
+    usate = set()
+    for _ in range(numero):
+        domini = AssegnatoreMosseLocale._costruisci_domini(usate, tipo1, tipo2)
+        if any(len(dominio) == 0 for dominio in domini):
+            break
+        inizio = time.perf_counter()
+        if backend == "constraint":
+            with _ContatoreNodi() as contatore:
+                mosse = AssegnatoreMosseLocale._risolvi_constraint(domini)
+            nodi += contatore.nodi
+        else:
+            risolutore = RisolutoreMossePropagazione(domini, AssegnatoreMosseLocale.VINCOLI_SOMMA,
+                                                     AssegnatoreMosseLocale.CATEGORIE_RICHIESTE)
+            mosse = risolutore.risolvi()
+            nodi += risolutore.nodi_esplorati
+        durata += time.perf_counter() - inizio
+        if mosse is None:
+            # Come in genera_mosse: il fallback prende la prima mossa di ogni dominio
+            mosse = [dominio[0] for dominio in domini]
+        else:
+            trovate += 1
+        usate.update(mosse)
+    return nodi, trovate, durata
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark della propagazione dei vincoli sulle quadruple di mosse")
+    parser.add_argument("--doppi", action="store_true", help="anche tutte le coppie di tipi, oltre ai tipi singoli")
+    parser.add_argument("--set", type=int, default=NUM_SET_MOSSE, help="quadruple generate per Pokémon")
+    parser.add_argument("--kg", action="store_true", help="usa il catalogo mosse del KG invece di quello sintetico")
+    parser.add_argument("--seme", type=int, default=0)
+    args = parser.parse_args()
+
+    if not args.kg:
+        CatalogoMosse.imposta(catalogo_sintetico(args.seme))
+
+    coppie = [(tipo1, None) for tipo1 in URI_TIPI]
+    if args.doppi:
+        coppie += [(tipo1, tipo2) for tipo1 in URI_TIPI for tipo2 in URI_TIPI if tipo2 != tipo1]
+
+    print(f"{'tipi':<22} {'nodi constraint':>16} {'nodi propagazione':>18} {'trovate':>8} "
+          f"{'s constraint':>13} {'s propagazione':>15}")
+    totali = {"constraint": [0, 0, 0.0], "propagazione": [0, 0, 0.0]}
+    for tipo1, tipo2 in coppie:
+        risultati = {backend: _genera(tipo1, tipo2, backend, args.set) for backend in totali}
+        for backend, valori in risultati.items():
+            totali[backend] = [totale + valore for totale, valore in zip(totali[backend], valori)]
+        etichetta = "/".join(TipoPokemon(tipo).name for tipo in (tipo1, tipo2) if tipo)
+        (nodi_c, trovate_c, durata_c), (nodi_p, trovate_p, durata_p) = risultati.values()
+        print(f"{etichetta:<22} {nodi_c:16d} {nodi_p:18d} {trovate_c:>3d}/{trovate_p:<4d} "
+              f"{durata_c:13.4f} {durata_p:15.4f}")
+
+    (nodi_c, trovate_c, durata_c), (nodi_p, trovate_p, durata_p) = totali.values()
+    print(f"{'totale':<22} {nodi_c:16d} {nodi_p:18d} {trovate_c:>3d}/{trovate_p:<4d} "
+          f"{durata_c:13.4f} {durata_p:15.4f}")
+    print(f"nodi: {nodi_c / max(nodi_p, 1):.1f}x in meno, tempo: {durata_c / max(durata_p, 1e-9):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark offline del recupero dati da PokeAPI contro il server finto locale:
+confronta le richieste sequenziali (una connessione, nessun parallelismo) con il client
+parallelo e rate limited, e misura una seconda esecuzione servita dalla cache su disco.
+
+Esempio: python -m benchmark.benchmark_pokeapi --mosse 300 --latenza 0.05
+"""
+import argparse
+import tempfile
+import time
+
+from benchmark.server_pokeapi_finto import ServerPokeApiFinto
+from utils.cache_disco import CacheDisco
+from utils.client_pokeapi import ClientPokeApi
+
+
+def _misura(etichetta: str, client: ClientPokeApi, nomi: list[str]) -> dict:
+    inizio = time.perf_counter()
+    risultati = client.ottieni_dati_mosse(nomi)
+    durata = time.perf_counter() - inizio
+    trovate = sum(1 for dati in risultati.values() if dati is not None)
+    print(f"{etichetta:<28} {durata:8.2f}s  {len(nomi) / durata:8.1f} mosse/s  trovate: {trovate}/{len(nomi)}")
+    return risultati
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del client PokeAPI sul server finto")
+    parser.add_argument("--mosse", type=int, default=200)
+    parser.add_argument("--latenza", type=float, default=0.05)
+    parser.add_argument("--probabilita-errore", type=float, default=0.05)
+    parser.add_argument("--parallele", type=int, default=8)
+    parser.add_argument("--richieste-al-secondo", type=float, default=100.0)
+    args = parser.parse_args()
+
+    nomi = [f"mossa-{i}" for i in range(args.mosse)] + ["inesistente-1", "inesistente-2"]
+    # Backoff ridotto: il server finto risponde subito, interessa misurare il throughput
+    parametri = dict(richieste_al_secondo=args.richieste_al_secondo, raffica=args.parallele,
+                     backoff_iniziale=0.05, backoff_massimo=1.0)
+
+    with ServerPokeApiFinto(latenza=args.latenza, probabilita_errore=args.probabilita_errore) as server, \
+            tempfile.TemporaryDirectory() as cartella_cache:
+        print(f"Server finto: {server.url_base} (latenza {args.latenza}s, "
+              f"errori 503 {args.probabilita_errore:.0%})")
+        with ClientPokeApi(server.url_base, max_richieste_parallele=1, **parametri) as client:
+            sequenziale = _misura("sequenziale", client, nomi)
+        cache = CacheDisco(cartella_cache)
+        with ClientPokeApi(server.url_base, max_richieste_parallele=args.parallele, cache=cache,
+                           **parametri) as client:
+            parallelo = _misura(f"parallelo ({args.parallele} thread)", client, nomi)
+            richieste_prima = server.richieste
+            da_cache = _misura("seconda esecuzione (cache)", client, nomi)
+        print(f"Richieste al server nella seconda esecuzione: {server.richieste - richieste_prima}")
+        print(f"Risposte 503 simulate: {server.risposte_503}")
+        assert sequenziale == parallelo == da_cache, "I risultati non coincidono tra le modalità"
+
+
+if __name__ == "__main__":
+    main()
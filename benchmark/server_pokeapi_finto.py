@@ -0,0 +1,143 @@
+"""
+Server HTTP locale che imita l'endpoint /api/v2/move/<nome> di PokeAPI,
+per misurare il client senza rete e senza gravare sul servizio reale.
+
+- i dati di ogni mossa sono deterministici (derivati dall'hash del nome)
+- i nomi che iniziano con "inesistente" rispondono 404
+- `latenza` simula il tempo di risposta del server
+- `probabilita_errore` fa rispondere 503 a una frazione delle richieste
+- oltre `limite_al_secondo` richieste al secondo il server risponde 429 con Retry-After
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_RE_PERCORSO_MOSSA = re.compile(r"^/api/v2/move/([^/?#]+)/?$")
+
+
+def dati_mossa_finta(nome_mossa: str) -> dict:
+    h = hashlib.sha256(nome_mossa.encode("utf-8")).digest()
+    return {
+        "name": nome_mossa,
+        # Circa una mossa su cinque è di stato (senza potenza)
+        "power": None if h[0] % 5 == 0 else 10 + h[1] % 141,
+        "accuracy": None if h[2] % 7 == 0 else 50 + h[3] % 51,
+        "pp": 5 * (1 + h[4] % 8),
+    }
+
+
+class ServerPokeApiFinto:
+    def __init__(self, porta: int = 0, latenza: float = 0.0, probabilita_errore: float = 0.0,
+                 limite_al_secondo: float | None = None, seme: int = 0):
+        self.latenza = latenza
+        self.probabilita_errore = probabilita_errore
+        self.limite_al_secondo = limite_al_secondo
+        self.richieste = 0
+        self.risposte_429 = 0
+        self.risposte_503 = 0
+        self._random = random.Random(seme)
+        self._lock = threading.Lock()
+        self._finestra: list[float] = []
+        self._server = ThreadingHTTPServer(("127.0.0.1", porta), self._crea_gestore())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url_base(self) -> str:
+        host, porta = self._server.server_address[:2]
+        return f"http://{host}:{porta}/api/v2/move/"
+
+    def avvia(self) -> "ServerPokeApiFinto":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="pokeapi-finto", daemon=True)
+        self._thread.start()
+        return self
+
+    def ferma(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "ServerPokeApiFinto":
+        return self.avvia()
+
+    def __exit__(self, *_) -> None:
+        self.ferma()
+
+    def _esito(self) -> int:
+        """Decide il codice della prossima risposta e aggiorna i contatori."""
+        with self._lock:
+            self.richieste += 1
+            if self.limite_al_secondo is not None:
+                adesso = time.monotonic()
+                self._finestra = [t for t in self._finestra if adesso - t < 1.0]
+                if len(self._finestra) >= self.limite_al_secondo:
+                    self.risposte_429 += 1
+                    return 429
+                self._finestra.append(adesso)
+            if self._random.random() < self.probabilita_errore:
+                self.risposte_503 += 1
+                return 503
+            return 200
+
+    def _crea_gestore(self) -> type[BaseHTTPRequestHandler]:
+        server_finto = self
+
+        class Gestore(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                m = _RE_PERCORSO_MOSSA.match(self.path)
+                if server_finto.latenza:
+                    time.sleep(server_finto.latenza)
+                esito = server_finto._esito()
+                if m is None or m.group(1).startswith("inesistente"):
+                    self._rispondi(404, {"detail": "Not found."})
+                elif esito == 429:
+                    self._rispondi(429, {"detail": "Too many requests."}, {"Retry-After": "1"})
+                elif esito == 503:
+                    self._rispondi(503, {"detail": "Service unavailable."})
+                else:
+                    self._rispondi(200, dati_mossa_finta(m.group(1)))
+
+            def _rispondi(self, codice: int, corpo: dict, header: dict | None = None):
+                dati = json.dumps(corpo).encode("utf-8")
+                self.send_response(codice)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(dati)))
+                for nome, valore in (header or {}).items():
+                    self.send_header(nome, valore)
+                self.end_headers()
+                self.wfile.write(dati)
+
+            def log_message(self, *_):
+                pass
+
+        return Gestore
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server PokeAPI finto per test e benchmark offline")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--latenza", type=float, default=0.05, help="secondi di attesa per risposta")
+    parser.add_argument("--probabilita-errore", type=float, default=0.0)
+    parser.add_argument("--limite-al-secondo", type=float, default=None)
+    args = parser.parse_args()
+
+    server = ServerPokeApiFinto(args.porta, args.latenza, args.probabilita_errore, args.limite_al_secondo)
+    with server:
+        print(f"Server PokeAPI finto in ascolto: POKEMONKG_POKEAPI_URL={server.url_base}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -9,11 +9,66 @@ QUERY_SPARQL_TUTTE_MOSSE = os.path.join(BASE_DIR, "query_sparql", "tutte_mosse.r
 QUERY_SPARQL_TABELLA_MOLTIPLICATORI_DANNI = os.path.join(BASE_DIR, "query_sparql", "tabella_moltiplicatori_danno.rq")
 QUERY_SPARQL_POKEMON_TIPI = os.path.join(BASE_DIR, "query_sparql", "pokemon_tipi.rq")
 
+# Query nominate che il client SPARQL può sottomettere in parallelo (es. all'avvio del CSP)
+QUERY_SPARQL_NOMINATE = {
+    "tutte_mosse": QUERY_SPARQL_TUTTE_MOSSE,
+    "pokemon_tipi": QUERY_SPARQL_POKEMON_TIPI,
+    "tabella_moltiplicatori_danno": QUERY_SPARQL_TABELLA_MOLTIPLICATORI_DANNI,
+}
+
+# Endpoint SPARQL di GraphDB e parametri di connessione (timeout in secondi)
+ENDPOINT_SPARQL = os.environ.get("POKEMONKG_ENDPOINT", "http://localhost:7200/repositories/pokemonKG")
+TIMEOUT_CONNESSIONE_SPARQL = 5.0
+TIMEOUT_LETTURA_SPARQL = 120.0
+MAX_QUERY_PARALLELE_SPARQL = 4
+# Endpoint di scrittura (RDF4J/GraphDB: /statements accetta sia SPARQL Update sia N-Quads in POST)
+ENDPOINT_AGGIORNAMENTO_SPARQL = os.environ.get("POKEMONKG_ENDPOINT_AGGIORNAMENTO", f"{ENDPOINT_SPARQL}/statements")
+DIMENSIONE_BATCH_CARICAMENTO = 50_000  # quadruple per richiesta
+MAX_BATCH_PARALLELI_CARICAMENTO = 4
+TIMEOUT_LETTURA_CARICAMENTO = 300.0
+
+# Backend del KG: "graphdb" (endpoint SPARQL) oppure "locale" (quad store in memoria costruito dai file del dataset)
+BACKEND_KG = os.environ.get("POKEMONKG_BACKEND", "graphdb")
+DIR_DATASET_KG_LOCALE = os.path.join(BASE_DIR, "risorse", "dataset_quadruple_pokemonKG")
+# File aggiuntivi per il KG locale (es. dump completo di PokemonKG), separati da os.pathsep
+FILE_KG_LOCALE_AGGIUNTIVI = [p for p in os.environ.get("POKEMONKG_FILE_LOCALI", "").split(os.pathsep) if p]
+
+# Cache su disco dei risultati SPARQL: la chiave include la versione del dataset caricato su GraphDB,
+# da incrementare (o impostare via ambiente) ogni volta che il KG viene modificato
+CACHE_DIR = os.path.join(OUTPUT_DIR, "cache")
+CACHE_SPARQL_DIR = os.path.join(CACHE_DIR, "sparql")
+VERSIONE_DATASET_KG = os.environ.get("POKEMONKG_VERSIONE_DATASET", "1")
+TTL_CACHE_SPARQL = 7 * 24 * 3600  # secondi
+DIMENSIONE_MAX_CACHE_SPARQL = 256 * 1024 * 1024  # byte
+# Con POKEMONKG_REFRESH_KG=1 (o --refresh-kg negli script) la cache viene ignorata in lettura e riscritta
+AGGIORNA_KG = os.environ.get("POKEMONKG_REFRESH_KG") == "1"
+
+# Client PokeAPI (l'URL base può puntare al server finto di benchmark/server_pokeapi_finto.py)
+POKEAPI_BASE_URL = os.environ.get("POKEMONKG_POKEAPI_URL", "https://pokeapi.co/api/v2/move/")
+RICHIESTE_AL_SECONDO_POKEAPI = 20.0
+RAFFICA_POKEAPI = 10  # richieste consentite in rapida successione prima di essere rallentati
+MAX_RICHIESTE_PARALLELE_POKEAPI = 8
+MAX_TENTATIVI_POKEAPI = 5
+BACKOFF_INIZIALE_POKEAPI = 0.5  # secondi, raddoppia a ogni tentativo
+BACKOFF_MASSIMO_POKEAPI = 30.0
+TIMEOUT_CONNESSIONE_POKEAPI = 5.0
+TIMEOUT_LETTURA_POKEAPI = 20.0
+CACHE_POKEAPI_DIR = os.path.join(CACHE_DIR, "pokeapi")
+TTL_CACHE_POKEAPI = 30 * 24 * 3600  # secondi
+# Pool precalcolati di quadruple di mosse per combinazione di tipi: la chiave include catalogo e pesi
+CACHE_POOL_SET_MOSSE_DIR = os.path.join(CACHE_DIR, "pool_set_mosse")
+
 # File di output
 OUTPUT_TTL = os.path.join(OUTPUT_DIR, "mosse_arricchite.nq")
 OUTPUT_MISSING = os.path.join(OUTPUT_DIR, "mosse_non_trovate.txt")
+# Journal dell'arricchimento mosse: una riga JSON per ogni mossa già elaborata, per riprendere dopo un'interruzione
+OUTPUT_JOURNAL_MOSSE = os.path.join(OUTPUT_DIR, "mosse_arricchite.journal.jsonl")
 OUTPUT_TABELLA_MOLTIPLICATORI = os.path.join(OUTPUT_DIR, "tabella_moltiplicatori.nq")
 FILE_CSV_TABELLA_MOLTIPLICATORI = os.path.join(BASE_DIR, "risorse", "tabella_moltiplicatori.csv")
+# Punteggi di scontro sull'intero Pokédex (matrice .npy mappabile in memoria) e counter precalcolati per specie
+OUTPUT_PUNTEGGI_POKEDEX = os.path.join(OUTPUT_DIR, "punteggi_pokedex.npy")
+OUTPUT_COUNTER_POKEDEX = os.path.join(OUTPUT_DIR, "counter_pokedex.npz")
+NUM_COUNTER_POKEDEX = 10  # counter conservati per ogni specie
 # Creazione cartella output
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
@@ -22,14 +77,44 @@ URI_MOSSA_CAT_FISICO = "https://pokemonkg.org/ontology#PhysicalMove"
 URI_MOSSA_CAT_SPECIALE = "https://pokemonkg.org/ontology#SpecialMove"
 
 NUM_SET_MOSSE : int = 4 # numero di quadruple di mosse da generare per ciascun pokemon
+# Generazione squadre con il backend CP-SAT: limite di tempo (secondi) e thread di ricerca
+LIMITE_TEMPO_CPSAT_SQUADRA = 10.0
+NUM_WORKER_CPSAT_SQUADRA = 8
+# Generazione in un solo modello CP-SAT delle NUM_SET_MOSSE quadruple di mosse di un Pokémon
+# (modello piccolo: un solo thread è più veloce dei worker paralleli)
+LIMITE_TEMPO_CPSAT_MOSSE = 5.0
+NUM_WORKER_CPSAT_MOSSE = 1
+DIMENSIONE_POOL_SET_MOSSE = 32  # quadruple conservate nel pool di ogni combinazione di tipi
 HP_MAX_AVVERSARIO = 600
 TURNI_PER_RIPOSO = 4
 CURE_TOTALI = 3
 
 class Metrica(Enum):
     DANNO_TOTALE = "http://pokemonkg.org/ontology#TotalDamage"
+    PP_TOTALI = "http://pokemonkg.org/ontology#TotalPP"
+    PRECISIONE_TOTALE = "http://pokemonkg.org/ontology#TotalAccuracy"
     CAT_SPECIALE = "http://pokemonkg.org/ontology#SpecialMove"
+    CAT_FISICO = "http://pokemonkg.org/ontology#PhysicalMove"
+    CAT_STATO = "http://pokemonkg.org/ontology#StatusMove"
+    # Numero di mosse di un tipo: il valore è l'URI del tipo (come in TipoPokemon)
+    TIPO_NORMAL = "https://pokemonkg.org/ontology#PokéType:Normal"
     TIPO_FIRE = "https://pokemonkg.org/ontology#PokéType:Fire"
+    TIPO_WATER = "https://pokemonkg.org/ontology#PokéType:Water"
+    TIPO_ELECTRIC = "https://pokemonkg.org/ontology#PokéType:Electric"
+    TIPO_GRASS = "https://pokemonkg.org/ontology#PokéType:Grass"
+    TIPO_ICE = "https://pokemonkg.org/ontology#PokéType:Ice"
+    TIPO_FIGHTING = "https://pokemonkg.org/ontology#PokéType:Fighting"
+    TIPO_POISON = "https://pokemonkg.org/ontology#PokéType:Poison"
+    TIPO_GROUND = "https://pokemonkg.org/ontology#PokéType:Ground"
+    TIPO_FLYING = "https://pokemonkg.org/ontology#PokéType:Flying"
+    TIPO_PSYCHIC = "https://pokemonkg.org/ontology#PokéType:Psychic"
+    TIPO_BUG = "https://pokemonkg.org/ontology#PokéType:Bug"
+    TIPO_ROCK = "https://pokemonkg.org/ontology#PokéType:Rock"
+    TIPO_GHOST = "https://pokemonkg.org/ontology#PokéType:Ghost"
+    TIPO_DRAGON = "https://pokemonkg.org/ontology#PokéType:Dragon"
+    TIPO_DARK = "https://pokemonkg.org/ontology#PokéType:Dark"
+    TIPO_STEEL = "https://pokemonkg.org/ontology#PokéType:Steel"
+    TIPO_FAIRY = "https://pokemonkg.org/ontology#PokéType:Fairy"
 
 PESI_VALUTAZIONE = {
     Metrica.DANNO_TOTALE: 3,
@@ -0,0 +1,46 @@
+"""
+Precalcolo offline dei migliori counter per ogni specie del Pokédex.
+
+Scrive la matrice completa dei punteggi di scontro come .npy mappabile in memoria
+e i counter di ogni specie come .npz; a richiesta basta CounterPokedex.carica(...).counter(uri).
+"""
+import argparse
+import time
+
+import numpy as np
+from config.costanti_globali import OUTPUT_PUNTEGGI_POKEDEX, OUTPUT_COUNTER_POKEDEX, NUM_COUNTER_POKEDEX
+from problemi.battaglia_pokemon.counter_pokedex import CounterPokedex
+from utils.client_sparql import aggiungi_argomento_aggiorna_kg, configura_client_sparql
+from utils.registro_log import setup_logger
+
+logger = setup_logger()
+
+
+def _leggi_argomenti(argv: list[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Precalcola i migliori counter di ogni specie del Pokédex")
+    parser.add_argument("-k", type=int, default=NUM_COUNTER_POKEDEX, help="counter conservati per specie")
+    parser.add_argument("--matrice", default=OUTPUT_PUNTEGGI_POKEDEX,
+                        help="file .npy in cui salvare la matrice completa dei punteggi")
+    parser.add_argument("--senza-matrice", action="store_true",
+                        help="calcola la matrice in memoria senza salvarla su disco")
+    parser.add_argument("--output", default=OUTPUT_COUNTER_POKEDEX, help="file .npz dei counter")
+    parser.add_argument("--float64", action="store_true", help="punteggi in doppia precisione (default float32)")
+    aggiungi_argomento_aggiorna_kg(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None):
+    args = _leggi_argomenti(argv)
+    configura_client_sparql(args.aggiorna_kg)
+    inizio = time.perf_counter()
+    counter = CounterPokedex.calcola(k=args.k, dtype=np.float64 if args.float64 else np.float32,
+                                     percorso_matrice=None if args.senza_matrice else args.matrice)
+    counter.salva(args.output)
+    logger.info(f"Counter di {len(counter.pokemon)} specie salvati in {args.output} "
+                f"({time.perf_counter() - inizio:.2f}s)")
+    if not args.senza_matrice:
+        logger.info(f"Matrice dei punteggi salvata in {args.matrice}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,8 @@
+import argparse
 import itertools
 from pprint import pprint
 from config.costanti_globali import QUERY_SPARQL_TABELLA_MOLTIPLICATORI_DANNI, URI_MOSSA_CAT_SPECIALE, NUM_SET_MOSSE, \
     PESI_VALUTAZIONE, CURE_TOTALI, HP_MAX_AVVERSARIO, TURNI_PER_RIPOSO
-from entita.mossa import Mossa
 from entita.nodo_ricerca_locale import NodoMosseAssegnamentoTotale, NodoMosseAssegnamentoParziale
 from entita.set_mosse import SetMosse, ValutatoreSetMosse
 from entita.pokemon import Pokemon
@@ -11,9 +11,11 @@ from entita.tipo_pokemon import TipoPokemonHelper, tipi_strategici_avversario, t
 from problemi.assegnazione_mosse_globale import AssegnatoreMosseGlobale, RicercaLocale
 from problemi.battaglia_pokemon.problema_scontro import ValutatoreScontri
 from problemi.generazione_squadra import GeneratoreSquadre
-from problemi.assegnazione_mosse_locale import AssegnatoreMosseLocale
+from problemi.pool_set_mosse import PoolSetMosse
 from csp.problemi.battaglia_pokemon.solver_scontro import SolverScontro
+from precaricamento import precarica
 from ricerca.spazio_stati import RicercaSpazioStati
+from utils.client_sparql import aggiungi_argomento_aggiorna_kg, configura_client_sparql
 from utils.registro_log import setup_logger
 from visualizza_risultati import VisualizzatoreRisultati, RisultatiEsperimento
 from collections import defaultdict
@@ -21,7 +23,19 @@ logger = setup_logger(__name__)
 
 
 
-def main():
+def _leggi_argomenti(argv: list[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Generazione delle squadre, assegnazione delle mosse e scontri")
+    aggiungi_argomento_aggiorna_kg(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None):
+    args = _leggi_argomenti(argv)
+    configura_client_sparql(args.aggiorna_kg)
+    # Le query sul KG vengono sottomesse subito e in parallelo:
+    # l'avvio attende così solo la query più lenta invece della somma di tutte
+    precarica()
+
     # 1. Generazione squadre
     #in slot 0, voglio un pokemon con zeri tipi secondari (quindi solo primario)
     #in slot 5, metti come candidati cinque tipi secondari poi ci pensa il solver a scegliere
@@ -116,35 +130,24 @@ def main():
     # In ogni sottolista ci sono i SetMosse possibili (fino a NUM_SET_MOSSE)
     # L'ordine delle sottoliste rappresenta implicitamente l'ordine dei pokemon nella squadra
     set_mosse_per_pokemon: list[list[SetMosse]] = [[], [], [], [], [], []]
+    # Quadruple precalcolate per combinazione di tipi (vedi main_pool_set_mosse), calcolate alla prima richiesta
+    pool_set_mosse = PoolSetMosse(PESI_VALUTAZIONE)
 
     # Ciclo su ogni Pokémon secondo l'ordine prefissato della squadra
     for idx, uri_pokemon in enumerate(squadra1_ordinata_ottimale):
         tipi: list[str] = TipoPokemonHelper.ottieni_tipi_pokemon(uri_pokemon)
         tipo1 = tipi[0]  # primo tipo
         tipo2 = tipi[1] if len(tipi) > 1 else None  # secondo tipo se presente
-        # evita duplicati di mosse tra gli stessi set di mosse
-        # di un pokemon
-        mosse_assegnate_locali = set()
-
-        # Genera NUM_SET_MOSSE combinazioni di mosse per CIASCUN Pokémon
-        # Sostanzialmente stiamo generando attraverso il CSP locale delle quadruple di mosse
-        # La scelta di quale quadrupla verrà effettivamente scelta dipende dal CSP globale
-        for _ in range(NUM_SET_MOSSE):
-            try:
-                mosse: list[Mossa] = AssegnatoreMosseLocale.genera_mosse(
-                    mosse_assegnate_locali, tipo1=tipo1, tipo2=tipo2
-                )
-            except ValueError as e:
-                # Interrompiamo il ciclo se non è possibile generare un set valido
-                logger.warning(f"⚠️ Errore nella generazione delle mosse per {tipo1}, {tipo2}: {e}")
-                break
-
-            # Aggiunge la quadrupla di mosse alla lista del Pokémon
+
+        # Sceglie NUM_SET_MOSSE combinazioni di mosse per CIASCUN Pokémon
+        # Le quadruple vengono dal pool della sua combinazione di tipi, con mosse diverse tra le quadruple
+        # (nessun duplicato tra i set di mosse dello stesso Pokémon); se il pool non basta si completano
+        # con il CSP locale. La scelta di quale quadrupla verrà effettivamente scelta dipende dal CSP globale
+        try:
             # con idx riusciamo a mantenere l'ordine naturale
-            set_mosse_per_pokemon[idx].append(SetMosse(*mosse))
-            # Aggiorna il set globale per evitare duplicati tra le mosse dello
-            # STESS
-            mosse_assegnate_locali.update(mosse)
+            set_mosse_per_pokemon[idx] = pool_set_mosse.set_disgiunti(tipo1, tipo2, NUM_SET_MOSSE)
+        except ValueError as e:
+            logger.warning(f"⚠️ Errore nella generazione delle mosse per {tipo1}, {tipo2}: {e}")
 
     uri_set_mosse = []
     for lista_set in set_mosse_per_pokemon:
@@ -261,7 +264,7 @@ def main():
 
         print(f"\n--- ⚔️ Scontro {i + 1}: {pk_nostro.uri} vs {uri_pokemon_avversario} ---")
         # Preparazione dati
-        pk_nostro.set_mosse.normalizza_danni_attesi()
+        potenze = pk_nostro.set_mosse.normalizza_danni_attesi()
         pp_iniziali = pk_nostro.set_mosse.inizializza_pp_da_mosse()
         tipi_avversario = TipoPokemonHelper.ottieni_tipi_pokemon(uri_pokemon_avversario)
         moltiplicatori = pk_nostro.set_mosse.calcola_moltiplicatori_mosse(tipi_avversario)
@@ -274,6 +277,7 @@ def main():
         #print(f"- Tipi nostro: {pk_nostro.lista_tipi()}")
         print(f"- Tipi avversario: {tipi_avversario}")
         print(f"- Moltiplicatori calcolati tenendo conto tipi avversario: {moltiplicatori}")
+        print(f"- Potenze normalizzate: {potenze}")
         print(f"- PP di partenza  {pp_iniziali}\n")
 
         # Stato iniziale
@@ -283,7 +287,8 @@ def main():
             turni_rimanenti_per_riposo= TURNI_PER_RIPOSO,
             cure_totali= CURE_TOTALI,
             moltiplicatori=moltiplicatori,
-            set_mosse=pk_nostro.set_mosse
+            set_mosse=pk_nostro.set_mosse,
+            potenze=potenze
         )
 
         # Ricerca IDDFS
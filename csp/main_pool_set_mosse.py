@@ -0,0 +1,39 @@
+"""
+Precalcolo offline dei pool di quadruple di mosse per ogni combinazione di tipi.
+
+I pool sono salvati nella cache su disco (vedi PoolSetMosse): main_csp li legge invece di
+generare le quadruple di ogni Pokémon. Vanno ricalcolati solo se cambiano catalogo mosse o pesi,
+e in quel caso la chiave cambia da sola; --svuota elimina anche le voci precedenti.
+"""
+import argparse
+import time
+
+from config.costanti_globali import DIMENSIONE_POOL_SET_MOSSE
+from problemi.pool_set_mosse import PoolSetMosse
+from utils.client_sparql import aggiungi_argomento_aggiorna_kg, configura_client_sparql
+from utils.registro_log import setup_logger
+
+logger = setup_logger()
+
+
+def _leggi_argomenti(argv: list[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Precalcola i pool di quadruple di mosse per combinazione di tipi")
+    parser.add_argument("-k", type=int, default=DIMENSIONE_POOL_SET_MOSSE, help="quadruple conservate per pool")
+    parser.add_argument("--svuota", action="store_true", help="elimina i pool salvati prima di ricalcolarli")
+    aggiungi_argomento_aggiorna_kg(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None):
+    args = _leggi_argomenti(argv)
+    configura_client_sparql(args.aggiorna_kg)
+    pool_set_mosse = PoolSetMosse(dimensione=args.k)
+    if args.svuota:
+        pool_set_mosse.svuota()
+    inizio = time.perf_counter()
+    calcolati = pool_set_mosse.precalcola()
+    logger.info(f"Pool di quadruple calcolati: {calcolati} ({time.perf_counter() - inizio:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""
+Precaricamento esplicito dei dati del KG usati dal CSP.
+
+Importare i moduli del progetto non interroga più il KG: mappe e matrici vengono caricate
+alla prima richiesta. Chi vuole pagare il costo tutto all'avvio (un server, oppure main_csp
+prima di iniziare a misurare i tempi) chiama precarica(), che sottomette le query in parallelo
+e poi popola le cache condivise.
+"""
+from entita.mossa import CatalogoMosse
+from entita.tipo_pokemon import TipoPokemonHelper
+from problemi.battaglia_pokemon.problema_scontro import ValutatoreScontri
+from utils.client_sparql import ottieni_client_sparql
+from utils.registro_log import setup_logger
+
+logger = setup_logger()
+
+
+def precarica() -> None:
+    """
+    Carica mappa Pokémon -> tipi, mosse per tipo e matrice dei moltiplicatori.
+    Le query partono insieme, quindi l'attesa è quella della query più lenta e non la somma.
+    Chiamate successive (o concorrenti) non rieseguono nulla.
+    """
+    ottieni_client_sparql().precarica()
+    TipoPokemonHelper.ottieni_mappa_pokemon_tipi()
+    CatalogoMosse.ottieni()
+    ValutatoreScontri.ottieni_matrice_moltiplicatori()
+    logger.info("Dati del KG precaricati")
@@ -7,12 +7,9 @@ import time
 from collections import deque
 from copy import deepcopy
 from typing import Any, Tuple, Type, List
-from ortools.sat.python import cp_model
-from config.costanti_globali import URI_MOSSA_CAT_SPECIALE, PESI_VALUTAZIONE, Metrica
 from entita.nodo_ricerca_locale import NodoMosseAssegnamentoTotale, NodoRicercaLocale
-from entita.set_mosse import SetMosse
+from entita.set_mosse import SetMosse, ValutatoreSetMosse
 from visualizza_risultati import StatisticheRicerca
-from entita.tipo_pokemon import TipoPokemon
 from utils.registro_log import setup_logger
 
 logger = setup_logger(__name__)
@@ -20,8 +17,15 @@ logger = setup_logger(__name__)
 class AssegnatoreMosseGlobale:
 
     @classmethod
-    def or_tools_ottimizza_mosse_globali(cls, set_mosse_per_pokemon: list[list[SetMosse]]) -> tuple[
+    def or_tools_ottimizza_mosse_globali(cls, set_mosse_per_pokemon: list[list[SetMosse]],
+                                         valutatore: ValutatoreSetMosse | None = None) -> tuple[
         list[SetMosse], StatisticheRicerca]:
+        # OR-Tools (e pandas, che importa a sua volta) viene caricato solo quando si usa il solver
+        from ortools.sat.python import cp_model
+
+        if valutatore is None:
+            valutatore = ValutatoreSetMosse.predefinito()
+
         stat = StatisticheRicerca("OttimizzazioneGlobale")
         model = cp_model.CpModel()
         variables = []
@@ -32,19 +36,13 @@ class AssegnatoreMosseGlobale:
 
         objective_terms = []
         for i, sets in enumerate(set_mosse_per_pokemon):
-            for j, set_mosse in enumerate(sets):
+            # Punteggi di tutti i set del Pokémon in un solo prodotto matrice-vettore
+            punteggi = valutatore.valuta_lista(sets)
+            for j, punteggio in enumerate(punteggi):
                 indicator = model.NewBoolVar(f"pokemon_{i}_set_{j}")
                 model.Add(variables[i] == j).OnlyEnforceIf(indicator)
                 model.Add(variables[i] != j).OnlyEnforceIf(indicator.Not())
-
-                term1 = PESI_VALUTAZIONE[Metrica.CAT_SPECIALE] * set_mosse.mosse_per_categoria[
-                    URI_MOSSA_CAT_SPECIALE] * indicator
-                term2 = PESI_VALUTAZIONE[Metrica.DANNO_TOTALE] * set_mosse.danno_totale * indicator
-                term3 = (PESI_VALUTAZIONE[Metrica.TIPO_FIRE] *
-                         set_mosse.numero_mosse_di_tipo(TipoPokemon.FIRE.value)
-                         * indicator)
-
-                objective_terms.extend([term1, term2, term3])
+                objective_terms.append(punteggio * indicator)
 
         model.Maximize(sum(objective_terms))
         solver = cp_model.CpSolver()
@@ -1,7 +1,11 @@
-from typing import List, Optional
+import heapq
+from collections import defaultdict
+from typing import Callable, List, Optional
 from constraint import AllDifferentConstraint, Problem
-from config.costanti_globali import URI_MOSSA_CAT_SPECIALE, URI_MOSSA_CAT_FISICO
-from entita.mossa import Mossa
+from config.costanti_globali import URI_MOSSA_CAT_SPECIALE, URI_MOSSA_CAT_FISICO, NUM_SET_MOSSE, PESI_VALUTAZIONE, \
+    LIMITE_TEMPO_CPSAT_MOSSE, NUM_WORKER_CPSAT_MOSSE
+from entita.mossa import CatalogoMosse, Mossa
+from entita.set_mosse import SetMosse, ValutatoreSetMosse
 from entita.tipo_pokemon import TipoPokemon, TipoPokemonHelper
 from utils.registro_log import setup_logger
 
@@ -17,8 +21,166 @@ Slot 2: mosse di un tipo compatibile (scelta tra quelli compatibili con primario
 Slot 3: mosse di un altro tipo compatibile diverso dal precedente; se non ci sono, unione dei domini precedenti senza duplicati.
 """
 
+# Backend per la generazione di una quadrupla di mosse
+BACKEND_GENERAZIONE_MOSSE = ("propagazione", "constraint")
+
+
+class RisolutoreMossePropagazione:
+    """
+    Backtracking sui 4 slot che conosce la forma dei vincoli di una quadrupla, invece di
+    verificarli come funzioni opache solo a quadrupla completa:
+    - vincoli di somma (attributo, soglia): la somma parziale più il massimo di ogni slot libero
+      (tra le mosse non ancora usate) deve poter raggiungere la soglia
+    - vincoli di cardinalità sulle categorie: ogni categoria richiesta e non ancora presente deve
+      avere una mossa disponibile in uno slot libero, e gli slot liberi devono bastare per tutte
+
+    Un ramo che non può più soddisfare un vincolo viene tagliato appena si assegna la mossa che lo
+    rende impossibile. Gli slot sono scelti come in python-constraint (dominio libero più piccolo,
+    a parità lo slot con indice minore) e le mosse sono provate dall'ultima del dominio.
+    nodi_esplorati conta le assegnazioni tentate, come le chiamate ai vincoli di python-constraint.
+    """
+
+    def __init__(self, domini: list[list[Mossa]], vincoli_somma: tuple[tuple[str, int], ...],
+                 categorie_richieste: tuple[str, ...]):
+        self.domini = domini
+        self.vincoli_somma = vincoli_somma
+        self.categorie_richieste = categorie_richieste
+        self.nodi_esplorati = 0
+        # Per ogni vincolo di somma e slot: (valore, mossa) in ordine decrescente di valore,
+        # così il massimo sulle mosse libere è il primo elemento non ancora usato
+        self._valori_ordinati = [
+            [sorted(((getattr(mossa, attributo) or 0, mossa) for mossa in dominio),
+                    key=lambda coppia: coppia[0], reverse=True) for dominio in domini]
+            for attributo, _ in vincoli_somma]
+        self._mosse_per_categoria = [[[mossa for mossa in dominio if mossa.categoria_mossa == categoria]
+                                      for dominio in domini] for categoria in categorie_richieste]
+
+    def risolvi(self) -> Optional[list[Mossa]]:
+        """Prima quadrupla che rispetta tutti i vincoli, oppure None se non esiste."""
+        self.nodi_esplorati = 0
+        return self._ricerca({}, [0] * len(self.vincoli_somma), set())
+
+    def _ricerca(self, assegnate: dict[int, Mossa], somme: list[int], usate: set[Mossa]) -> Optional[list[Mossa]]:
+        if len(assegnate) == len(self.domini):
+            return [assegnate[slot] for slot in range(len(self.domini))]
+
+        slot = min((i for i in range(len(self.domini)) if i not in assegnate),
+                   key=lambda i: (sum(mossa not in usate for mossa in self.domini[i]), i))
+        for mossa in [mossa for mossa in self.domini[slot] if mossa not in usate][::-1]:
+            self.nodi_esplorati += 1
+            assegnate[slot] = mossa
+            usate.add(mossa)
+            valori = [getattr(mossa, attributo) or 0 for attributo, _ in self.vincoli_somma]
+            for k, valore in enumerate(valori):
+                somme[k] += valore
+
+            if self._ammissibile(assegnate, somme, usate):
+                soluzione = self._ricerca(assegnate, somme, usate)
+                if soluzione is not None:
+                    return soluzione
+
+            for k, valore in enumerate(valori):
+                somme[k] -= valore
+            usate.discard(mossa)
+            del assegnate[slot]
+        return None
+
+    def migliori(self, k: int, punteggio: Callable[[Mossa], float]) -> list[list[Mossa]]:
+        """
+        Le k quadruple ammissibili con la somma di `punteggio` più alta, dalla migliore; le permutazioni
+        della stessa quadrupla tra gli slot contano una volta sola.
+        Branch and bound sugli slot in ordine, con le mosse di ogni slot in ordine di punteggio decrescente:
+        un ramo viene tagliato quando il punteggio parziale più il massimo di ogni slot ancora da assegnare
+        non supera la peggiore delle k quadruple trovate, oltre che dai vincoli come in risolvi().
+        """
+        self.nodi_esplorati = 0
+        punteggi = {mossa.id: punteggio(mossa) for dominio in self.domini for mossa in dominio}
+        ordinati = [sorted(dominio, key=lambda mossa: punteggi[mossa.id], reverse=True) for dominio in self.domini]
+        # massimi_successivi[i]: somma dei punteggi massimi degli slot da i in poi
+        massimi_successivi = [0.0] * (len(self.domini) + 1)
+        for slot in range(len(self.domini) - 1, -1, -1):
+            massimi_successivi[slot] = massimi_successivi[slot + 1] + punteggi[ordinati[slot][0].id]
+
+        # Min-heap delle migliori quadruple (punteggio, progressivo, mosse) e insiemi di id già presenti
+        migliori: list[tuple[float, int, list[Mossa]]] = []
+        presenti: set[frozenset[int]] = set()
+        assegnate: dict[int, Mossa] = {}
+        somme = [0] * len(self.vincoli_somma)
+        usate: set[Mossa] = set()
+
+        def ricerca(slot: int, parziale: float) -> None:
+            if slot == len(self.domini):
+                chiave = frozenset(mossa.id for mossa in assegnate.values())
+                if chiave in presenti:
+                    return
+                presenti.add(chiave)
+                voce = (parziale, self.nodi_esplorati, [assegnate[i] for i in range(len(self.domini))])
+                if len(migliori) < k:
+                    heapq.heappush(migliori, voce)
+                else:
+                    _, _, scartata = heapq.heappushpop(migliori, voce)
+                    presenti.discard(frozenset(mossa.id for mossa in scartata))
+                return
+
+            for mossa in ordinati[slot]:
+                if mossa in usate:
+                    continue
+                valore = parziale + punteggi[mossa.id]
+                # Le mosse successive dello slot hanno punteggio minore: nessuna può più entrare tra le k
+                if len(migliori) == k and valore + massimi_successivi[slot + 1] <= migliori[0][0]:
+                    break
+                self.nodi_esplorati += 1
+                assegnate[slot] = mossa
+                usate.add(mossa)
+                valori = [getattr(mossa, attributo) or 0 for attributo, _ in self.vincoli_somma]
+                for i, v in enumerate(valori):
+                    somme[i] += v
+                if self._ammissibile(assegnate, somme, usate):
+                    ricerca(slot + 1, valore)
+                for i, v in enumerate(valori):
+                    somme[i] -= v
+                usate.discard(mossa)
+                del assegnate[slot]
+
+        if k > 0 and all(ordinati):
+            ricerca(0, 0.0)
+        return [mosse for _, _, mosse in sorted(migliori, key=lambda voce: (-voce[0], voce[1]))]
+
+    def _ammissibile(self, assegnate: dict[int, Mossa], somme: list[int], usate: set[Mossa]) -> bool:
+        libere = [slot for slot in range(len(self.domini)) if slot not in assegnate]
+
+        # Limite superiore di ogni somma: un dominio senza mosse libere chiude il ramo
+        for k, (_, soglia) in enumerate(self.vincoli_somma):
+            massimo = somme[k]
+            for slot in libere:
+                valore = next((valore for valore, mossa in self._valori_ordinati[k][slot] if mossa not in usate), None)
+                if valore is None:
+                    return False
+                massimo += valore
+            if massimo < soglia:
+                return False
+
+        # Categorie ancora mancanti: ognuna deve essere disponibile e devono bastare gli slot liberi
+        mancanti = 0
+        for c, categoria in enumerate(self.categorie_richieste):
+            if any(mossa.categoria_mossa == categoria for mossa in assegnate.values()):
+                continue
+            mancanti += 1
+            if not any(mossa not in usate for slot in libere for mossa in self._mosse_per_categoria[c][slot]):
+                return False
+        return mancanti <= len(libere)
+
+
 class AssegnatoreMosseLocale:
 
+    # Soglie dei vincoli globali su una quadrupla di mosse
+    SOGLIA_DANNI = 200
+    SOGLIA_PRECISIONE = 250
+    SOGLIA_PP = 25
+    # Gli stessi vincoli in forma dichiarativa per RisolutoreMossePropagazione
+    VINCOLI_SOMMA = (("base_power", SOGLIA_DANNI), ("precisione", SOGLIA_PRECISIONE), ("pp", SOGLIA_PP))
+    CATEGORIE_RICHIESTE = (URI_MOSSA_CAT_FISICO, URI_MOSSA_CAT_SPECIALE)
+
     @classmethod
     def _costruisci_domini(cls, mosse_assegnate_globali: set["Mossa"],
                           tipo_principale: str, tipo_secondario: Optional[str] = None) -> list[list["Mossa"]]:
@@ -26,24 +188,30 @@ class AssegnatoreMosseLocale:
         Costruisce i domini delle 4 mosse per un singolo Pokémon basato sui suoi tipi.
         Filtra mosse con precisione 0 o PP <= 1.
         Assicura che ogni dominio abbia almeno una mossa (fallback).
+
+        I domini sono calcolati sui bitset dell'indice del catalogo:
+        (mosse del tipo) AND (mosse valide) AND NOT (mosse già assegnate).
         """
+        catalogo = CatalogoMosse.ottieni()
+        indice = catalogo.indice()
+        # Mosse valide (precisione > 0, PP > 1) e non già assegnate globalmente
+        ammesse = indice.valide & ~catalogo.bitset(mosse_assegnate_globali)
 
-        def filtra_mosse_valide(mosse: list["Mossa"]) -> list["Mossa"]:
-            """Filtra mosse valide: precisione > 0, PP > 1 e non già assegnate globalmente"""
-            return [m for m in mosse if m.precisione > 0 and m.pp > 1 and m not in mosse_assegnate_globali]
+        def mosse_valide_di_tipo(tipo: str) -> list["Mossa"]:
+            return catalogo.mosse_da_bitset(indice.per_tipo(tipo) & ammesse)
 
         domini: list[list["Mossa"]] = [[], [], [], []]
 
         # ---------------------------
         # Slot 0: mosse del tipo principale
         # ---------------------------
-        domini[0] = filtra_mosse_valide(Mossa.ottieni_mosse_per_tipo(tipo_principale))
+        domini[0] = mosse_valide_di_tipo(tipo_principale)
 
         # ---------------------------
         # Slot 1: mosse del tipo secondario o fallback al principale
         # ---------------------------
         if tipo_secondario:
-            domini[1] = filtra_mosse_valide(Mossa.ottieni_mosse_per_tipo(tipo_secondario))
+            domini[1] = mosse_valide_di_tipo(tipo_secondario)
         else:
             domini[1] = domini[0][:]  # copia delle mosse del tipo principale
 
@@ -57,7 +225,7 @@ class AssegnatoreMosseLocale:
                 TipoPokemonHelper.mappa_uri_enum(tipo_secondario))
 
         tipo_compat1 = tipi_compatibili[0] if tipi_compatibili else tipo_principale
-        domini[2] = filtra_mosse_valide(Mossa.ottieni_mosse_per_tipo(tipo_compat1))
+        domini[2] = mosse_valide_di_tipo(tipo_compat1)
 
         # ---------------------------
         # Slot 3: mosse di un altro tipo compatibile o fallback combinato
@@ -69,16 +237,16 @@ class AssegnatoreMosseLocale:
                 break
 
         if tipo_compat2:
-            domini[3] = filtra_mosse_valide(Mossa.ottieni_mosse_per_tipo(tipo_compat2))
+            domini[3] = mosse_valide_di_tipo(tipo_compat2)
         else:
-            # fallback: unione dei domini precedenti senza duplicati
-            visti = set()
+            # fallback: unione dei domini precedenti senza duplicati, nell'ordine degli slot
+            visti = 0
             combinato = []
             for slot_dom in domini[:3]:
-                for m in filtra_mosse_valide(slot_dom):
-                    if m not in visti:
+                for m in slot_dom:
+                    if not visti >> m.id & 1:
                         combinato.append(m)
-                        visti.add(m)
+                        visti |= 1 << m.id
             domini[3] = combinato
 
         # ---------------------------
@@ -88,31 +256,67 @@ class AssegnatoreMosseLocale:
             if not dominio:
                 logger.warning(f"Dominio per le mosse vuoto! Avvio della procedura di fallback per il dominio")
                 # fallback: riempi con tutte le mosse valide dei tipi principali e secondari
-                mosse_fallback = filtra_mosse_valide(Mossa.ottieni_mosse_per_tipo(tipo_principale))
-                if tipo_secondario:
-                    mosse_fallback += filtra_mosse_valide(Mossa.ottieni_mosse_per_tipo(tipo_secondario))
-                domini[i] = mosse_fallback
+                domini[i] = cls._mosse_fallback(mosse_assegnate_globali, tipo_principale, tipo_secondario)
 
         return domini
 
     @classmethod
-    def genera_mosse(cls, mosse_assegnate_locali : set["Mossa"], tipo1: str, tipo2: Optional[str] = None) -> List[Mossa]:
+    def _mosse_fallback(cls, mosse_assegnate_globali: set["Mossa"], tipo_principale: str,
+                        tipo_secondario: Optional[str] = None) -> list["Mossa"]:
+        """Mosse valide e non assegnate dei tipi del Pokémon, usate al posto di un dominio rimasto vuoto."""
+        catalogo = CatalogoMosse.ottieni()
+        indice = catalogo.indice()
+        ammesse = indice.valide & ~catalogo.bitset(mosse_assegnate_globali)
+        mosse_fallback = catalogo.mosse_da_bitset(indice.per_tipo(tipo_principale) & ammesse)
+        if tipo_secondario:
+            mosse_fallback += catalogo.mosse_da_bitset(indice.per_tipo(tipo_secondario) & ammesse)
+        return mosse_fallback
+
+    @classmethod
+    def genera_mosse(cls, mosse_assegnate_locali : set["Mossa"], tipo1: str, tipo2: Optional[str] = None,
+                     backend: str = "propagazione") -> List[Mossa]:
         """
         Genera un set di 4 mosse per un Pokémon basato sui suoi tipi.
         Restituisce una lista di 4 oggetti Mossa.
+        backend: "propagazione" (RisolutoreMossePropagazione, vincoli di somma e di categoria propagati
+        durante la ricerca) oppure "constraint" (python-constraint, vincoli verificati solo sulle quadruple complete).
         """
+        if backend not in BACKEND_GENERAZIONE_MOSSE:
+            raise ValueError(f"Backend non supportato: {backend} (ammessi: {BACKEND_GENERAZIONE_MOSSE})")
         # lista di liste di Mosse
         # Costruzione dei domini
         # Sostanzialmente fissiamo che in ogni slot ci devono andare solo mosse di un certo tipo in maniera tale
         # da scremare il lavoro del solver
         domini : list[list[Mossa]] = cls._costruisci_domini(mosse_assegnate_locali, tipo1, tipo2)
+        if any(len(dominio) == 0 for dominio in domini):
+            raise ValueError("Dominio vuoto")
+
+        if backend == "propagazione":
+            mosse = RisolutoreMossePropagazione(domini, cls.VINCOLI_SOMMA, cls.CATEGORIE_RICHIESTE).risolvi()
+        else:
+            mosse = cls._risolvi_constraint(domini)
+
+        if mosse is None:
+            logger.warn(
+                f"[WARNING] Nessuna soluzione trovata per Pokémon tipo {tipo1}/{tipo2}. "
+                "Usato fallback con prime mosse disponibili nei domini."
+            )
+            # debug: stampa dimensioni domini
+            for i, dom in enumerate(domini):
+                logger.debug(f"  slot_{i}: {len(dom)} possibili mosse")
+            # fallback semplice: prendi la prima mossa di ogni dominio
+            # Evita il crash dovuta alla mancanza di una soluzione ma logga l'errore
+            return [dom[0] for dom in domini]
+
+        return mosse
+
+    @classmethod
+    def _risolvi_constraint(cls, domini: list[list[Mossa]]) -> Optional[list[Mossa]]:
         problem = Problem()
 
         # aggiungi le 4 variabili (slot delle mosse) con i rispettivi domini
         for i in range(4):
             #ogni variabile ha uno specifico dominio
-            if len(domini[i]) == 0:
-                raise ValueError("Dominio vuoto")
             problem.addVariable(f"slot_{i}", domini[i])
 
         # vincolo globale: tutte le mosse devono essere  diverse
@@ -131,20 +335,129 @@ class AssegnatoreMosseLocale:
 
         soluzione = problem.getSolution()
         if soluzione is None:
-            logger.warn(
+            return None
+        # restituisce le mosse ordinate dagli slot
+        return [soluzione[f"slot_{i}"] for i in range(4)]
+
+    @classmethod
+    def genera_set_mosse(cls, tipo1: str, tipo2: Optional[str] = None, numero: int = NUM_SET_MOSSE,
+                         valutatore: Optional[ValutatoreSetMosse] = None,
+                         mosse_escluse: set["Mossa"] = frozenset(),
+                         limite_tempo: float = LIMITE_TEMPO_CPSAT_MOSSE) -> List[SetMosse]:
+        """
+        Genera fino a `numero` quadruple di mosse a due a due disgiunte per un Pokémon con un unico modello
+        CP-SAT, invece di `numero` chiamate a genera_mosse con le mosse già usate da escludere.
+        Ogni quadrupla rispetta i vincoli di genera_mosse; il modello massimizza il numero di quadruple.
+
+        Come nella generazione ripetuta, uno slot può prendere mosse di fallback (tipi del Pokémon)
+        solo quando tutte le mosse del suo dominio sono già usate dalle altre quadruple.
+        Le quadruple sono restituite dalla migliore alla peggiore secondo il valutatore
+        (default: ValutatoreSetMosse(PESI_VALUTAZIONE)). Se non ne esiste nemmeno una si usa,
+        come in genera_mosse, la prima mossa di ogni dominio.
+        """
+        domini: list[list[Mossa]] = cls._costruisci_domini(set(mosse_escluse), tipo1, tipo2)
+        if any(len(dominio) == 0 for dominio in domini):
+            raise ValueError("Dominio vuoto")
+        fallback = cls._mosse_fallback(set(mosse_escluse), tipo1, tipo2)
+
+        quadruple = cls._risolvi_quadruple_cpsat(domini, fallback, numero, limite_tempo)
+        if not quadruple:
+            logger.warning(
                 f"[WARNING] Nessuna soluzione trovata per Pokémon tipo {tipo1}/{tipo2}. "
                 "Usato fallback con prime mosse disponibili nei domini."
             )
-            # debug: stampa dimensioni domini
-            for i, dom in enumerate(domini):
-                logger.debug(f"  slot_{i}: {len(dom)} possibili mosse")
-            # fallback semplice: prendi la prima mossa di ogni dominio
-            # Evita il crash dovuta alla mancanza di una soluzione ma logga l'errore
-            return [dom[0] for dom in domini]
+            quadruple = [[dominio[0] for dominio in domini]]
 
+        valutatore = valutatore or ValutatoreSetMosse(PESI_VALUTAZIONE)
+        return sorted((SetMosse(*mosse) for mosse in quadruple), key=valutatore.valuta, reverse=True)
 
-        # restituisce le mosse ordinate dagli slot
-        return [soluzione[f"slot_{i}"] for i in range(4)]
+    @classmethod
+    def _risolvi_quadruple_cpsat(cls, domini: list[list[Mossa]], fallback: list[Mossa], numero: int,
+                                 limite_tempo: float) -> list[list[Mossa]]:
+        """
+        Modello CP-SAT con una variabile booleana per ogni (quadrupla, slot, mossa candidata) e un flag
+        di attivazione per quadrupla: i vincoli di genera_mosse diventano vincoli lineari sulle quadruple
+        attive e una mossa può comparire al più una volta in tutto il modello.
+        Restituisce le quadruple attive della migliore soluzione trovata entro il limite di tempo.
+        """
+        # OR-Tools viene caricato solo quando si usa questo metodo
+        from ortools.sat.python import cp_model
+
+        # Candidati di ogni slot: prima il dominio, poi le mosse di fallback che non ne fanno parte.
+        # Le altre quadruple usano al più 4 * (numero - 1) mosse: un dominio più grande non si esaurisce mai
+        candidati = []
+        for dominio in domini:
+            ids_dominio = {mossa.id for mossa in dominio}
+            esauribile = len(dominio) <= len(domini) * (numero - 1)
+            candidati.append(dominio + [mossa for mossa in fallback if esauribile and mossa.id not in ids_dominio])
+
+        modello = cp_model.CpModel()
+        variabili_per_mossa = defaultdict(list)
+        attive, scelte = [], []
+        for q in range(numero):
+            attiva = modello.NewBoolVar(f"q{q}_attiva")
+            scelte_quadrupla = []
+            fisiche, speciali, danni, precisioni, pp = [], [], [], [], []
+            for s, mosse in enumerate(candidati):
+                variabili = [modello.NewBoolVar(f"q{q}_slot{s}_{j}") for j in range(len(mosse))]
+                # Una mossa per slot nelle quadruple attive, nessuna nelle altre
+                modello.Add(sum(variabili) == attiva)
+                for mossa, variabile in zip(mosse, variabili):
+                    variabili_per_mossa[mossa.id].append((q, variabile))
+                    if mossa.categoria_mossa == URI_MOSSA_CAT_FISICO:
+                        fisiche.append(variabile)
+                    elif mossa.categoria_mossa == URI_MOSSA_CAT_SPECIALE:
+                        speciali.append(variabile)
+                    danni.append(mossa.base_power * variabile)
+                    precisioni.append(mossa.precisione * variabile)
+                    pp.append(mossa.pp * variabile)
+                scelte_quadrupla.append(variabili)
+
+            # Almeno una mossa fisica e una speciale, soglie su danno, precisione e PP totali
+            modello.Add(sum(fisiche) >= 1).OnlyEnforceIf(attiva)
+            modello.Add(sum(speciali) >= 1).OnlyEnforceIf(attiva)
+            modello.Add(sum(danni) >= cls.SOGLIA_DANNI).OnlyEnforceIf(attiva)
+            modello.Add(sum(precisioni) >= cls.SOGLIA_PRECISIONE).OnlyEnforceIf(attiva)
+            modello.Add(sum(pp) >= cls.SOGLIA_PP).OnlyEnforceIf(attiva)
+
+            attive.append(attiva)
+            scelte.append(scelte_quadrupla)
+
+        # Tutte le mosse diverse, dentro una quadrupla e tra quadruple diverse
+        for variabili in variabili_per_mossa.values():
+            if len(variabili) > 1:
+                modello.AddAtMostOne(variabile for _, variabile in variabili)
+
+        # Fallback solo a dominio esaurito: se lo slot usa una mossa fuori dal dominio,
+        # ogni mossa del dominio deve essere già usata da un'altra quadrupla
+        for q, scelte_quadrupla in enumerate(scelte):
+            for dominio, variabili in zip(domini, scelte_quadrupla):
+                variabili_fallback = variabili[len(dominio):]
+                if not variabili_fallback:
+                    continue
+                for mossa in dominio:
+                    modello.Add(sum(variabile for altra, variabile in variabili_per_mossa[mossa.id]
+                                    if altra != q) >= sum(variabili_fallback))
+
+        modello.Maximize(sum(attive))
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = limite_tempo
+        solver.parameters.num_workers = NUM_WORKER_CPSAT_MOSSE
+        # Modello piccolo: presolve e rilassamento lineare costano più della ricerca stessa
+        solver.parameters.cp_model_presolve = False
+        solver.parameters.linearization_level = 0
+        stato = solver.Solve(modello)
+        if stato not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return []
+        return [[next(mossa for mossa, variabile in zip(mosse, variabili) if solver.BooleanValue(variabile))
+                 for mosse, variabili in zip(candidati, scelte_quadrupla)]
+                for attiva, scelte_quadrupla in zip(attive, scelte) if solver.BooleanValue(attiva)]
+
+    @classmethod
+    def quadrupla_ammissibile(cls, *mosse) -> bool:
+        """True se le mosse sono tutte diverse e rispettano i vincoli globali di genera_mosse."""
+        return (len(set(mosse)) == len(mosse) and cls._vincolo_categoria(*mosse) and cls._vincolo_danni(*mosse)
+                and cls._vincolo_precisione(*mosse) and cls._vincolo_pp(*mosse))
 
     @classmethod
     def _vincolo_categoria(cls, *mosse) -> bool:
@@ -155,21 +468,21 @@ class AssegnatoreMosseLocale:
     @classmethod
     def _vincolo_danni(cls, *mosse) -> bool:
         #Vincolo: somma dei danni > X
-        soglia = 200  # definita internamente
+        soglia = cls.SOGLIA_DANNI
         totale = sum(m.base_power for m in mosse if m.base_power)
         return totale >= soglia
 
     @classmethod
     def _vincolo_precisione(cls, *mosse) -> bool:
         #non utilizzato
-        soglia = 250
+        soglia = cls.SOGLIA_PRECISIONE
         totale = sum(m.precisione for m in mosse if m.precisione)
         return totale >= soglia
 
     @classmethod
     def _vincolo_pp(cls, *mosse) -> bool:
         #non utilizzato
-        soglia = 25
+        soglia = cls.SOGLIA_PP
         totale = sum(m.pp for m in mosse if m.pp)
         return totale >= soglia
 
@@ -0,0 +1,54 @@
+from typing import Sequence
+
+import numpy as np
+from config.costanti_globali import NUM_COUNTER_POKEDEX
+from entita.tipo_pokemon import TipoPokemonHelper
+from problemi.battaglia_pokemon.problema_scontro import ValutatoreScontri
+
+
+class CounterPokedex:
+    """
+    Migliori counter di ogni specie, calcolati offline sull'intero Pokédex e interrogabili a richiesta.
+
+    Per ogni Pokémon avversario sono conservati i k Pokémon con il punteggio di scontro più alto
+    contro di lui (vedi ValutatoreScontri.matrice_punteggi_pokemon), dal migliore al peggiore.
+    Il file .npz contiene solo array numerici e di stringhe: si carica senza pickle e senza il KG.
+    """
+
+    def __init__(self, pokemon: Sequence[str], indici: np.ndarray, punteggi: np.ndarray):
+        self.pokemon = list(pokemon)
+        # indici[j] / punteggi[j]: counter dell'avversario pokemon[j], come posizioni in self.pokemon
+        self.indici = indici
+        self.punteggi = punteggi
+        self._posizione = {uri: posizione for posizione, uri in enumerate(self.pokemon)}
+
+    @classmethod
+    def calcola(cls, pokemon: Sequence[str] | None = None, k: int = NUM_COUNTER_POKEDEX,
+                dtype: np.dtype | type = np.float32, percorso_matrice: str | None = None) -> "CounterPokedex":
+        """
+        Calcola i counter di ogni Pokémon indicato (default: tutti quelli del KG, in ordine di URI).
+        Con percorso_matrice la matrice dei punteggi completa resta salvata su disco come memmap.
+        """
+        if pokemon is None:
+            pokemon = sorted(TipoPokemonHelper.ottieni_mappa_pokemon_tipi())
+        matrice = ValutatoreScontri.matrice_punteggi_pokemon(pokemon, dtype=dtype, percorso_memmap=percorso_matrice)
+        indici, punteggi = ValutatoreScontri.migliori_counter(matrice, k)
+        return cls(pokemon, indici, punteggi)
+
+    def salva(self, percorso: str) -> None:
+        np.savez(percorso, pokemon=np.array(self.pokemon), indici=self.indici, punteggi=self.punteggi)
+
+    @classmethod
+    def carica(cls, percorso: str) -> "CounterPokedex":
+        with np.load(percorso) as dati:
+            return cls(dati["pokemon"].tolist(), dati["indici"], dati["punteggi"])
+
+    def counter(self, avversario: str, k: int | None = None) -> list[tuple[str, float]]:
+        """
+        I k migliori counter dell'avversario come coppie (URI Pokémon, punteggio), dal migliore.
+        Solleva KeyError se l'avversario non era tra i Pokémon del calcolo.
+        """
+        posizione = self._posizione[avversario]
+        indici = self.indici[posizione, :k].tolist()
+        punteggi = self.punteggi[posizione, :k].tolist()
+        return [(self.pokemon[indice], punteggio) for indice, punteggio in zip(indici, punteggi)]
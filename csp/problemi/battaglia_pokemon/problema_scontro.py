@@ -1,7 +1,24 @@
-import numpy as np
+import threading
+from typing import TYPE_CHECKING, Iterable, NamedTuple, Sequence
+
 from config.costanti_globali import QUERY_SPARQL_TABELLA_MOLTIPLICATORI_DANNI
-from entita.tipo_pokemon import TipoPokemonHelper
-from utils.client_sparql import esegui_query_sparql
+from entita.tipo_pokemon import TipoPokemonHelper, COMBINAZIONI_TIPI
+from utils.client_sparql import itera_righe_sparql
+
+if TYPE_CHECKING:
+    # numpy è importato nelle funzioni che lo usano: importare il modulo (e main_csp) non ne paga il costo
+    import numpy as np
+
+# Righe della matrice dei punteggi (o colonne, per la ricerca dei counter) elaborate per blocco:
+# con un output su disco in memoria resta un solo blocco alla volta
+RIGHE_PER_BLOCCO_PUNTEGGI = 1024
+
+
+class RigaMoltiplicatoreKG(NamedTuple):
+    """Schema di una riga della query tabella_moltiplicatori_danno."""
+    attackerType: str
+    defenderType: str
+    multiplier: float
 
 
 def _costruisci_matrice_moltiplicatori():
@@ -12,8 +29,10 @@ def _costruisci_matrice_moltiplicatori():
     Ogni cella [i][j] rappresenta l’efficacia di un tipo attaccante i
     contro un tipo difensore j.
     """
+    import numpy as np
+
     # Esegue la query_sparql SPARQL per ottenere i moltiplicatori dal KG
-    risultati = esegui_query_sparql(QUERY_SPARQL_TABELLA_MOLTIPLICATORI_DANNI)
+    risultati = list(itera_righe_sparql(QUERY_SPARQL_TABELLA_MOLTIPLICATORI_DANNI, RigaMoltiplicatoreKG))
 
     def normalizza_tipo(tipo_uri):
         """
@@ -25,8 +44,8 @@ def _costruisci_matrice_moltiplicatori():
 
     # Ottiene tutti i tipi unici presenti come attaccanti o difensori
     tipi = sorted(
-        set(normalizza_tipo(r["attackerType"]["value"]) for r in risultati) |
-        set(normalizza_tipo(r["defenderType"]["value"]) for r in risultati)
+        set(normalizza_tipo(r.attackerType) for r in risultati) |
+        set(normalizza_tipo(r.defenderType) for r in risultati)
     )
 
     # Crea una matrice NxN inizialmente riempita di 1.0 (nessun bonus o malus)
@@ -35,24 +54,197 @@ def _costruisci_matrice_moltiplicatori():
 
     # Riempie la matrice con i valori dei moltiplicatori provenienti dal KG
     for r in risultati:
-        i = TipoPokemonHelper.ottieni_mappa_tipo_indice(normalizza_tipo(r["attackerType"]["value"]))
-        j = TipoPokemonHelper.ottieni_mappa_tipo_indice(normalizza_tipo(r["defenderType"]["value"]))
+        i = TipoPokemonHelper.ottieni_mappa_tipo_indice(normalizza_tipo(r.attackerType))
+        j = TipoPokemonHelper.ottieni_mappa_tipo_indice(normalizza_tipo(r.defenderType))
         # Inserisce il moltiplicatore corretto all’incrocio attaccante -> difensore
-        matrix[i, j] = float(r["multiplier"]["value"])
+        matrix[i, j] = r.multiplier
 
     return matrix
 
 
+class TabelleEfficacia(NamedTuple):
+    """
+    Tabelle precalcolate da una matrice dei moltiplicatori, indicizzate per id tipo e id combinazione
+    (vedi COMBINAZIONI_TIPI): ogni interrogazione su uno scontro diventa un accesso per indice.
+    """
+    # [id tipo attaccante, combinazione difensore]: prodotto dei moltiplicatori contro i tipi del difensore
+    tipo_contro_combinazione: "np.ndarray"
+    # [combinazione attaccante, combinazione difensore]: massima efficacia tra i tipi dell'attaccante
+    efficienza: "np.ndarray"
+    # [combinazione nostra, combinazione avversaria]: efficienza nostra - efficienza avversaria
+    punteggio: "np.ndarray"
+    # Le stesse tabelle come liste di float, per gli accessi a singoli elementi
+    righe_tipo_contro_combinazione: list[list[float]]
+    righe_efficienza: list[list[float]]
+    righe_punteggio: list[list[float]]
+
+
+def _costruisci_tabelle_efficacia(matrice_moltiplicatori: "np.ndarray") -> TabelleEfficacia:
+    import numpy as np
+
+    # Per i tipi singoli il "secondo tipo" coincide con il primo: nel prodotto vale 1, nel massimo non cambia nulla
+    primo = np.array([combinazione[0] for combinazione in COMBINAZIONI_TIPI])
+    secondo = np.array([combinazione[-1] for combinazione in COMBINAZIONI_TIPI])
+    doppio = primo != secondo
+
+    tipo_contro_combinazione = matrice_moltiplicatori[:, primo] * np.where(doppio, matrice_moltiplicatori[:, secondo], 1.0)
+    efficienza = np.maximum(tipo_contro_combinazione[primo, :], tipo_contro_combinazione[secondo, :])
+    punteggio = efficienza - efficienza.T
+    return TabelleEfficacia(tipo_contro_combinazione, efficienza, punteggio,
+                            tipo_contro_combinazione.tolist(), efficienza.tolist(), punteggio.tolist())
+
+
 class ValutatoreScontri:
     """
     Classe che valuta il punteggio di scontri diretti tra due squadre di Pokémon
     in base ai loro tipi e alle relazioni di efficacia (moltiplicatori).
     """
 
-    # Mappa Pokémon → tipi (caricata una sola volta)
-    mappa_pokemon_tipi = TipoPokemonHelper.ottieni_mappa_pokemon_tipi()
-    # Matrice globale dei moltiplicatori tra tipi
-    matrice_moltiplicatori = _costruisci_matrice_moltiplicatori()
+    # Matrice globale dei moltiplicatori tra tipi, costruita dal KG al primo utilizzo
+    _matrice_moltiplicatori: "np.ndarray | None" = None
+    # Stessa matrice come liste di float Python: l'accesso a un singolo elemento è molto più rapido che su numpy
+    _righe_moltiplicatori: list[list[float]] | None = None
+    # Tabelle di efficacia per combinazioni di tipi, calcolate una volta insieme alla matrice
+    _tabelle: TabelleEfficacia | None = None
+    _lock_matrice = threading.Lock()
+
+    @classmethod
+    def ottieni_matrice_moltiplicatori(cls) -> "np.ndarray":
+        """
+        Restituisce la matrice dei moltiplicatori tra tipi, interrogando il KG solo alla prima chiamata.
+        Sicuro tra thread: chiamate concorrenti attendono un unico caricamento.
+        """
+        if cls._matrice_moltiplicatori is None:
+            with cls._lock_matrice:
+                if cls._matrice_moltiplicatori is None:
+                    matrice = _costruisci_matrice_moltiplicatori()
+                    cls._righe_moltiplicatori = matrice.tolist()
+                    cls._tabelle = _costruisci_tabelle_efficacia(matrice)
+                    cls._matrice_moltiplicatori = matrice
+        return cls._matrice_moltiplicatori
+
+    @classmethod
+    def ottieni_tabelle_efficacia(cls) -> TabelleEfficacia:
+        """Tabelle di efficacia per tipo e combinazione di tipi, derivate dalla matrice dei moltiplicatori."""
+        cls.ottieni_matrice_moltiplicatori()
+        return cls._tabelle
+
+    @classmethod
+    def punteggi_combinazioni(cls, combinazioni_nostre: Iterable[int],
+                              combinazioni_avversarie: Iterable[int]) -> "np.ndarray":
+        """
+        Matrice dei punteggi per tutte le coppie (combinazione nostra, combinazione avversaria),
+        ottenuta in blocco con un solo indicizzamento numpy.
+        """
+        import numpy as np
+
+        return cls.ottieni_tabelle_efficacia().punteggio[np.ix_(np.asarray(list(combinazioni_nostre), dtype=np.intp),
+                                                                np.asarray(list(combinazioni_avversarie), dtype=np.intp))]
+
+    @classmethod
+    def matrice_punteggi_pokemon(cls, pokemon_nostri: Sequence[str], pokemon_avversari: Sequence[str] | None = None,
+                                 dtype: "np.dtype | type" = float, percorso_memmap: str | None = None,
+                                 righe_per_blocco: int = RIGHE_PER_BLOCCO_PUNTEGGI) -> "np.ndarray":
+        """
+        Matrice [nostri x avversari] dei punteggi di scontro per liste arbitrarie di Pokémon
+        (anche l'intero Pokédex), con la stessa semantica di costruisci_matrice_moltiplicatori_scontri
+        ma senza il vincolo di squadre di pari dimensione. Senza avversari la matrice è quadrata
+        sugli stessi Pokémon.
+
+        Ogni Pokémon è ridotto all'id della sua combinazione di tipi e la matrice si ottiene
+        indicizzando in broadcasting la tabella dei punteggi; solo i Pokémon senza combinazione
+        (nessun tipo noto, tipi ripetuti o più di due tipi) sono calcolati elemento per elemento.
+
+        - dtype=np.float32 dimezza la memoria (con i moltiplicatori standard i punteggi sono multipli di 0.25, quindi esatti)
+        - con percorso_memmap la matrice è scritta a blocchi di righe in un file .npy mappato
+          in memoria, rileggibile con np.load(percorso, mmap_mode="r")
+        Solleva KeyError per un Pokémon assente dal KG.
+        """
+        import numpy as np
+
+        if pokemon_avversari is None:
+            pokemon_avversari = pokemon_nostri
+        combinazioni_nostre, irregolari_nostri = cls._combinazioni_pokemon(pokemon_nostri)
+        combinazioni_avversarie, irregolari_avversari = cls._combinazioni_pokemon(pokemon_avversari)
+
+        # La conversione di tipo avviene una volta sola sulla tabella 171x171, non sulla matrice finale
+        tabella = cls.ottieni_tabelle_efficacia().punteggio.astype(dtype, copy=False)
+        forma = (len(combinazioni_nostre), len(combinazioni_avversarie))
+        colonne = combinazioni_avversarie[np.newaxis, :]
+        if percorso_memmap is None:
+            matrice = tabella[combinazioni_nostre[:, np.newaxis], colonne]
+        else:
+            matrice = np.lib.format.open_memmap(percorso_memmap, mode="w+", dtype=tabella.dtype, shape=forma)
+            for inizio in range(0, forma[0], righe_per_blocco):
+                blocco = combinazioni_nostre[inizio:inizio + righe_per_blocco]
+                matrice[inizio:inizio + len(blocco)] = tabella[blocco[:, np.newaxis], colonne]
+
+        # Pokémon fuori dalle tabelle: la loro riga/colonna è ricalcolata con il prodotto esplicito
+        if irregolari_nostri or irregolari_avversari:
+            mappa_pokemon_id_tipi = TipoPokemonHelper.ottieni_mappa_pokemon_id_tipi()
+            id_tipi_nostri = [mappa_pokemon_id_tipi[uri] for uri in pokemon_nostri]
+            id_tipi_avversari = [mappa_pokemon_id_tipi[uri] for uri in pokemon_avversari]
+            for i in irregolari_nostri:
+                matrice[i, :] = [cls.calcola_punteggio_scontro_id(id_tipi_nostri[i], id_tipi)
+                                 for id_tipi in id_tipi_avversari]
+            for j in irregolari_avversari:
+                matrice[:, j] = [cls.calcola_punteggio_scontro_id(id_tipi, id_tipi_avversari[j])
+                                 for id_tipi in id_tipi_nostri]
+
+        if percorso_memmap is not None:
+            matrice.flush()
+        return matrice
+
+    @staticmethod
+    def _combinazioni_pokemon(pokemon: Sequence[str]) -> "tuple[np.ndarray, list[int]]":
+        """
+        Id combinazione di ogni Pokémon e posizioni di quelli che non ne hanno una
+        (a cui viene assegnata provvisoriamente la combinazione 0).
+        """
+        import numpy as np
+
+        mappa_combinazioni = TipoPokemonHelper.ottieni_mappa_pokemon_combinazioni()
+        mappa_pokemon_id_tipi = TipoPokemonHelper.ottieni_mappa_pokemon_id_tipi()
+        combinazioni = np.zeros(len(pokemon), dtype=np.intp)
+        irregolari = []
+        for posizione, uri in enumerate(pokemon):
+            combinazione = mappa_combinazioni.get(uri)
+            if combinazione is None:
+                if uri not in mappa_pokemon_id_tipi:
+                    raise KeyError(uri)
+                irregolari.append(posizione)
+            else:
+                combinazioni[posizione] = combinazione
+        return combinazioni, irregolari
+
+    @staticmethod
+    def migliori_counter(matrice_punteggi: "np.ndarray", k: int,
+                         colonne_per_blocco: int = RIGHE_PER_BLOCCO_PUNTEGGI) -> "tuple[np.ndarray, np.ndarray]":
+        """
+        Per ogni avversario (colonna della matrice) i k nostri Pokémon (righe) con il punteggio più alto.
+
+        Restituisce due array [avversari x k]: indici di riga dal migliore al peggiore e relativi punteggi.
+        A parità di punteggio vince la riga con indice minore, così il risultato è deterministico
+        nonostante i molti pareggi. La matrice può essere un memmap: è letta a blocchi di colonne.
+        """
+        import numpy as np
+
+        n_righe, n_colonne = matrice_punteggi.shape
+        k = min(k, n_righe)
+        indici = np.empty((n_colonne, k), dtype=np.intp)
+        punteggi = np.empty((n_colonne, k), dtype=matrice_punteggi.dtype)
+        for inizio in range(0, n_colonne, colonne_per_blocco):
+            blocco = np.asarray(matrice_punteggi[:, inizio:inizio + colonne_per_blocco]).T
+            migliori = np.argsort(-blocco, axis=1, kind="stable")[:, :k]
+            indici[inizio:inizio + len(blocco)] = migliori
+            punteggi[inizio:inizio + len(blocco)] = np.take_along_axis(blocco, migliori, axis=1)
+        return indici, punteggi
+
+    @classmethod
+    def ottieni_righe_moltiplicatori(cls) -> list[list[float]]:
+        """Matrice dei moltiplicatori come liste: righe_moltiplicatori[id_attaccante][id_difensore]."""
+        cls.ottieni_matrice_moltiplicatori()
+        return cls._righe_moltiplicatori
 
     @classmethod
     def costruisci_matrice_moltiplicatori_scontri(cls, squadra_nostra : list[str],
@@ -71,18 +263,29 @@ class ValutatoreScontri:
         if n != m:
             raise ValueError("Le due squadre devono essere della stessa dimensione")
 
+        # Caso comune: tutti i Pokémon hanno una combinazione di tipi nelle tabelle precalcolate,
+        # quindi la matrice è un unico indicizzamento della tabella dei punteggi
+        mappa_combinazioni = TipoPokemonHelper.ottieni_mappa_pokemon_combinazioni()
+        combinazioni_nostre = [mappa_combinazioni.get(uri) for uri in squadra_nostra]
+        combinazioni_avversarie = [mappa_combinazioni.get(uri) for uri in squadra_avversaria]
+        if None not in combinazioni_nostre and None not in combinazioni_avversarie:
+            return cls.punteggi_combinazioni(combinazioni_nostre, combinazioni_avversarie).tolist()
+
         # Matrice vuota di punteggi (float)
         matrice_punteggi = [[0.0 for _ in range(m)] for _ in range(n)]
 
+        # Mappa Pokémon → id dei tipi (caricata una sola volta)
+        mappa_pokemon_id_tipi = TipoPokemonHelper.ottieni_mappa_pokemon_id_tipi()
+
         # Calcola punteggio per ogni coppia (nostro pokemon, avversario)
         for i, nostro_uri in enumerate(squadra_nostra):
             #tipi del nostro pokemon
-            tipi_nostro = cls.mappa_pokemon_tipi[nostro_uri]
+            tipi_nostro = mappa_pokemon_id_tipi[nostro_uri]
             #per ogni avversario
             for j, avv_uri in enumerate(squadra_avversaria):
                 #tipi dell'avversario
-                tipi_avv = cls.mappa_pokemon_tipi[avv_uri]
-                score = cls.calcola_punteggio_scontro(tipi_nostro, tipi_avv)
+                tipi_avv = mappa_pokemon_id_tipi[avv_uri]
+                score = cls.calcola_punteggio_scontro_id(tipi_nostro, tipi_avv)
                 #0, 0 moltiplicatore pokemon 0 della mia squadra contro pokemon 0 squadra avversaria
                 #0, 1 moltiplicatore pokemon 0 squadra mia contro pokemon 1 squadra avversaria
                 matrice_punteggi[i][j] = score
@@ -97,9 +300,18 @@ class ValutatoreScontri:
         punteggio = max efficacia (nostro → avversario)
                   - max efficacia (avversario → nostro)
         """
-        max_eff_nostro = cls.efficienza(tipi_nostro, tipi_avversario)
-        max_eff_avversario = cls.efficienza(tipi_avversario, tipi_nostro)
-        return max_eff_nostro - max_eff_avversario
+        return cls.calcola_punteggio_scontro_id(TipoPokemonHelper.id_tipi(tipi_nostro),
+                                                TipoPokemonHelper.id_tipi(tipi_avversario))
+
+    @classmethod
+    def calcola_punteggio_scontro_id(cls, id_tipi_nostro: tuple[int, ...], id_tipi_avversario: tuple[int, ...]) -> float:
+        """Come calcola_punteggio_scontro, ma con i tipi già convertiti in id canonici."""
+        combinazione_nostra = TipoPokemonHelper.id_combinazione(id_tipi_nostro)
+        combinazione_avversaria = TipoPokemonHelper.id_combinazione(id_tipi_avversario)
+        if combinazione_nostra is not None and combinazione_avversaria is not None:
+            return cls.ottieni_tabelle_efficacia().righe_punteggio[combinazione_nostra][combinazione_avversaria]
+        return cls.efficienza_id(id_tipi_nostro, id_tipi_avversario) - cls.efficienza_id(id_tipi_avversario,
+                                                                                         id_tipi_nostro)
 
     @classmethod
     def efficienza(cls, tipi_attaccanti, tipi_difensore):
@@ -110,12 +322,31 @@ class ValutatoreScontri:
         La logica moltiplica i moltiplicatori contro ogni tipo del difensore
         e prende il massimo tra tutti i tipi dell’attaccante.
         """
+        return cls.efficienza_id(TipoPokemonHelper.id_tipi(tipi_attaccanti), TipoPokemonHelper.id_tipi(tipi_difensore))
+
+    @classmethod
+    def efficienza_id(cls, id_tipi_attaccanti: Iterable[int], id_tipi_difensore: tuple[int, ...]) -> float:
+        """Come efficienza, ma con i tipi già convertiti in id canonici: nessuna ricerca di URI nel ciclo."""
+        tabelle = cls._tabelle or cls.ottieni_tabelle_efficacia()
+        combinazione_difensore = TipoPokemonHelper.id_combinazione(id_tipi_difensore)
+        if combinazione_difensore is not None:
+            # Un accesso alla tabella per tipo attaccante invece del prodotto sui tipi del difensore
+            righe = tabelle.righe_tipo_contro_combinazione
+            max_eff = 0.0
+            for id_att in id_tipi_attaccanti:
+                efficacia = righe[id_att][combinazione_difensore]
+                if efficacia > max_eff:
+                    max_eff = efficacia
+            return max_eff
+
+        # Difensore senza una combinazione nelle tabelle (es. tipi ripetuti): prodotto esplicito
+        righe = cls._righe_moltiplicatori
         max_eff = 0.0
-        for tipo_att in tipi_attaccanti:
+        for id_att in id_tipi_attaccanti:
+            riga = righe[id_att]
             moltiplicatore = 1.0
-            for tipo_dif in tipi_difensore:
-                idx_att = TipoPokemonHelper.ottieni_mappa_tipo_indice(tipo_att)
-                idx_dif = TipoPokemonHelper.ottieni_mappa_tipo_indice(tipo_dif)
-                moltiplicatore *= cls.matrice_moltiplicatori[idx_att, idx_dif]
-            max_eff = max(max_eff, moltiplicatore)
-        return float(max_eff)
+            for id_dif in id_tipi_difensore:
+                moltiplicatore *= riga[id_dif]
+            if moltiplicatore > max_eff:
+                max_eff = moltiplicatore
+        return max_eff
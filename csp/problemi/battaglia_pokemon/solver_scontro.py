@@ -1,20 +1,129 @@
-from ortools.linear_solver import pywraplp
+import itertools
+import math
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # Come ortools, numpy è importato nelle funzioni che lo usano
+    import numpy as np
+
+# Motori disponibili per l'assegnamento ottimale
+METODI_ASSEGNAMENTO = ("scip", "ungherese")
+# Oltre questo numero di permutazioni (8! = 40320) il batch risolve ogni matrice con l'algoritmo ungherese
+MAX_PERMUTAZIONI_BATCH = 40320
+# Matrici valutate insieme nel batch: limita la memoria dell'array [matrici x permutazioni x avversari]
+MATRICI_PER_BLOCCO_BATCH = 256
+
+
+@lru_cache(maxsize=16)
+def _indici_permutazioni(n: int, m: int) -> "np.ndarray":
+    """
+    Tutti gli assegnamenti di m avversari a nostri Pokémon distinti tra n, in ordine lessicografico,
+    come indici nella matrice trasposta e appiattita: indici[p, j] = j * n + riga assegnata a j.
+    """
+    import numpy as np
+
+    permutazioni = np.array(list(itertools.permutations(range(n), m)), dtype=np.intp).reshape(math.perm(n, m), m)
+    return np.arange(m, dtype=np.intp) * n + permutazioni
+
+
+def _assegnamento_ungherese(costi: "np.ndarray") -> "np.ndarray":
+    """
+    Assegnamento di costo minimo con l'algoritmo ungherese nella variante a cammini minimi
+    aumentanti (Jonker-Volgenant), O(n²·m) con il ciclo interno vettorizzato su numpy.
+
+    costi ha forma [n, m] con n <= m: ogni riga riceve una colonna distinta.
+    Restituisce per ogni riga l'indice della colonna assegnata.
+    """
+    import numpy as np
+
+    n, m = costi.shape
+    # Potenziali duali di righe e colonne; la colonna 0 è una sentinella per la riga in inserimento
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    # riga_di[j] = riga (da 1) assegnata alla colonna j, 0 se libera
+    riga_di = np.zeros(m + 1, dtype=np.intp)
+    precedente = np.zeros(m + 1, dtype=np.intp)
+
+    # Inizializzazione: riduzione per colonne (solo se quadrata, una colonna libera deve avere potenziale 0)
+    # e per righe, poi accoppiamento greedy sui costi ridotti nulli. Con i punteggi a valori discreti
+    # (molti pareggi) la maggior parte delle righe è già assegnata e non richiede un cammino aumentante
+    if n == m:
+        v[1:] = costi.min(axis=0)
+    ridotti = costi - v[1:]
+    u[1:] = ridotti.min(axis=1)
+    ridotti -= u[1:, np.newaxis]
+    da_inserire = []
+    for riga in range(1, n + 1):
+        zeri = np.flatnonzero((ridotti[riga - 1] == 0) & (riga_di[1:] == 0))
+        if zeri.size:
+            riga_di[zeri[0] + 1] = riga
+        else:
+            da_inserire.append(riga)
+
+    for riga in da_inserire:
+        riga_di[0] = riga
+        colonna = 0
+        minimi = np.full(m + 1, np.inf)
+        visitata = np.zeros(m + 1, dtype=bool)
+        # Cammino minimo dalla nuova riga fino a una colonna libera
+        while True:
+            visitata[colonna] = True
+            riga_corrente = riga_di[colonna]
+            ridotti = costi[riga_corrente - 1] - v[1:] - u[riga_corrente]
+            aggiorna = ~visitata[1:] & (ridotti < minimi[1:])
+            minimi[1:][aggiorna] = ridotti[aggiorna]
+            precedente[1:][aggiorna] = colonna
+
+            candidati = np.where(visitata[1:], np.inf, minimi[1:])
+            prossima = int(np.argmin(candidati)) + 1
+            delta = candidati[prossima - 1]
+            u[riga_di[visitata]] += delta
+            v[visitata] -= delta
+            minimi[~visitata] -= delta
+
+            colonna = prossima
+            if riga_di[colonna] == 0:
+                break
+        # Inverte gli accoppiamenti lungo il cammino trovato
+        while colonna:
+            colonna_precedente = precedente[colonna]
+            riga_di[colonna] = riga_di[colonna_precedente]
+            colonna = colonna_precedente
+
+    colonna_di = np.empty(n, dtype=np.intp)
+    colonne = np.flatnonzero(riga_di[1:])
+    colonna_di[riga_di[colonne + 1] - 1] = colonne
+    return colonna_di
+
 
 class SolverScontro:
     """
     Classe per risolvere l'assegnamento tra due squadre di Pokémon
     basandosi su una matrice di punteggi.
     Offre due strategie:
-    - assegnamento ottimale (con programmazione lineare intera, usando OR-Tools)
+    - assegnamento ottimale (programmazione lineare intera con OR-Tools, oppure algoritmo ungherese)
     - assegnamento greedy (euristica semplice)
     """
 
     @staticmethod
-    def assegnamento_ottimale(matrice_punteggi):
+    def assegnamento_ottimale(matrice_punteggi, metodo: str = "scip"):
         """
         Trova l'assegnamento ottimale massimizzando il punteggio totale.
-        Usa un problema di Programmazione Lineare Intera.
+
+        - metodo="scip": problema di Programmazione Lineare Intera risolto con SCIP (OR-Tools)
+        - metodo="ungherese": algoritmo ungherese in puro numpy, senza costruzione del modello;
+          scala a rose di centinaia di Pokémon e accetta più Pokémon nostri che avversari
+
+        A parità di punteggio totale i due metodi possono restituire assegnamenti diversi.
         """
+        if metodo == "ungherese":
+            return SolverScontro._assegnamento_ungherese(matrice_punteggi)
+        if metodo != "scip":
+            raise ValueError(f"Metodo di assegnamento non supportato: {metodo} (ammessi: {METODI_ASSEGNAMENTO})")
+
+        from ortools.linear_solver import pywraplp
+
         n = len(matrice_punteggi)  # numero di Pokémon per squadra (dimensione matrice)
 
         # Creazione del solver con SCIP (uno dei solver supportati da OR-Tools)
@@ -57,6 +166,63 @@ class SolverScontro:
 
         return assegnamento, punteggio_totale
 
+    @staticmethod
+    def _assegnamento_ungherese(matrice_punteggi):
+        """
+        Assegnamento ottimale con l'algoritmo ungherese: ogni avversario (colonna) riceve
+        un nostro Pokémon (riga) distinto. Stesso formato di uscita del metodo SCIP.
+        """
+        import numpy as np
+
+        punteggi = np.asarray(matrice_punteggi, dtype=float)
+        if punteggi.ndim != 2 or punteggi.shape[0] < punteggi.shape[1]:
+            raise ValueError("Servono almeno tanti nostri Pokémon quanti avversari")
+        # Massimizzare i punteggi equivale a minimizzarne l'opposto; le righe dell'algoritmo sono gli avversari
+        riga_per_avversario = _assegnamento_ungherese(-punteggi.T)
+
+        assegnamento = riga_per_avversario.tolist()  # assegnamento[j] = i
+        punteggio_totale = float(punteggi[riga_per_avversario, np.arange(punteggi.shape[1])].sum())
+        return assegnamento, punteggio_totale
+
+    @staticmethod
+    def assegnamento_ottimale_batch(matrici_punteggi, matrici_per_blocco: int = MATRICI_PER_BLOCCO_BATCH):
+        """
+        Assegnamento ottimale per una pila di matrici [k x n x m] (es. molte squadre avversarie contro
+        la stessa rosa), con n >= m. Restituisce due array: assegnamenti [k x m] (assegnamenti[t, j] = i)
+        e punteggi totali [k].
+
+        Con squadre piccole (6! = 720 permutazioni) tutte le permutazioni sono valutate in blocco:
+        un'unica raccolta di indici e una somma per blocco di matrici, poi argmax. A parità di punteggio
+        vince la permutazione lessicograficamente minore. Oltre MAX_PERMUTAZIONI_BATCH permutazioni
+        ogni matrice è risolta con l'algoritmo ungherese.
+        """
+        import numpy as np
+
+        matrici = np.asarray(matrici_punteggi, dtype=float)
+        if matrici.ndim != 3 or matrici.shape[1] < matrici.shape[2]:
+            raise ValueError("Serve una pila di matrici [k x n x m] con n >= m")
+        k, n, m = matrici.shape
+        assegnamenti = np.empty((k, m), dtype=np.intp)
+        punteggi = np.empty(k)
+
+        if math.perm(n, m) > MAX_PERMUTAZIONI_BATCH:
+            for t in range(k):
+                assegnamento, punteggi[t] = SolverScontro._assegnamento_ungherese(matrici[t])
+                assegnamenti[t] = assegnamento
+            return assegnamenti, punteggi
+
+        indici = _indici_permutazioni(n, m)
+        righe = indici - np.arange(m, dtype=np.intp) * n
+        # Trasposta e appiattita: la cella (riga i, avversario j) si trova in posizione j * n + i
+        trasposte = matrici.transpose(0, 2, 1).reshape(k, m * n)
+        for inizio in range(0, k, matrici_per_blocco):
+            blocco = trasposte[inizio:inizio + matrici_per_blocco]
+            totali = blocco[:, indici].sum(axis=2)
+            migliori = totali.argmax(axis=1)
+            assegnamenti[inizio:inizio + len(blocco)] = righe[migliori]
+            punteggi[inizio:inizio + len(blocco)] = totali[np.arange(len(blocco)), migliori]
+        return assegnamenti, punteggi
+
     @staticmethod
     def assegnamento_greedy(matrice_punteggi):
         """
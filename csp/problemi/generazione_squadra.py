@@ -1,24 +1,34 @@
 import logging
-from typing import Optional
+from collections import defaultdict
+from typing import Iterator, Optional
 from constraint import Problem, AllDifferentConstraint
-from entita.tipo_pokemon import TipoPokemonHelper
+from config.costanti_globali import LIMITE_TEMPO_CPSAT_SQUADRA, NUM_WORKER_CPSAT_SQUADRA
+from entita.tipo_pokemon import TipoPokemonHelper, ID_TIPO
 from utils.registro_log import setup_logger
 
 logger = setup_logger()
 logger.setLevel(logging.CRITICAL)
 
+# Backend per la generazione delle squadre personali
+BACKEND_GENERAZIONE_SQUADRA = ("constraint", "cpsat")
+
 class GeneratoreSquadre:
-    # Mappa globale Pokémon → lista tipi (primario, secondario se presente)
-    _mappa_pokemon_tipi = TipoPokemonHelper.ottieni_mappa_pokemon_tipi()
 
     @classmethod
     def genera_squadra_personale(cls, tipi_strategici: dict[str, set[str]],
-                                 squadra_precedente: set[str]) -> list[str]:
+                                 squadra_precedente: set[str], backend: str = "constraint",
+                                 limite_tempo: float = LIMITE_TEMPO_CPSAT_SQUADRA,
+                                 num_worker: int = NUM_WORKER_CPSAT_SQUADRA) -> list[str]:
         """
         Genera una squadra in base a tipi strategici forniti dall'utente.
         tipi_strategici: dict { tipo_primario: {tipi_secondari_ammissibili} }
         squadra_precedente: lista di Pokémon da evitare se possibile.
+        backend: "constraint" (backtracking di python-constraint, vincoli globali verificati solo
+        sulle squadre complete) oppure "cpsat" (OR-Tools CP-SAT con tutti i vincoli nel modello,
+        entro limite_tempo secondi e con num_worker thread di ricerca).
         """
+        if backend not in BACKEND_GENERAZIONE_SQUADRA:
+            raise ValueError(f"Backend non supportato: {backend} (ammessi: {BACKEND_GENERAZIONE_SQUADRA})")
         # Controllo che siano esattamente 6 tipi strategici (uno per slot)
         if len(tipi_strategici) != 6:
             raise ValueError(f"TIPI_STRATEGICI deve contenere esattamente 6 tipi, ma ne ha {len(tipi_strategici)}")
@@ -26,6 +36,7 @@ class GeneratoreSquadre:
         # Filtra Pokémon compatibili con ogni tipo strategico
         # chiave: uri del tipo -> valore: lista di uri dei pokemon con quel tipo in accordo con la struttura dati
         # tipi_strategici
+        mappa_pokemon_tipi = TipoPokemonHelper.ottieni_mappa_pokemon_tipi()
         domini_per_tipo : dict [str, list[str]] = cls._filtra_pokemon_per_tipo(tipi_strategici, pokemon_da_escludere = squadra_precedente)
 
         # Se per un tipo strategico non ci sono Pokémon disponibili → impossibile formare squadra
@@ -36,9 +47,12 @@ class GeneratoreSquadre:
             else:
                 logger.info(
                     f"Pokémon disponibili per il tipo strategico {tipo}: " +
-                    ", ".join(f"{uri}({', '.join(cls._mappa_pokemon_tipi[uri])})" for uri in dominio)
+                    ", ".join(f"{uri}({', '.join(mappa_pokemon_tipi[uri])})" for uri in dominio)
                 )
 
+        if backend == "cpsat":
+            return cls._risolvi_cpsat([domini_per_tipo[tipo] for tipo in tipi_strategici], limite_tempo, num_worker)
+
         # Costruisce il CSP
         problem = Problem()
 
@@ -62,22 +76,176 @@ class GeneratoreSquadre:
 
         return [soluzione[f"slot_{i}"] for i in range(6)]
 
+    @classmethod
+    def genera_squadre_diverse(cls, tipi_strategici: dict[str, set[str]], numero: int, distanza_minima: int = 1,
+                               squadra_precedente: set[str] = frozenset(),
+                               limite_tempo: float = LIMITE_TEMPO_CPSAT_SQUADRA,
+                               num_worker: int = NUM_WORKER_CPSAT_SQUADRA) -> Iterator[list[str]]:
+        """
+        Genera in modo pigro fino a `numero` squadre distinte per gli stessi tipi strategici,
+        con gli stessi vincoli di genera_squadra_personale.
+
+        Il modello CP-SAT è costruito una volta sola: dopo ogni squadra trovata viene aggiunto
+        un taglio che impone alle successive una distanza di Hamming (slot con un Pokémon diverso)
+        di almeno `distanza_minima` da essa, e il solver riparte sullo stesso modello.
+        La generazione si ferma prima di `numero` squadre quando non ne esistono altre abbastanza
+        diverse o una ricerca supera limite_tempo secondi.
+        """
+        if len(tipi_strategici) != 6:
+            raise ValueError(f"TIPI_STRATEGICI deve contenere esattamente 6 tipi, ma ne ha {len(tipi_strategici)}")
+        if not 1 <= distanza_minima <= len(tipi_strategici):
+            raise ValueError(f"La distanza minima deve essere tra 1 e {len(tipi_strategici)}, non {distanza_minima}")
+
+        from ortools.sat.python import cp_model
+
+        domini_per_tipo = cls._filtra_pokemon_per_tipo(tipi_strategici, pokemon_da_escludere=squadra_precedente)
+        for tipo, dominio in domini_per_tipo.items():
+            if not dominio:
+                logger.warning(f"Nessun Pokémon disponibile per il tipo strategico: {tipo}")
+                return
+
+        modello, scelte = cls._modello_cpsat([domini_per_tipo[tipo] for tipo in tipi_strategici])
+        uri_slot = [list(scelte_slot) for scelte_slot in scelte]
+        variabili_slot = [list(scelte_slot.values()) for scelte_slot in scelte]
+        # Indice del Pokémon scelto in ogni slot: la callback legge 6 interi invece di tutte le booleane
+        indici_slot = [modello.NewIntVar(0, len(variabili) - 1, f"indice_slot_{i}")
+                       for i, variabili in enumerate(variabili_slot)]
+        for indice, variabili in zip(indici_slot, variabili_slot):
+            modello.Add(indice == sum(j * variabile for j, variabile in enumerate(variabili)))
+
+        class _RaccoltaSquadre(cp_model.CpSolverSolutionCallback):
+            """Tiene le soluzioni abbastanza distanti da quelle già raccolte nella stessa ricerca."""
+
+            def __init__(self, richieste: int):
+                super().__init__()
+                self.richieste = richieste
+                self.squadre: list[tuple[int, ...]] = []
+
+            def on_solution_callback(self) -> None:
+                # Con più worker la callback può essere chiamata ancora dopo StopSearch
+                if len(self.squadre) >= self.richieste:
+                    return
+                squadra = tuple(self.Value(indice) for indice in indici_slot)
+                if all(sum(a != b for a, b in zip(squadra, raccolta)) >= distanza_minima
+                       for raccolta in self.squadre):
+                    self.squadre.append(squadra)
+                    if len(self.squadre) >= self.richieste:
+                        self.StopSearch()
+
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = limite_tempo
+        solver.parameters.num_workers = num_worker
+        # Con distanza 1 ogni soluzione enumerata è una nuova squadra: un'unica ricerca le produce tutte.
+        # Con distanze maggiori le soluzioni enumerate sono quasi tutte vicine tra loro e verrebbero scartate,
+        # quindi si prende una soluzione per ricerca e si lascia ai tagli il compito di allontanare la successiva
+        enumera = distanza_minima == 1
+        solver.parameters.enumerate_all_solutions = enumera
+
+        generate = 0
+        while generate < numero:
+            raccolta = _RaccoltaSquadre(numero - generate if enumera else 1)
+            stato = solver.Solve(modello, raccolta)
+            for squadra in raccolta.squadre:
+                yield [uri_slot[slot][indice] for slot, indice in enumerate(squadra)]
+                # Taglio di diversità: le squadre successive condividono al più 6 - distanza_minima slot con questa
+                modello.Add(sum(variabili_slot[slot][indice] for slot, indice in enumerate(squadra))
+                            <= len(squadra) - distanza_minima)
+            generate += len(raccolta.squadre)
+
+            # Modello impossibile, oppure enumerazione completata: ogni soluzione scartata è troppo vicina
+            # a una raccolta, quindi non ne restano altre
+            esaurite = stato == cp_model.INFEASIBLE or (enumera and stato == cp_model.OPTIMAL)
+            if generate < numero and (esaurite or not raccolta.squadre):
+                if esaurite:
+                    logger.warning(f"Squadre diverse esaurite dopo {generate} soluzioni")
+                else:
+                    logger.warning(f"Nessuna nuova squadra trovata entro il limite di {limite_tempo}s")
+                return
+
+    @classmethod
+    def _modello_cpsat(cls, domini: list[list[str]]):
+        """
+        Formulazione CP-SAT degli stessi vincoli del backend constraint: una variabile booleana
+        per ogni coppia (slot, Pokémon del dominio). Restituisce il modello e, per ogni slot,
+        la mappa Pokémon -> variabile.
+        """
+        # OR-Tools viene caricato solo quando si usa questo backend
+        from ortools.sat.python import cp_model
+
+        mappa_pokemon_tipi = TipoPokemonHelper.ottieni_mappa_pokemon_tipi()
+        modello = cp_model.CpModel()
+        scelte = [{uri: modello.NewBoolVar(f"slot_{i}_{j}") for j, uri in enumerate(dominio)}
+                  for i, dominio in enumerate(domini)]
+
+        per_pokemon = defaultdict(list)
+        per_tipo_primario = defaultdict(list)
+        doppio_tipo = []
+        for scelte_slot in scelte:
+            # Un Pokémon per slot
+            modello.AddExactlyOne(scelte_slot.values())
+            for uri, variabile in scelte_slot.items():
+                tipi = mappa_pokemon_tipi[uri]
+                per_pokemon[uri].append(variabile)
+                per_tipo_primario[tipi[0]].append(variabile)
+                if len(tipi) > 1 and tipi[1] is not None:
+                    doppio_tipo.append(variabile)
+
+        # Tutti i Pokémon devono essere diversi
+        for variabili in per_pokemon.values():
+            if len(variabili) > 1:
+                modello.AddAtMostOne(variabili)
+
+        # Massimo 2 Pokémon con lo stesso tipo primario, almeno 3 tipi primari distinti
+        tipi_primari_usati = []
+        for tipo, variabili in per_tipo_primario.items():
+            modello.Add(sum(variabili) <= 2)
+            usato = modello.NewBoolVar(f"primario_{len(tipi_primari_usati)}")
+            modello.Add(sum(variabili) >= 1).OnlyEnforceIf(usato)
+            tipi_primari_usati.append(usato)
+        modello.Add(sum(tipi_primari_usati) >= 3)
+
+        # Almeno 2 Pokémon con tipo secondario
+        modello.Add(sum(doppio_tipo) >= 2)
+        return modello, scelte
+
+    @classmethod
+    def _risolvi_cpsat(cls, domini: list[list[str]], limite_tempo: float, num_worker: int) -> list[str]:
+        from ortools.sat.python import cp_model
+
+        modello, scelte = cls._modello_cpsat(domini)
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = limite_tempo
+        solver.parameters.num_workers = num_worker
+        stato = solver.Solve(modello)
+
+        if stato in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return [next(uri for uri, variabile in scelte_slot.items() if solver.BooleanValue(variabile))
+                    for scelte_slot in scelte]
+        if stato == cp_model.INFEASIBLE:
+            logger.warning("Nessuna squadra trovata con i vincoli attuali")
+        else:
+            logger.warning(f"Nessuna squadra trovata entro il limite di {limite_tempo}s")
+        return []
+
     @classmethod
     def genera_squadra_capo_palestra(cls, tipo_tema: str) -> list[str]:
         """
         Genera una squadra a tema per un capo palestra.
         Richiede almeno 2 Pokémon con doppio tipo.
         """
-        # Lista di Pokémon che hanno il tipo-tema come primario o secondario
-        lista_pokemon = [
-            uri for uri, tipi in cls._mappa_pokemon_tipi.items()
-            if tipo_tema in tipi
-        ]
+        mappa_pokemon_tipi = TipoPokemonHelper.ottieni_mappa_pokemon_tipi()
+        # Lista di Pokémon che hanno il tipo-tema come primario o secondario (dall'indice inverso tipo -> specie)
+        id_tema = ID_TIPO.get(tipo_tema)
+        if id_tema is not None:
+            pokemon_per_id = TipoPokemonHelper.ottieni_pokemon_per_id()
+            lista_pokemon = [pokemon_per_id[id_pokemon] for id_pokemon in TipoPokemonHelper.id_pokemon_con_tipo(id_tema)]
+        else:
+            lista_pokemon = [uri for uri, tipi in mappa_pokemon_tipi.items() if tipo_tema in tipi]
 
         logger.debug(f"Pokémon compatibili con {tipo_tema}: {len(lista_pokemon)}")
 
         # Conta quanti di questi hanno doppio tipo
-        num_doppio_tipo = sum(1 for uri in lista_pokemon if len(cls._mappa_pokemon_tipi[uri]) > 1)
+        num_doppio_tipo = sum(1 for uri in lista_pokemon if len(mappa_pokemon_tipi[uri]) > 1)
 
         # Vincolo minimo: almeno 6 Pokémon disponibili e almeno 2 con doppio tipo
         if len(lista_pokemon) < 6 or num_doppio_tipo < 2:
@@ -113,23 +281,19 @@ class GeneratoreSquadre:
         - se il set dei secondari ammessi non è vuoto, devono avere almeno un tipo
           del set in una qualsiasi posizione (primario o secondario)
         """
-        domini_per_tipo = {tipo: [] for tipo in tipi_strategici}
-
-        for uri_pokemon, tipi_pokemon in cls._mappa_pokemon_tipi.items():
-            if uri_pokemon in pokemon_da_escludere:
-                continue  # Pokémon escluso
-
-            for tipo_richiesto, secondari_ammissibili in tipi_strategici.items():
-                # Deve avere il tipo richiesto
-                if tipo_richiesto in tipi_pokemon:
-                    # Se non ci sono restrizioni sui secondari → accettalo
-                    if not secondari_ammissibili:
-                        domini_per_tipo[tipo_richiesto].append(uri_pokemon)
-                    else:
-                        # Deve avere almeno un tipo secondario ammesso in qualsivoglia posizione diversa dal tipo richiesto
-                        altri_tipi = [t for t in tipi_pokemon if t != tipo_richiesto]
-                        if any(t in secondari_ammissibili for t in altri_tipi):
-                            domini_per_tipo[tipo_richiesto].append(uri_pokemon)
+        pokemon_per_id = TipoPokemonHelper.ottieni_pokemon_per_id()
+        domini_per_tipo = {}
+        for tipo_richiesto, secondari_ammissibili in tipi_strategici.items():
+            id_richiesto = ID_TIPO.get(tipo_richiesto)
+            if id_richiesto is None:
+                domini_per_tipo[tipo_richiesto] = []  # tipo fuori dall'enum: nessun Pokémon lo possiede come id
+                continue
+            # Se non ci sono restrizioni sui secondari (None) bastano le specie del tipo richiesto, altrimenti
+            # le specie che affiancano al tipo richiesto almeno un secondario ammesso in qualsivoglia posizione
+            maschera_secondari = TipoPokemonHelper.maschera_uri(secondari_ammissibili) if secondari_ammissibili else None
+            id_compatibili = TipoPokemonHelper.id_pokemon_compatibili(id_richiesto, maschera_secondari)
+            domini_per_tipo[tipo_richiesto] = [pokemon_per_id[id_pokemon] for id_pokemon in id_compatibili
+                                               if pokemon_per_id[id_pokemon] not in pokemon_da_escludere]
 
         return domini_per_tipo
 
@@ -141,13 +305,14 @@ class GeneratoreSquadre:
         - massimo 2 Pokémon con lo stesso tipo primario
         - almeno 2 Pokémon con tipo secondario
         """
+        mappa_pokemon_tipi = TipoPokemonHelper.ottieni_mappa_pokemon_tipi()
         # estrae il primo elemento della lista (il primo tipo secondo la KG)
-        tipi_primari = [cls._mappa_pokemon_tipi[uri][0] for uri in uri_squadra]
+        tipi_primari = [mappa_pokemon_tipi[uri][0] for uri in uri_squadra]
         # estrae il secondo elemento della lista dei tipi (il secondo tipi secondo la KG)
         tipi_secondari = [
-            cls._mappa_pokemon_tipi[uri][1]
+            mappa_pokemon_tipi[uri][1]
             for uri in uri_squadra
-            if len(cls._mappa_pokemon_tipi[uri]) > 1 and cls._mappa_pokemon_tipi[uri][1] is not None
+            if len(mappa_pokemon_tipi[uri]) > 1 and mappa_pokemon_tipi[uri][1] is not None
         ]
 
         # Minimo 3 tipi primari diversi
@@ -177,5 +342,6 @@ class GeneratoreSquadre:
         lunghezza 2 => pokemon ha due tipi. se la somma produce 2 allora effettivamente
         ci sono ALMENO due pokemon
         """
-        doppio_tipo = sum(1 for uri in pokemon_uri if len(cls._mappa_pokemon_tipi[uri]) > 1)
+        mappa_pokemon_tipi = TipoPokemonHelper.ottieni_mappa_pokemon_tipi()
+        doppio_tipo = sum(1 for uri in pokemon_uri if len(mappa_pokemon_tipi[uri]) > 1)
         return doppio_tipo >= 2
@@ -0,0 +1,124 @@
+from typing import Iterable, Optional
+
+from config.costanti_globali import CACHE_POOL_SET_MOSSE_DIR, DIMENSIONE_POOL_SET_MOSSE, NUM_SET_MOSSE, \
+    PESI_VALUTAZIONE, VERSIONE_DATASET_KG, Metrica
+from entita.mossa import CatalogoMosse, Mossa
+from entita.set_mosse import SetMosse, ValutatoreSetMosse
+from entita.tipo_pokemon import URI_TIPI
+from problemi.assegnazione_mosse_locale import AssegnatoreMosseLocale, RisolutoreMossePropagazione
+from utils.cache_disco import CacheDisco
+from utils.registro_log import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class PoolSetMosse:
+    """
+    Pool precalcolati di quadruple di mosse: per ogni combinazione di tipi le `dimensione` migliori
+    quadruple ammissibili secondo ValutatoreSetMosse, calcolate una volta con
+    RisolutoreMossePropagazione.migliori e salvate su disco come id delle mosse.
+
+    Le combinazioni sono coppie ordinate (primario, secondario): il tipo primario decide lo slot 0 e
+    il primo tipo compatibile, quindi (A, B) e (B, A) hanno domini diversi.
+    La chiave di ogni pool contiene versione del dataset, impronta del catalogo mosse, pesi del
+    valutatore e vincoli delle quadruple: se uno di questi cambia la voce salvata non viene più
+    trovata e il pool viene ricalcolato alla prima richiesta.
+    """
+
+    def __init__(self, pesi: dict[Metrica, int] = PESI_VALUTAZIONE, dimensione: int = DIMENSIONE_POOL_SET_MOSSE,
+                 cartella: str = CACHE_POOL_SET_MOSSE_DIR):
+        self.valutatore = ValutatoreSetMosse(pesi)
+        self.dimensione = dimensione
+        self._cache = CacheDisco(cartella)
+        # Pool già letti o calcolati in questa esecuzione, per chiave completa
+        self._pool: dict[str, list[tuple[int, ...]]] = {}
+
+    @staticmethod
+    def impronta_pesi(pesi: dict[Metrica, int]) -> str:
+        return ";".join(f"{metrica.value}={peso}" for metrica, peso in sorted(pesi.items(), key=lambda v: v[0].value))
+
+    def pool(self, tipo1: str, tipo2: Optional[str] = None) -> list[SetMosse]:
+        """Quadruple del pool di una combinazione di tipi, dalla migliore alla peggiore."""
+        catalogo = CatalogoMosse.ottieni()
+        set_mosse = [SetMosse(*(catalogo.mossa(id_mossa) for id_mossa in quadrupla))
+                     for quadrupla in self._ids_pool(tipo1, tipo2)]
+        return sorted(set_mosse, key=self.valutatore.valuta, reverse=True)
+
+    def set_disgiunti(self, tipo1: str, tipo2: Optional[str] = None, numero: int = NUM_SET_MOSSE) -> list[SetMosse]:
+        """
+        Fino a `numero` quadruple a due a due disgiunte, come quelle di genera_set_mosse: scelte in ordine
+        dal pool e, se non bastano, completate da genera_set_mosse escludendo le mosse già usate
+        (scartando le quadruple che non rispettano i vincoli).
+        Solleva ValueError se il pool è vuoto e i domini del Pokémon non hanno mosse.
+        """
+        scelti: list[SetMosse] = []
+        usate: set[Mossa] = set()
+        for set_mosse in self.pool(tipo1, tipo2):
+            if len(scelti) == numero:
+                break
+            if usate.isdisjoint(set_mosse.lista_mosse()):
+                scelti.append(set_mosse)
+                usate.update(set_mosse.lista_mosse())
+
+        if len(scelti) < numero:
+            try:
+                aggiunti = AssegnatoreMosseLocale.genera_set_mosse(tipo1, tipo2, numero - len(scelti),
+                                                                   self.valutatore, mosse_escluse=usate)
+            except ValueError:
+                if not scelti:
+                    raise
+                aggiunti = []
+            # La quadrupla di ripiego di genera_set_mosse (prima mossa di ogni dominio) serve solo
+            # se il pool non ha dato nulla
+            scelti += [set_mosse for set_mosse in aggiunti
+                       if not scelti or AssegnatoreMosseLocale.quadrupla_ammissibile(*set_mosse.lista_mosse())]
+        return sorted(scelti, key=self.valutatore.valuta, reverse=True)
+
+    def precalcola(self, combinazioni: Optional[Iterable[tuple[str, Optional[str]]]] = None) -> int:
+        """
+        Calcola e salva i pool delle combinazioni indicate (default: ogni tipo singolo e ogni coppia ordinata).
+        Restituisce il numero di pool calcolati, cioè non già presenti in cache.
+        """
+        if combinazioni is None:
+            combinazioni = [(tipo1, None) for tipo1 in URI_TIPI] + \
+                           [(tipo1, tipo2) for tipo1 in URI_TIPI for tipo2 in URI_TIPI if tipo2 != tipo1]
+        calcolati = 0
+        for tipo1, tipo2 in combinazioni:
+            chiave = self._chiave(tipo1, tipo2)
+            if chiave not in self._pool and self._cache.leggi(chiave) is None:
+                self._ids_pool(tipo1, tipo2)
+                calcolati += 1
+        return calcolati
+
+    def svuota(self) -> None:
+        """Elimina i pool in memoria e su disco."""
+        self._pool.clear()
+        self._cache.svuota()
+
+    def _chiave(self, tipo1: str, tipo2: Optional[str]) -> str:
+        return CacheDisco.calcola_chiave(VERSIONE_DATASET_KG, CatalogoMosse.ottieni().impronta(),
+                                         self.impronta_pesi(self.valutatore.pesi), str(self.dimensione),
+                                         repr(AssegnatoreMosseLocale.VINCOLI_SOMMA),
+                                         repr(AssegnatoreMosseLocale.CATEGORIE_RICHIESTE), tipo1, tipo2 or "")
+
+    def _ids_pool(self, tipo1: str, tipo2: Optional[str]) -> list[tuple[int, ...]]:
+        chiave = self._chiave(tipo1, tipo2)
+        ids = self._pool.get(chiave)
+        if ids is None:
+            ids = self._cache.leggi(chiave)
+            if ids is None:
+                ids = self._calcola(tipo1, tipo2)
+                self._cache.scrivi(chiave, ids)
+            self._pool[chiave] = ids
+        return ids
+
+    def _calcola(self, tipo1: str, tipo2: Optional[str]) -> list[tuple[int, ...]]:
+        domini = AssegnatoreMosseLocale._costruisci_domini(set(), tipo1, tipo2)
+        if any(len(dominio) == 0 for dominio in domini):
+            logger.warning(f"Pool vuoto per {tipo1}/{tipo2}: dominio senza mosse")
+            return []
+        risolutore = RisolutoreMossePropagazione(domini, AssegnatoreMosseLocale.VINCOLI_SOMMA,
+                                                 AssegnatoreMosseLocale.CATEGORIE_RICHIESTE)
+        quadruple = risolutore.migliori(self.dimensione, self.valutatore.valuta_mossa)
+        logger.debug(f"Pool {tipo1}/{tipo2}: {len(quadruple)} quadruple, {risolutore.nodi_esplorati} nodi")
+        return [tuple(mossa.id for mossa in quadrupla) for quadrupla in quadruple]
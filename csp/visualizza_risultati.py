@@ -1,7 +1,5 @@
 from typing import List, Optional
-from matplotlib import pyplot as plt
 import logging
-from tabulate import tabulate
 from entita.nodo_ricerca_locale import NodoRicercaLocale
 from entita.tipo_pokemon import TipoPokemonHelper
 
@@ -31,6 +29,8 @@ class StatisticheRicerca:
                 f"iterazioni={self.iterazioni}, tempo={self.tempo_esecuzione:.4f}s")
 
     def plot_valutazioni(self, valore_massimo_assoluto: Optional[float] = None):
+        # matplotlib è importato solo quando serve un grafico: caricarlo all'import costa centinaia di ms
+        from matplotlib import pyplot as plt
         # Linea principale: andamento delle valutazioni
         plt.plot(self.valori_iterazioni, label="Valutazioni nodo", linewidth=0.7)
 
@@ -102,6 +102,7 @@ class RisultatiEsperimento:
 
     def plot_confronto(self):
         """Plotta l’andamento di tutte le strategie confrontate"""
+        from matplotlib import pyplot as plt
         for stat in self.statistiche:
             label = stat.algoritmo
             plt.plot(stat.valori_iterazioni, label=label, linewidth=1)
@@ -130,8 +131,6 @@ class VisualizzatoreRisultati:
     risultati assegnamenti, matrici punteggi e confronti.
     """
 
-    mappa_pokemon_tipi = TipoPokemonHelper.ottieni_mappa_pokemon_tipi()
-
     @staticmethod
     def normalizza_uri(uri_pokemon: str) -> str:
         return uri_pokemon.rsplit('/', 1)[-1]
@@ -140,7 +139,7 @@ class VisualizzatoreRisultati:
     def visualizza_squadre_generata(cls, label: str, squadra_pokemon: list[str]) -> None:
         print(f"\n--- {label} ---")
         for i, uri_pokemon in enumerate(squadra_pokemon):
-            tipi = cls.mappa_pokemon_tipi.get(uri_pokemon, [])
+            tipi = TipoPokemonHelper.ottieni_tipi_pokemon(uri_pokemon)
             tipi_leggibili = "/".join(VisualizzatoreRisultati.normalizza_uri(t) for t in tipi)
             print(f"pokemon_{i}: {uri_pokemon}  →  tipi: {tipi_leggibili if tipi else 'N/D'}")
 
@@ -176,6 +175,8 @@ class VisualizzatoreRisultati:
         headers = ["Avversario", label_ass1, label_ass2, f"Differenza {label_ass2} - {label_ass1}"]
 
         print("\n📊 Confronto tra assegnamenti\n")
+        # tabulate è importato solo quando si stampa una tabella, come matplotlib per i grafici
+        from tabulate import tabulate
         print(tabulate(table, headers=headers, tablefmt="fancy_grid"))
 
     @classmethod
@@ -208,6 +209,7 @@ class VisualizzatoreRisultati:
             rows.append([""] * len(headers))
 
         print("\n Set di mosse generati dal CSP locale (colonne separate per mossa)\n")
+        from tabulate import tabulate
         print(tabulate(rows, headers=headers, tablefmt="fancy_grid",
                        colalign=("left", "center", "left", "left", "left", "left", "right")))
 
@@ -229,6 +231,7 @@ class VisualizzatoreRisultati:
 
         print("\n=== Soluzione globale ottimizzata per le mosse ===")
         print("\nAssegnazione delle mosse dal solver globale\n")
+        from tabulate import tabulate
         print(tabulate(rows, headers=headers, tablefmt="fancy_grid", colalign=("left", "left", "left", "left", "left")))
 
     @classmethod
@@ -277,6 +280,7 @@ class VisualizzatoreRisultati:
         print("\n Matrice dei punteggi di efficacia")
         print("   Cella [i][j] = max_eff(nostro_i → avversario_j) - max_eff(avversario_j → nostro_i)")
         print("   Valore > 0 → vantaggio nostro | Valore < 0 → vantaggio avversario\n")
+        from tabulate import tabulate
         print(tabulate(table, headers=header, tablefmt="fancy_grid"))
 
     @classmethod
@@ -319,4 +323,5 @@ class VisualizzatoreRisultati:
         print(f"Algoritmo di ricerca utilizzato: {alg_ricerca}\n")
 
         headers = ["Scontro #", "Soluzione trovata", "Lunghezza"]
+        from tabulate import tabulate
         print(tabulate(riepilogo, headers=headers, tablefmt="fancy_grid", stralign="center", numalign="center"))
\ No newline at end of file
@@ -1,37 +1,313 @@
+import hashlib
+import sys
+import threading
+from array import array
+from bisect import bisect_right
+from collections.abc import Sequence
 from pprint import pprint
+from typing import Iterable, Iterator, NamedTuple
+
 from config.costanti_globali import QUERY_SPARQL_TUTTE_MOSSE
 from entita.tipo_pokemon import TipoPokemon
-from utils.client_sparql import esegui_query_sparql
+from utils.client_sparql import itera_righe_sparql
 
-class Mossa:
-    # Cache interna tipo_mossa -> set di Mossa
-    _mappa_mosse_tipo: dict[str, set["Mossa"]] | None = None
 
-    def __init__(self, move, base_power, precisione, pp, tipo_mossa, categoria_mossa):
+class RigaMossaKG(NamedTuple):
+    """Schema di una riga della query tutte_mosse: i default valgono per le variabili non legate."""
+    move: str = "Unknown move"
+    basePower: int = 0
+    accuracy: int = 0
+    pp: int = 0
+    moveType: str = "N/A"
+    catMove: str = "N/A"  # special, fisico, status
+
+
+# Soglie delle fasce di potenza dell'indice: 0 = nessun danno, 1 = < 90, 2 = 90..120, 3 = > 120
+# (le stesse soglie usate per i PP in SetMosse.inizializza_pp_da_mosse)
+SOGLIE_FASCE_POTENZA = (1, 90, 121)
+
+# Per ogni valore di un byte, le posizioni dei bit accesi (usato per scorrere i bitset)
+_BIT_ACCESI = tuple(tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256))
+
+
+class CatalogoMosse:
+    """
+    Catalogo di tutte le mosse del KG memorizzato per colonne.
+
+    Ogni mossa è identificata da un intero (id) e i suoi attributi stanno in array tipizzati paralleli
+    (potenze[id], precisioni[id], pp[id], ...); uri_mosse[id] è l'URI della mossa. Gli URI di tipo e
+    categoria, ripetuti su molte mosse, sono internati: ogni stringa è salvata una sola volta in `uri`
+    e le colonne id_tipo / id_categoria contengono solo il suo indice.
+
+    Le mosse sono ordinate per tipo, quindi quelle di uno stesso tipo occupano id contigui e
+    indici_per_tipo restituisce un range senza copiare nulla. Le righe duplicate (stessa mossa,
+    tipo e categoria, es. per più classi nel KG) vengono registrate una volta sola.
+    Dopo la costruzione il catalogo non viene più modificato: indice e impronta restano validi.
+    """
+
+    # Catalogo condiviso, caricato dal KG alla prima richiesta
+    _istanza: "CatalogoMosse | None" = None
+    _lock_istanza = threading.Lock()
+
+    def __init__(self, righe: Iterable[RigaMossaKG]):
+        self.uri: list[str] = []
+        self._indice_uri: dict[str, int] = {}
+
+        # Raggruppa per tipo mantenendo l'ordine di prima comparsa, scartando i duplicati
+        per_tipo: dict[int, list[tuple[str, int, int, int, int]]] = {}
+        viste: set[tuple[str, int, int]] = set()
+        for move, base_power, precisione, pp, tipo_mossa, categoria_mossa in righe:
+            id_tipo, id_categoria = self.interna(tipo_mossa), self.interna(categoria_mossa)
+            if (move, id_tipo, id_categoria) in viste:
+                continue
+            viste.add((move, id_tipo, id_categoria))
+            per_tipo.setdefault(id_tipo, []).append((move, base_power, precisione, pp, id_categoria))
+
+        self.uri_mosse: list[str] = []
+        self.potenze = array("i")
+        self.precisioni = array("i")
+        self.pp = array("i")
+        self.id_tipo = array("H")
+        self.id_categoria = array("H")
+        self._intervallo_tipo: dict[str, range] = {}
+        self._indice: IndiceMosse | None = None
+        self._impronta: str | None = None
+        for id_tipo, mosse in per_tipo.items():
+            inizio = len(self.uri_mosse)
+            for move, base_power, precisione, pp, id_categoria in mosse:
+                self.uri_mosse.append(move)
+                self.potenze.append(base_power)
+                self.precisioni.append(precisione)
+                self.pp.append(pp)
+                self.id_tipo.append(id_tipo)
+                self.id_categoria.append(id_categoria)
+            self._intervallo_tipo[self.uri[id_tipo]] = range(inizio, len(self.uri_mosse))
+
+    @classmethod
+    def ottieni(cls) -> "CatalogoMosse":
+        """Catalogo condiviso: interroga il KG solo alla prima chiamata, in modo sicuro tra thread."""
+        if cls._istanza is None:
+            with cls._lock_istanza:
+                if cls._istanza is None:
+                    # Le righe arrivano già convertite (interi inclusi) direttamente dallo stream della risposta
+                    cls._istanza = cls(itera_righe_sparql(QUERY_SPARQL_TUTTE_MOSSE, RigaMossaKG))
+        return cls._istanza
+
+    @classmethod
+    def imposta(cls, catalogo: "CatalogoMosse") -> None:
+        """Sostituisce il catalogo condiviso senza interrogare il KG (es. un catalogo sintetico per benchmark)."""
+        with cls._lock_istanza:
+            cls._istanza = catalogo
+
+    def interna(self, uri: str) -> int:
+        """Restituisce l'indice di un URI nella tabella, aggiungendolo se non è ancora presente."""
+        indice = self._indice_uri.get(uri)
+        if indice is None:
+            indice = len(self.uri)
+            self.uri.append(sys.intern(uri))
+            self._indice_uri[uri] = indice
+        return indice
+
+    def __len__(self) -> int:
+        return len(self.uri_mosse)
+
+    def mossa(self, id_mossa: int) -> "Mossa":
+        return Mossa(self, id_mossa)
+
+    def indici_per_tipo(self, tipo_mossa: str) -> range:
+        """Id delle mosse di un tipo: un range sugli array del catalogo, vuoto se il tipo non ha mosse."""
+        return self._intervallo_tipo.get(tipo_mossa, range(0))
+
+    def mosse_per_tipo(self, tipo_mossa: str) -> "VistaMosse":
+        return VistaMosse(self, self.indici_per_tipo(tipo_mossa))
+
+    def tipi(self) -> list[str]:
+        return list(self._intervallo_tipo)
+
+    def impronta(self) -> str:
         """
-        Rappresenta una mossa Pokémon.
+        Hash del contenuto del catalogo (mosse, attributi, tipi e categorie, nell'ordine degli id):
+        usato nelle chiavi delle cache derivate dalle mosse, che cambiano con il catalogo.
         """
-        self.move = move #uri
-        self.base_power = base_power
-        self.precisione = precisione
-        self.pp = pp
-        self.tipo_mossa = tipo_mossa       # es. "URI:Electric"
-        self.categoria_mossa = categoria_mossa  # es. "Special", "Physical", "Status"
+        impronta = self._impronta
+        if impronta is None:
+            h = hashlib.sha256()
+            for uri in (*self.uri, *self.uri_mosse):
+                h.update(uri.encode("utf-8"))
+                h.update(b"\0")
+            for colonna in (self.potenze, self.precisioni, self.pp, self.id_tipo, self.id_categoria):
+                h.update(colonna.tobytes())
+            impronta = self._impronta = h.hexdigest()
+        return impronta
+
+    def indice(self) -> "IndiceMosse":
+        """Indice a bitset del catalogo, costruito alla prima richiesta: il catalogo non cambia dopo la costruzione."""
+        indice = self._indice
+        if indice is None:
+            indice = self._indice = IndiceMosse(self)
+        return indice
+
+    def bitset(self, mosse: Iterable["Mossa"]) -> int:
+        """Bitset (intero con il bit id acceso per ogni mossa) di un insieme di mosse di questo catalogo."""
+        bitset = 0
+        for mossa in mosse:
+            bitset |= 1 << mossa.id
+        return bitset
+
+    def mosse_da_bitset(self, bitset: int) -> list["Mossa"]:
+        """Mosse corrispondenti ai bit accesi, in ordine di id (quindi raggruppate per tipo)."""
+        mosse = []
+        if not bitset:
+            return mosse
+        # Salta i byte vuoti iniziali (le mosse di un tipo stanno in un blocco contiguo di id)
+        primo_byte = ((bitset & -bitset).bit_length() - 1) >> 3
+        bitset >>= primo_byte << 3
+        for posizione, byte in enumerate(bitset.to_bytes((bitset.bit_length() + 7) >> 3, "little"), primo_byte):
+            if byte:
+                base = posizione << 3
+                for bit in _BIT_ACCESI[byte]:
+                    mosse.append(Mossa(self, base + bit))
+        return mosse
+
 
-    def set_base_power(self, base_power):
-        self.base_power = base_power
+class IndiceMosse:
+    """
+    Indice multi-chiave del CatalogoMosse: per ogni tipo, categoria e fascia di potenza un bitset
+    con un bit per id di mossa, più il bitset delle mosse valide (precisione > 0 e PP > 1).
+    Le interrogazioni diventano operazioni tra interi (AND / OR / AND NOT) invece di scansioni di liste.
+    """
+
+    def __init__(self, catalogo: CatalogoMosse):
+        self.catalogo = catalogo
+        self.tutte = (1 << len(catalogo)) - 1
+        # Le mosse di un tipo hanno id contigui: il bitset è un blocco di bit a partire dall'inizio del range
+        self._per_tipo = {tipo: ((1 << len(intervallo)) - 1) << intervallo.start
+                          for tipo, intervallo in catalogo._intervallo_tipo.items()}
+
+        per_categoria: dict[int, list[int]] = {}
+        per_fascia: list[list[int]] = [[] for _ in range(len(SOGLIE_FASCE_POTENZA) + 1)]
+        valide = []
+        for id_mossa in range(len(catalogo)):
+            per_categoria.setdefault(catalogo.id_categoria[id_mossa], []).append(id_mossa)
+            per_fascia[bisect_right(SOGLIE_FASCE_POTENZA, catalogo.potenze[id_mossa])].append(id_mossa)
+            if catalogo.precisioni[id_mossa] > 0 and catalogo.pp[id_mossa] > 1:
+                valide.append(id_mossa)
+
+        self._per_categoria = {catalogo.uri[id_categoria]: self._bitset_da_id(ids)
+                               for id_categoria, ids in per_categoria.items()}
+        self._per_fascia = [self._bitset_da_id(ids) for ids in per_fascia]
+        self.valide = self._bitset_da_id(valide)
+
+    def per_tipo(self, tipo_mossa: str) -> int:
+        return self._per_tipo.get(tipo_mossa, 0)
+
+    def per_categoria(self, categoria_mossa: str) -> int:
+        return self._per_categoria.get(categoria_mossa, 0)
+
+    def per_fascia_potenza(self, fascia: int) -> int:
+        """Bitset delle mosse nella fascia indicata (vedi SOGLIE_FASCE_POTENZA)."""
+        return self._per_fascia[fascia]
+
+    def interroga(self, tipo: str | None = None, categoria: str | None = None, fascia_potenza: int | None = None,
+                  solo_valide: bool = True, escluse: int = 0) -> int:
+        """Bitset delle mosse che soddisfano tutte le chiavi indicate, tolte quelle in `escluse`."""
+        bitset = self.valide if solo_valide else self.tutte
+        if tipo is not None:
+            bitset &= self.per_tipo(tipo)
+        if categoria is not None:
+            bitset &= self.per_categoria(categoria)
+        if fascia_potenza is not None:
+            bitset &= self.per_fascia_potenza(fascia_potenza)
+        return bitset & ~escluse
+
+    @staticmethod
+    def _bitset_da_id(ids: list[int]) -> int:
+        # Costruzione in tempo lineare: i bit vengono accesi in un buffer di byte convertito una sola volta
+        buffer = bytearray((ids[-1] >> 3) + 1 if ids else 0)
+        for id_mossa in ids:
+            buffer[id_mossa >> 3] |= 1 << (id_mossa & 7)
+        return int.from_bytes(buffer, "little")
+
+
+class VistaMosse(Sequence):
+    """
+    Sequenza in sola lettura di mosse del catalogo (es. tutte quelle di un tipo).
+    Non copia nulla: gli oggetti Mossa vengono creati solo quando si accede agli elementi.
+    """
+    __slots__ = ("catalogo", "indici")
+
+    def __init__(self, catalogo: CatalogoMosse, indici: range):
+        self.catalogo = catalogo
+        self.indici = indici
+
+    def __len__(self) -> int:
+        return len(self.indici)
+
+    def __getitem__(self, posizione):
+        if isinstance(posizione, slice):
+            return VistaMosse(self.catalogo, self.indici[posizione])
+        return Mossa(self.catalogo, self.indici[posizione])
+
+    def __iter__(self) -> Iterator["Mossa"]:
+        catalogo = self.catalogo
+        for id_mossa in self.indici:
+            yield Mossa(catalogo, id_mossa)
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class Mossa:
+    """
+    Rappresenta una mossa Pokémon come vista su una riga del CatalogoMosse:
+    contiene solo il riferimento al catalogo e l'id, gli attributi sono letti dalle colonne.
+    """
+    __slots__ = ("catalogo", "id")
+
+    def __init__(self, catalogo: CatalogoMosse, id_mossa: int):
+        self.catalogo = catalogo
+        self.id = id_mossa
+
+    @property
+    def move(self) -> str:
+        return self.catalogo.uri_mosse[self.id]  # uri
+
+    @property
+    def base_power(self) -> int:
+        return self.catalogo.potenze[self.id]
+
+    @property
+    def precisione(self) -> int:
+        return self.catalogo.precisioni[self.id]
+
+    @property
+    def pp(self) -> int:
+        return self.catalogo.pp[self.id]
+
+    @property
+    def tipo_mossa(self) -> str:
+        return self.catalogo.uri[self.catalogo.id_tipo[self.id]]  # es. "URI:Electric"
+
+    @property
+    def categoria_mossa(self) -> str:
+        return self.catalogo.uri[self.catalogo.id_categoria[self.id]]  # es. "Special", "Physical", "Status"
 
     def __eq__(self, other) -> bool:
         if not isinstance(other, Mossa):
             return False
-        # Due mosse sono uguali se hanno lo stesso nome, tipo e categoria
-        return (self.move == other.move
-                and self.tipo_mossa == other.tipo_mossa
-                and self.categoria_mossa == other.categoria_mossa)
+        # Due mosse sono uguali se hanno lo stesso nome, tipo e categoria: nel catalogo equivale allo stesso id
+        return self.id == other.id and self.catalogo is other.catalogo
 
     def __hash__(self):
         # Necessario per usare la mossa in set/dizionario e AllDifferentConstraint
-        return hash((self.move, self.tipo_mossa))
+        return self.id
+
+    def __copy__(self) -> "Mossa":
+        return self
+
+    def __deepcopy__(self, memo) -> "Mossa":
+        # Una vista non va duplicata: copiarla in profondità copierebbe l'intero catalogo
+        return self
 
     def __repr__(self):
         return (
@@ -41,39 +317,12 @@ class Mossa:
         )
 
     @classmethod
-    def ottieni_mosse_per_tipo(cls, tipo_mossa: str) -> list["Mossa"]:
+    def ottieni_mosse_per_tipo(cls, tipo_mossa: str) -> VistaMosse:
         """
-        Restituisce tutte le mosse di un certo tipo (es. 'Electric').
-        Usa cache interna per non interrogare più volte il KG.
+        Restituisce tutte le mosse di un certo tipo (es. 'Electric') come vista sul catalogo condiviso.
+        Il KG viene interrogato una sola volta; la vista non copia le mosse.
         """
-        # Funzione annidata: recupera tutte le mosse dal KG
-        def _ottieni_mosse_da_kg() -> list["Mossa"]:
-            risultati = esegui_query_sparql(QUERY_SPARQL_TUTTE_MOSSE)
-            _mosse = []
-            for r in risultati:
-                move = r.get("move", {}).get("value", "Unknown move")
-                base_power = int(r.get("basePower", {}).get("value", 0))
-                accuracy = int(r.get("accuracy", {}).get("value", 0))
-                pp = int(r.get("pp", {}).get("value", 0))
-                tipo = r.get("moveType", {}).get("value", "N/A")
-                categoria = r.get("catMove", {}).get("value", "N/A") # special, fisico, status
-                _mosse.append(Mossa(move, base_power, accuracy, pp, tipo, categoria))
-            return _mosse
-
-        # Se la cache non è inizializzata, popolala
-        if cls._mappa_mosse_tipo is None:
-            cls._mappa_mosse_tipo = {}
-            mosse = _ottieni_mosse_da_kg()
-
-            # Organizza per tipo
-            for mossa in mosse:
-                tipo = mossa.tipo_mossa
-                if tipo not in cls._mappa_mosse_tipo:
-                    cls._mappa_mosse_tipo[tipo] = set()
-                cls._mappa_mosse_tipo[tipo].add(mossa)
-
-        # Restituisce le mosse del tipo richiesto, o lista vuota
-        return list(cls._mappa_mosse_tipo.get(tipo_mossa, []))
+        return CatalogoMosse.ottieni().mosse_per_tipo(tipo_mossa)
 
 
 if __name__ == "__main__":
@@ -65,16 +65,29 @@ class NodoMosseAssegnamentoTotale(NodoRicercaLocale):
 
     _set_mosse_per_pokemon: list[list[SetMosse]] = [[], [], [], [], [], []]
     # Funzione di valutazione personalizzabile
-    _valutatore_set_mossa : "ValutatoreSetMosse"
+    _valutatore_set_mossa : "ValutatoreSetMosse | None" = None
+    # Punteggio di ogni SetMosse di ogni Pokémon, calcolato in blocco quando cambiano set o valutatore:
+    # la funzione di valutazione di un nodo è solo la somma di sei accessi per indice
+    _punteggi_per_pokemon: list[list[int]] = [[], [], [], [], [], []]
 
     @classmethod
     def imposta_valutatore(cls, valutatore: "ValutatoreSetMosse"):
         cls._valutatore_set_mossa = valutatore
+        cls._aggiorna_punteggi()
 
     @classmethod
     def imposta_set_mosse_per_pokemon(cls, set_mosse : list[list[SetMosse]]):
         #setto l'attributo di classe
         cls._set_mosse_per_pokemon = set_mosse
+        cls._aggiorna_punteggi()
+
+    @classmethod
+    def _aggiorna_punteggi(cls):
+        if cls._valutatore_set_mossa is None:
+            # fallback: usa PESI_VALUTAZIONE di default
+            cls._valutatore_set_mossa = ValutatoreSetMosse(PESI_VALUTAZIONE)
+        cls._punteggi_per_pokemon = [cls._valutatore_set_mossa.valuta_lista(sets)
+                                     for sets in cls._set_mosse_per_pokemon]
 
     def __init__(self, s0=None, s1=None, s2=None, s3=None, s4=None, s5=None):
         if not self._set_mosse_per_pokemon:
@@ -111,18 +124,11 @@ class NodoMosseAssegnamentoTotale(NodoRicercaLocale):
         return set_mosse_selezionati
 
     def funzione_valutazione(self) -> int:
-        # ValutatoreSetMosse ci consente di variare la funzione di valutazione utilizzata
-        cls = type(self)  # oppure self.__class__
-        if cls._valutatore_set_mossa is None:
-            # fallback: usa PESI_VALUTAZIONE di default
-            cls._valutatore_set_mossa = ValutatoreSetMosse(PESI_VALUTAZIONE)
-
-        valutatore = cls._valutatore_set_mossa
-
-        score = 0
-        for s in self.ottieni_set_mosse_selezionati():
-            score += valutatore.valuta(s)
-        return score
+        # ValutatoreSetMosse ci consente di variare la funzione di valutazione utilizzata:
+        # i punteggi dei set sono già calcolati da _aggiorna_punteggi
+        punteggi = self._punteggi_per_pokemon
+        return (punteggi[0][self.s0] + punteggi[1][self.s1] + punteggi[2][self.s2]
+                + punteggi[3][self.s3] + punteggi[4][self.s4] + punteggi[5][self.s5])
 
     def ottieni_vicini(self) -> list["NodoMosseAssegnamentoTotale"]:
         """
@@ -47,12 +47,14 @@ class StatoCombattimento(NodoSpazioStati):
         - cure_rimaste: numero di cure totali ancora disponibili per l’avversario
         - moltiplicatori: lista dei moltiplicatori di danno applicati a ciascuna mossa, che crescono di +0.5 dopo ogni cura
         - set_mosse: oggetto `SetMosse` contenente le 4 mosse assegnate al proprio Pokémon
+        - potenze: basePower usato per ciascuna mossa (es. quello di SetMosse.normalizza_danni_attesi);
+          se non indicato, il basePower delle mosse
 
         Regole principali del modello:
         --------------------------------
         - Il combattimento inizia con l’avversario a HP massimi (`HP_MAX_AVVERSARIO`), tipicamente 600.
         - Ogni mossa consumata riduce di 1 il relativo PP.
-        - Il danno inflitto da una mossa è deterministico: basePower * moltiplicatore corrente.
+        - Il danno inflitto da una mossa è deterministico: potenza * moltiplicatore corrente.
         - Ogni 4 turni (`TURNI_PER_RIPOSO`), l’avversario si cura completamente (se ha cure disponibili):
             - Gli HP tornano al massimo.
             - Il contatore dei turni viene resettato.
@@ -86,7 +88,8 @@ class StatoCombattimento(NodoSpazioStati):
         moltiplicatori: list[float],
         pp: list[int],
         set_mosse: SetMosse,
-        ultime_mosse_usate: deque = None
+        ultime_mosse_usate: deque = None,
+        potenze: list[int] | None = None
     ):
         self.hp_avversario = hp_avversario
         self.pp = pp
@@ -95,6 +98,8 @@ class StatoCombattimento(NodoSpazioStati):
         self.moltiplicatori = moltiplicatori
         self.set_mosse = set_mosse
         self.ultime_mosse_usate = ultime_mosse_usate or deque(maxlen=2)
+        # Le potenze non cambiano durante lo scontro: la lista è condivisa tra gli stati
+        self.potenze = potenze if potenze is not None else [m.base_power for m in set_mosse.lista_mosse()]
 
     def __repr__(self):
         return (f"StatoCombattimento(HP={self.hp_avversario}, "
@@ -110,7 +115,8 @@ class StatoCombattimento(NodoSpazioStati):
             cure_totali=self.cure_rimaste,
             moltiplicatori=self.moltiplicatori[:],
             set_mosse=self.set_mosse,
-            ultime_mosse_usate=deque(self.ultime_mosse_usate, maxlen=2)
+            ultime_mosse_usate=deque(self.ultime_mosse_usate, maxlen=2),
+            potenze=self.potenze
         )
 
 
@@ -134,13 +140,13 @@ class StatoCombattimento(NodoSpazioStati):
     def genera_successori(self) -> List["StatoCombattimento"]:
         successori = []
 
-        for i, mossa in enumerate(self.set_mosse.lista_mosse()):
+        for i, potenza in enumerate(self.potenze):
             # Le due condizioni di pruning:
             # - PP uguali a 0 (non possiamo scendere sotto lo zero)
             # - Base_power = 0 (mossa che non infligge danni, possibile ciclo di mosse senza danno)
             # N.B una mossa che con danno = 0, non crea un ciclo infinito perché prima o poi
             # i pp della mossa termineranno comunque; g
-            if self.pp[i] == 0 or mossa.base_power == 0:
+            if self.pp[i] == 0 or potenza == 0:
                 continue  #skip della mossa -> pruning (non genero quello stato)
 
             # Blocco spam di 3 usi consecutivi della stessa mossa
@@ -152,7 +158,7 @@ class StatoCombattimento(NodoSpazioStati):
                 continue #pruning della mossa negli stati successori
 
 
-            danno = int(mossa.base_power * self.moltiplicatori[i]) #danno da calcolare
+            danno = int(potenza * self.moltiplicatori[i]) #danno da calcolare
             nuovo_hp = self.hp_avversario - danno
 
             nuovi_pp = list(self.pp) #copia esplicita
@@ -185,7 +191,8 @@ class StatoCombattimento(NodoSpazioStati):
                 cure_totali=nuove_cure_rimaste,
                 moltiplicatori=nuovi_moltiplicatori,
                 set_mosse=self.set_mosse,
-                ultime_mosse_usate=nuove_ultime_mosse_usate
+                ultime_mosse_usate=nuove_ultime_mosse_usate,
+                potenze=self.potenze
             )
             #creazione dei successori e aggiunta alla lista da restituire
             successori.append(nuovo_stato)
@@ -1,46 +1,94 @@
 import pprint
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 from config.costanti_globali import URI_MOSSA_CAT_SPECIALE, URI_MOSSA_CAT_FISICO, URI_MOSSA_CAT_STATO, PESI_VALUTAZIONE, Metrica
 from entita.mossa import Mossa
-from typing import List, Dict
+from typing import TYPE_CHECKING, List, Dict
 
-from entita.tipo_pokemon import TipoPokemon
+from entita.tipo_pokemon import TipoPokemonHelper, ID_TIPO, NUM_TIPI, URI_TIPI
 from problemi.battaglia_pokemon.problema_scontro import ValutatoreScontri
 
+if TYPE_CHECKING:
+    # numpy è importato nei metodi che lo usano, per non pesare sull'import di main_csp
+    import numpy as np
 
-@dataclass
+# Vettore delle caratteristiche di un SetMosse: danno, PP e precisione totali, numero di mosse
+# per categoria e numero di mosse per ciascuno dei 18 tipi (nell'ordine degli id di tipo)
+CATEGORIE_SET_MOSSE = (URI_MOSSA_CAT_SPECIALE, URI_MOSSA_CAT_FISICO, URI_MOSSA_CAT_STATO)
+INDICE_DANNO, INDICE_PP, INDICE_PRECISIONE = 0, 1, 2
+INDICE_CATEGORIA: dict[str, int] = {categoria: 3 + i for i, categoria in enumerate(CATEGORIE_SET_MOSSE)}
+INDICE_PRIMO_TIPO = 3 + len(CATEGORIE_SET_MOSSE)
+NUM_CARATTERISTICHE = INDICE_PRIMO_TIPO + NUM_TIPI
+
+
+@dataclass(slots=True)
 class SetMosse:
     mossa1: "Mossa"
     mossa2: "Mossa"
     mossa3: "Mossa"
     mossa4: "Mossa"
+    # Calcolati una sola volta in __post_init__
+    _mosse: List["Mossa"] = field(init=False, repr=False, compare=False)
+    caratteristiche: "np.ndarray" = field(init=False, repr=False, compare=False)
 
     def __post_init__(self):
-        self._mosse: List["Mossa"] = [self.mossa1, self.mossa2, self.mossa3, self.mossa4]
-
-        # Metriche aggregate
-        self.danno_totale = sum(m.base_power for m in self._mosse)
-        self.pp_totali = sum(m.pp for m in self._mosse)
-        self.precisione_totale = sum(m.precisione for m in self._mosse)
-
-        # Conteggio per categoria (usando URI)
-        self.mosse_per_categoria = {
-            URI_MOSSA_CAT_SPECIALE : sum(1 for m in self._mosse if m.categoria_mossa == URI_MOSSA_CAT_SPECIALE),
-            URI_MOSSA_CAT_FISICO : sum(1 for m in self._mosse if m.categoria_mossa == URI_MOSSA_CAT_FISICO),
-            URI_MOSSA_CAT_STATO : sum(1 for m in self._mosse if m.categoria_mossa == URI_MOSSA_CAT_STATO)
-        }
-
-        ## Conteggio per tipo
-        tipi_presenti = set(m.tipo_mossa for m in self._mosse)
-        self.mosse_per_tipo = {tipo: sum(1 for m in self._mosse if m.tipo_mossa == tipo) for tipo in tipi_presenti}
+        import numpy as np
+
+        self._mosse = [self.mossa1, self.mossa2, self.mossa3, self.mossa4]
+
+        # Metriche aggregate in un unico passaggio sulle mosse
+        valori = [0] * NUM_CARATTERISTICHE
+        for m in self._mosse:
+            valori[INDICE_DANNO] += m.base_power
+            valori[INDICE_PP] += m.pp
+            valori[INDICE_PRECISIONE] += m.precisione
+            indice_categoria = INDICE_CATEGORIA.get(m.categoria_mossa)
+            if indice_categoria is not None:
+                valori[indice_categoria] += 1
+            id_tipo = ID_TIPO.get(m.tipo_mossa)
+            if id_tipo is not None:
+                valori[INDICE_PRIMO_TIPO + id_tipo] += 1
+        self.caratteristiche = np.array(valori, dtype=np.int64)
+
+    @property
+    def danno_totale(self) -> int:
+        return int(self.caratteristiche[INDICE_DANNO])
+
+    @property
+    def pp_totali(self) -> int:
+        return int(self.caratteristiche[INDICE_PP])
+
+    @property
+    def precisione_totale(self) -> int:
+        return int(self.caratteristiche[INDICE_PRECISIONE])
+
+    @property
+    def mosse_per_categoria(self) -> Dict[str, int]:
+        """Conteggio per categoria (usando URI)"""
+        return {categoria: int(self.caratteristiche[indice]) for categoria, indice in INDICE_CATEGORIA.items()}
+
+    @property
+    def mosse_per_tipo(self) -> Dict[str, int]:
+        """Conteggio per tipo, solo per i tipi presenti"""
+        conteggi = self.caratteristiche[INDICE_PRIMO_TIPO:]
+        return {URI_TIPI[id_tipo]: int(conteggi[id_tipo]) for id_tipo in conteggi.nonzero()[0]}
+
+    @staticmethod
+    def matrice_caratteristiche(set_mosse_list: List["SetMosse"]) -> "np.ndarray":
+        """Caratteristiche di una lista di SetMosse impilate in una matrice [len(lista) x NUM_CARATTERISTICHE]."""
+        import numpy as np
+
+        if not set_mosse_list:
+            return np.zeros((0, NUM_CARATTERISTICHE), dtype=np.int64)
+        return np.stack([s.caratteristiche for s in set_mosse_list])
 
     def numero_mosse_di_tipo(self, tipo: str) -> int:
         """
         Restituisce il numero di mosse di un certo tipo all'interno del set.
         Se il tipo non è presente, restituisce 0.
         """
-        return self.mosse_per_tipo.get(tipo, 0)
+        id_tipo = ID_TIPO.get(tipo)
+        return 0 if id_tipo is None else int(self.caratteristiche[INDICE_PRIMO_TIPO + id_tipo])
 
     def lista_mosse(self) -> List["Mossa"]:
         return self._mosse
@@ -74,11 +122,7 @@ class SetMosse:
         )
 
     def valuta_set_mosse(self) -> int:
-        return (
-                PESI_VALUTAZIONE[Metrica.DANNO_TOTALE] * self.danno_totale +
-                PESI_VALUTAZIONE[Metrica.CAT_SPECIALE] * self.mosse_per_categoria.get(URI_MOSSA_CAT_SPECIALE, 0) +
-                PESI_VALUTAZIONE[Metrica.TIPO_FIRE] * self.numero_mosse_di_tipo(TipoPokemon.FIRE.value)
-        )
+        return ValutatoreSetMosse.predefinito().valuta(self)
 
     def inizializza_pp_da_mosse(self) -> list[int]:
         pp = []
@@ -97,17 +141,22 @@ class SetMosse:
         Restituisce una lista di moltiplicatori (uno per ogni mossa nel SetMosse),
         calcolati sulla base dell'efficacia del tipo della mossa contro i tipi dell'avversario.
         """
+        # Tipi convertiti in id una sola volta, poi solo accessi per indice alla matrice dei moltiplicatori
+        id_tipi_avversario = TipoPokemonHelper.id_tipi(tipi_avversario)
         moltiplicatori = []
         for mossa in self.lista_mosse():
-            tipo_attaccante = [mossa.tipo_mossa]  # la funzione `efficienza` si aspetta una lista
-            moltiplicatore = ValutatoreScontri.efficienza(tipo_attaccante, tipi_avversario)
+            # la funzione `efficienza_id` si aspetta una sequenza di tipi attaccanti
+            id_tipo_attaccante = (TipoPokemonHelper.ottieni_mappa_tipo_indice(mossa.tipo_mossa),)
+            moltiplicatore = ValutatoreScontri.efficienza_id(id_tipo_attaccante, id_tipi_avversario)
             moltiplicatori.append(moltiplicatore)
         return moltiplicatori
 
-    def normalizza_danni_attesi(self):
+    def normalizza_danni_attesi(self) -> list[int]:
         """
         Calcola il danno atteso per ciascuna mossa, applica una penalità per danni alti,
         e arrotonda al valore basePower Pokémon più vicino.
+        Restituisce le potenze normalizzate (una per mossa) senza modificare le mosse:
+        il catalogo è condiviso da tutti i SetMosse. Le mosse senza danno restano a 0.
         """
         BASE_POWER_STANDARD = [20, 25, 30, 35, 40, 50, 60, 70, 75, 80, 85, 90,
                                95, 100, 110, 120, 130, 140, 150]
@@ -115,7 +164,13 @@ class SetMosse:
         def arrotonda_base_power(valore: float) -> int:
             return min(BASE_POWER_STANDARD, key=lambda x: abs(x - valore))
 
+        potenze = []
         for mossa in self.lista_mosse():
+            if mossa.base_power == 0:
+                # Mossa di stato: nessun danno da normalizzare
+                potenze.append(0)
+                continue
+
             # Danno atteso
             danno_atteso = mossa.base_power * (mossa.precisione / 100)
 
@@ -126,8 +181,8 @@ class SetMosse:
                 danno_atteso -= penalita
 
             # Arrotondamento al valore standard più vicino
-            nuovo_valore = arrotonda_base_power(danno_atteso)
-            mossa.basePower = nuovo_valore
+            potenze.append(arrotonda_base_power(danno_atteso))
+        return potenze
 
     @classmethod
     def somma_danno_totale(cls, set_mosse_list: List["SetMosse"]) -> int:
@@ -178,20 +233,79 @@ class SetMosse:
         """
         return sum(s.numero_mosse_di_tipo(tipo) for s in sets)
 
+# Posizione nel vettore delle caratteristiche della quantità pesata da ogni metrica
+INDICE_METRICA: dict[Metrica, int] = {
+    Metrica.DANNO_TOTALE: INDICE_DANNO,
+    Metrica.PP_TOTALI: INDICE_PP,
+    Metrica.PRECISIONE_TOTALE: INDICE_PRECISIONE,
+    Metrica.CAT_SPECIALE: INDICE_CATEGORIA[URI_MOSSA_CAT_SPECIALE],
+    Metrica.CAT_FISICO: INDICE_CATEGORIA[URI_MOSSA_CAT_FISICO],
+    Metrica.CAT_STATO: INDICE_CATEGORIA[URI_MOSSA_CAT_STATO],
+}
+# Le metriche di tipo hanno come valore l'URI del tipo
+INDICE_METRICA.update({metrica: INDICE_PRIMO_TIPO + ID_TIPO[metrica.value]
+                       for metrica in Metrica if metrica.name.startswith("TIPO_")})
+
+
 class ValutatoreSetMosse:
+    """
+    Il punteggio di un SetMosse è il prodotto scalare tra il vettore dei pesi (costruito una volta
+    dalle metriche) e il vettore delle caratteristiche del set.
+    """
+
+    _predefinito: "ValutatoreSetMosse | None" = None
+
     def __init__(self, pesi: dict[Metrica, int]):
         self.pesi = pesi
+        self.vettore_pesi = self.costruisci_vettore_pesi(pesi)
+        # Copia come lista di int per valuta_mossa, chiamata su singole mosse nei cicli di ricerca
+        self._lista_pesi: list[int] = self.vettore_pesi.tolist()
+
+    @staticmethod
+    def costruisci_vettore_pesi(pesi: dict[Metrica, int]) -> "np.ndarray":
+        """Vettore [NUM_CARATTERISTICHE] con il peso di ogni metrica nella posizione della sua caratteristica."""
+        import numpy as np
+
+        vettore_pesi = np.zeros(NUM_CARATTERISTICHE, dtype=np.int64)
+        for metrica, peso in pesi.items():
+            if metrica not in INDICE_METRICA:
+                raise ValueError(f"Metrica non supportata: {metrica}")
+            vettore_pesi[INDICE_METRICA[metrica]] += peso
+        return vettore_pesi
+
+    @classmethod
+    def predefinito(cls) -> "ValutatoreSetMosse":
+        """Valutatore con PESI_VALUTAZIONE, creato alla prima richiesta."""
+        if cls._predefinito is None:
+            cls._predefinito = cls(PESI_VALUTAZIONE)
+        return cls._predefinito
 
     def valuta(self, set_mosse: "SetMosse") -> int:
-        score = 0
+        return int(self.vettore_pesi @ set_mosse.caratteristiche)
 
-        if Metrica.DANNO_TOTALE in self.pesi:
-            score += self.pesi[Metrica.DANNO_TOTALE] * set_mosse.danno_totale
+    def valuta_batch(self, matrice: "np.ndarray") -> "np.ndarray":
+        """
+        Punteggi di più SetMosse in un solo prodotto matrice-vettore: `matrice` è
+        [n x NUM_CARATTERISTICHE], come restituita da SetMosse.matrice_caratteristiche.
+        """
+        return matrice @ self.vettore_pesi
 
-        if Metrica.CAT_SPECIALE in self.pesi:
-            score += self.pesi[Metrica.CAT_SPECIALE] * set_mosse.mosse_per_categoria.get(URI_MOSSA_CAT_SPECIALE, 0)
+    def valuta_lista(self, set_mosse_list: List["SetMosse"]) -> list[int]:
+        """Punteggi di una lista di SetMosse (nello stesso ordine), come int Python."""
+        return self.valuta_batch(SetMosse.matrice_caratteristiche(set_mosse_list)).tolist()
 
-        if Metrica.TIPO_FIRE in self.pesi:
-            score += self.pesi[Metrica.TIPO_FIRE] * set_mosse.numero_mosse_di_tipo(TipoPokemon.FIRE.value)
-        # altri score possibili implementabili
-        return score
\ No newline at end of file
+    def valuta_mossa(self, mossa: "Mossa") -> int:
+        """
+        Contributo di una singola mossa: tutte le metriche sono somme sulle mosse,
+        quindi valuta(set_mosse) è la somma di valuta_mossa sulle sue quattro mosse.
+        """
+        pesi = self._lista_pesi
+        score = (pesi[INDICE_DANNO] * mossa.base_power + pesi[INDICE_PP] * mossa.pp
+                 + pesi[INDICE_PRECISIONE] * mossa.precisione)
+        indice_categoria = INDICE_CATEGORIA.get(mossa.categoria_mossa)
+        if indice_categoria is not None:
+            score += pesi[indice_categoria]
+        id_tipo = ID_TIPO.get(mossa.tipo_mossa)
+        if id_tipo is not None:
+            score += pesi[INDICE_PRIMO_TIPO + id_tipo]
+        return score
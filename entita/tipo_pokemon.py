@@ -1,13 +1,21 @@
 from enum import Enum
 import random
-from typing import Dict, Set
+import threading
+from itertools import combinations
+from typing import Dict, Iterable, NamedTuple, Set
 
 from config.costanti_globali import QUERY_SPARQL_POKEMON_TIPI
 from utils.registro_log import setup_logger
-from utils.client_sparql import esegui_query_sparql
+from utils.client_sparql import itera_righe_sparql
 logger = setup_logger(__name__)
 
 
+class RigaPokemonTipoKG(NamedTuple):
+    """Schema di una riga della query pokemon_tipi."""
+    pokemon: str
+    type: str
+
+
 class TipoPokemon(Enum):
     NORMAL = "https://pokemonkg.org/ontology#PokéType:Normal"
     FIRE = "https://pokemonkg.org/ontology#PokéType:Fire"
@@ -32,6 +40,24 @@ class TipoPokemon(Enum):
         return self.value
 
 
+# Id canonico di un tipo: la sua posizione nell'enum (0..17). Gli URI servono solo ai confini con il KG;
+# all'interno i tipi sono id, usati come indici della matrice dei moltiplicatori, e l'insieme dei tipi
+# di un Pokémon è una maschera a 18 bit (bit id acceso per ogni tipo posseduto).
+URI_TIPI: tuple[str, ...] = tuple(tipo.value for tipo in TipoPokemon)
+ID_TIPO: dict[str, int] = {uri: id_tipo for id_tipo, uri in enumerate(URI_TIPI)}
+NUM_TIPI = len(URI_TIPI)
+_TIPI_PER_ID: tuple[TipoPokemon, ...] = tuple(TipoPokemon)
+
+# Combinazioni di tipi possibili per un Pokémon: 18 tipi singoli (id combinazione = id tipo)
+# seguiti dalle 153 coppie di tipi distinti in ordine di id, 171 in totale
+COMBINAZIONI_TIPI: tuple[tuple[int, ...], ...] = (tuple((id_tipo,) for id_tipo in range(NUM_TIPI))
+                                                  + tuple(combinations(range(NUM_TIPI), 2)))
+NUM_COMBINAZIONI = len(COMBINAZIONI_TIPI)
+# Maschera dei tipi -> id della combinazione
+ID_COMBINAZIONE: dict[int, int] = {sum(1 << id_tipo for id_tipo in combinazione): id_combinazione
+                                   for id_combinazione, combinazione in enumerate(COMBINAZIONI_TIPI)}
+
+
 tipi_strategici = {
     TipoPokemon.FIRE.value: {TipoPokemon.GROUND.value},
     TipoPokemon.DRAGON.value: {TipoPokemon.FAIRY.value, TipoPokemon.ELECTRIC.value},
@@ -56,7 +82,17 @@ class TipoPokemonHelper:
     con cache interne e incapsulamento della logica.
     """
     _mappa_pokemon_con_tipi: dict[str, list[str]] | None = None
-    _mappa_tipo_to_indice: dict[str, int] | None = None
+    # Stessa mappa con i tipi come id canonici (primario per primo) e come maschera di bit
+    _mappa_pokemon_id_tipi: dict[str, tuple[int, ...]] | None = None
+    _mappa_pokemon_maschera: dict[str, int] | None = None
+    _mappa_pokemon_combinazione: dict[str, int] | None = None
+    # Indice inverso: id specie = posizione del Pokémon nella mappa (ordine del KG);
+    # per ogni id tipo / id combinazione le specie corrispondenti, in ordine crescente di id
+    _pokemon_per_id: list[str] | None = None
+    _indice_tipo_pokemon: tuple[tuple[int, ...], ...] | None = None
+    _indice_combinazione_pokemon: tuple[tuple[int, ...], ...] | None = None
+    # Serializza il primo caricamento dal KG quando più thread chiedono la mappa insieme
+    _lock_mappa_pokemon = threading.Lock()
 
     _mappa_tipi_compatibili: dict[TipoPokemon, set[TipoPokemon]] = {
         TipoPokemon.NORMAL: {TipoPokemon.FIGHTING},
@@ -124,31 +160,73 @@ class TipoPokemonHelper:
     @classmethod
     def ottieni_mappa_tipo_indice(cls, tipo_uri: str) -> int:
         """
-        Restituisce indice intero associato all'URI tipo, costruendo la mappa se necessario.
+        Restituisce indice intero (id canonico) associato all'URI tipo.
         """
-        if cls._mappa_tipo_to_indice is None:
-            cls._mappa_tipo_to_indice = {tipo.value: i for i, tipo in enumerate(TipoPokemon)}
-        if tipo_uri not in cls._mappa_tipo_to_indice:
+        id_tipo = ID_TIPO.get(tipo_uri)
+        if id_tipo is None:
             raise ValueError(f"Tipo Pokémon non riconosciuto: {tipo_uri}")
-        return cls._mappa_tipo_to_indice[tipo_uri]
+        return id_tipo
+
+    @classmethod
+    def id_tipi(cls, tipi_uri: Iterable[str]) -> tuple[int, ...]:
+        """Converte una sequenza di URI tipo negli id canonici, mantenendo l'ordine."""
+        return tuple(cls.ottieni_mappa_tipo_indice(tipo_uri) for tipo_uri in tipi_uri)
+
+    @staticmethod
+    def maschera_tipi(id_tipi: Iterable[int]) -> int:
+        """Maschera a 18 bit con un bit acceso per ogni id tipo."""
+        maschera = 0
+        for id_tipo in id_tipi:
+            maschera |= 1 << id_tipo
+        return maschera
+
+    @staticmethod
+    def id_combinazione(id_tipi: tuple[int, ...]) -> int | None:
+        """
+        Id della combinazione formata da uno o due tipi distinti; None negli altri casi
+        (nessun tipo, tipi ripetuti o più di due), che non hanno una voce nelle tabelle precalcolate.
+        """
+        if len(id_tipi) == 1:
+            return id_tipi[0]
+        if len(id_tipi) == 2 and id_tipi[0] != id_tipi[1]:
+            return ID_COMBINAZIONE[(1 << id_tipi[0]) | (1 << id_tipi[1])]
+        return None
+
+    @staticmethod
+    def maschera_uri(tipi_uri: Iterable[str]) -> int:
+        """Maschera dei tipi indicati come URI; gli URI fuori dall'enum non hanno un bit e sono ignorati."""
+        maschera = 0
+        for tipo_uri in tipi_uri:
+            id_tipo = ID_TIPO.get(tipo_uri)
+            if id_tipo is not None:
+                maschera |= 1 << id_tipo
+        return maschera
+
+    @staticmethod
+    def uri_da_maschera(maschera: int) -> list[str]:
+        """URI dei tipi presenti nella maschera, in ordine di id."""
+        return [uri for id_tipo, uri in enumerate(URI_TIPI) if maschera >> id_tipo & 1]
 
     @classmethod
     def ottieni_mappa_pokemon_tipi(cls) -> dict[str, list[str]]:
         """
         Restituisce la mappa Pokémon->tipi caricata o la carica da KG se necessario.
+        Il caricamento avviene alla prima chiamata (non all'import) ed è sicuro tra thread.
         """
+        if cls._mappa_pokemon_con_tipi is not None:
+            return cls._mappa_pokemon_con_tipi
+
+        with cls._lock_mappa_pokemon:
+            if cls._mappa_pokemon_con_tipi is not None:
+                return cls._mappa_pokemon_con_tipi
 
-        if cls._mappa_pokemon_con_tipi is None:
             def _ottieni_pokemon_con_tipi_knowledge_graph() -> dict[str, list[str]]:
                 """
                 Interroga il KG e costruisce la mappa Pokemon URI -> lista tipi URI (max 2).
                 # Funzione a uso interno della classe
                 """
-                risultati = esegui_query_sparql(QUERY_SPARQL_POKEMON_TIPI)
                 mappa = {}
-                for r in risultati:
-                    pokemon_uri = r["pokemon"]["value"]
-                    tipo_uri = r["type"]["value"]
+                for pokemon_uri, tipo_uri in itera_righe_sparql(QUERY_SPARQL_POKEMON_TIPI, RigaPokemonTipoKG):
 
                     if pokemon_uri not in mappa:
                         # aggiungi la lista vuota
@@ -160,11 +238,107 @@ class TipoPokemonHelper:
 
                 return mappa
 
-            cls._mappa_pokemon_con_tipi = _ottieni_pokemon_con_tipi_knowledge_graph()
+            cls._installa_mappa_pokemon_tipi(_ottieni_pokemon_con_tipi_knowledge_graph())
             logger.info(f"Pokémon caricati: {len(cls._mappa_pokemon_con_tipi)}")
 
         return cls._mappa_pokemon_con_tipi
 
+    @classmethod
+    def imposta_mappa_pokemon_tipi(cls, mappa: dict[str, list[str]]) -> None:
+        """
+        Sostituisce la mappa Pokémon -> tipi senza interrogare il KG (es. un Pokédex sintetico
+        per benchmark e prove offline), ricostruendo id, maschere e indici derivati.
+        """
+        with cls._lock_mappa_pokemon:
+            cls._installa_mappa_pokemon_tipi(mappa)
+
+    @classmethod
+    def _installa_mappa_pokemon_tipi(cls, mappa: dict[str, list[str]]) -> None:
+        # Conversione a id e maschere una sola volta, al confine con il KG
+        # (eventuali tipi fuori dall'enum non hanno id e restano solo nella mappa di URI)
+        cls._mappa_pokemon_id_tipi = {uri: tuple(ID_TIPO[t] for t in tipi if t in ID_TIPO)
+                                      for uri, tipi in mappa.items()}
+        cls._mappa_pokemon_maschera = {uri: cls.maschera_tipi(id_tipi)
+                                       for uri, id_tipi in cls._mappa_pokemon_id_tipi.items()}
+        # Dagli id e non dalla maschera: con un tipo ripetuto la maschera coincide con quella di un tipo singolo,
+        # ma il Pokémon non ha una combinazione (vedi id_combinazione) e va calcolato a parte
+        combinazioni = {uri: cls.id_combinazione(id_tipi) for uri, id_tipi in cls._mappa_pokemon_id_tipi.items()}
+        cls._mappa_pokemon_combinazione = {uri: combinazione for uri, combinazione in combinazioni.items()
+                                           if combinazione is not None}
+        cls._costruisci_indice_inverso()
+        # Pubblicata per ultima: chi la trova valorizzata trova anche le strutture derivate
+        cls._mappa_pokemon_con_tipi = mappa
+
+    @classmethod
+    def ottieni_mappa_pokemon_id_tipi(cls) -> dict[str, tuple[int, ...]]:
+        """Mappa Pokémon -> id dei tipi (primario per primo), caricata dal KG insieme a quella di URI."""
+        cls.ottieni_mappa_pokemon_tipi()
+        return cls._mappa_pokemon_id_tipi
+
+    @classmethod
+    def ottieni_mappa_pokemon_maschere(cls) -> dict[str, int]:
+        """Mappa Pokémon -> maschera a 18 bit dei suoi tipi."""
+        cls.ottieni_mappa_pokemon_tipi()
+        return cls._mappa_pokemon_maschera
+
+    @classmethod
+    def ottieni_mappa_pokemon_combinazioni(cls) -> dict[str, int]:
+        """Mappa Pokémon -> id della sua combinazione di tipi (solo Pokémon con uno o due tipi noti e distinti)."""
+        cls.ottieni_mappa_pokemon_tipi()
+        return cls._mappa_pokemon_combinazione
+
+    @classmethod
+    def _costruisci_indice_inverso(cls) -> None:
+        """Indici tipo -> specie e combinazione -> specie, costruiti una volta al caricamento della mappa."""
+        pokemon_per_tipo: list[list[int]] = [[] for _ in range(NUM_TIPI)]
+        pokemon_per_combinazione: list[list[int]] = [[] for _ in range(NUM_COMBINAZIONI)]
+        pokemon_per_id = list(cls._mappa_pokemon_id_tipi)
+        for id_pokemon, uri in enumerate(pokemon_per_id):
+            for id_tipo in set(cls._mappa_pokemon_id_tipi[uri]):
+                pokemon_per_tipo[id_tipo].append(id_pokemon)
+            id_combinazione = cls._mappa_pokemon_combinazione.get(uri)
+            if id_combinazione is not None:
+                pokemon_per_combinazione[id_combinazione].append(id_pokemon)
+        cls._pokemon_per_id = pokemon_per_id
+        cls._indice_tipo_pokemon = tuple(tuple(ids) for ids in pokemon_per_tipo)
+        cls._indice_combinazione_pokemon = tuple(tuple(ids) for ids in pokemon_per_combinazione)
+
+    @classmethod
+    def ottieni_pokemon_per_id(cls) -> list[str]:
+        """URI dei Pokémon per id specie (la loro posizione nella mappa caricata dal KG)."""
+        cls.ottieni_mappa_pokemon_tipi()
+        return cls._pokemon_per_id
+
+    @classmethod
+    def id_pokemon_con_tipo(cls, id_tipo: int) -> tuple[int, ...]:
+        """Id (crescenti) delle specie che hanno il tipo in qualsiasi posizione."""
+        cls.ottieni_mappa_pokemon_tipi()
+        return cls._indice_tipo_pokemon[id_tipo]
+
+    @classmethod
+    def id_pokemon_con_combinazione(cls, id_combinazione: int) -> tuple[int, ...]:
+        """Id (crescenti) delle specie che hanno esattamente la combinazione di tipi indicata."""
+        cls.ottieni_mappa_pokemon_tipi()
+        return cls._indice_combinazione_pokemon[id_combinazione]
+
+    @classmethod
+    def id_pokemon_compatibili(cls, id_tipo: int, maschera_secondari: int | None) -> list[int]:
+        """
+        Id (crescenti) delle specie che hanno il tipo richiesto e, se maschera_secondari non è None,
+        anche un altro tipo compreso nella maschera: l'unione delle coppie (tipo, secondario)
+        dell'indice, senza scorrere l'intero Pokédex.
+        """
+        if maschera_secondari is None:
+            return list(cls.id_pokemon_con_tipo(id_tipo))
+        id_pokemon: list[int] = []
+        for id_secondario in range(NUM_TIPI):
+            if id_secondario != id_tipo and maschera_secondari >> id_secondario & 1:
+                id_combinazione = ID_COMBINAZIONE[(1 << id_tipo) | (1 << id_secondario)]
+                id_pokemon.extend(cls.id_pokemon_con_combinazione(id_combinazione))
+        # Le coppie sono disgiunte: basta riordinare per tornare all'ordine del KG
+        id_pokemon.sort()
+        return id_pokemon
+
     @classmethod
     def ottieni_tipi_pokemon(cls, pokemon_uri: str) -> list[str]:
         """
@@ -180,7 +354,7 @@ class TipoPokemonHelper:
         Mappa da URI tipo a Enum TipoPokemon, con errore se sconosciuto.
         NON utilizzato per ora
         """
-        for tipo in TipoPokemon:
-            if tipo.value == uri_tipo:
-                return tipo
-        raise ValueError(f"Tipo Pokémon sconosciuto o non supportato: {uri_tipo}")
+        id_tipo = ID_TIPO.get(uri_tipo)
+        if id_tipo is None:
+            raise ValueError(f"Tipo Pokémon sconosciuto o non supportato: {uri_tipo}")
+        return _TIPI_PER_ID[id_tipo]
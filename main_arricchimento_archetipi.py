@@ -1,13 +1,18 @@
+import argparse
+from typing import Iterable
+
+import numpy as np
 import pandas as pd
+
+from utils.client_sparql import aggiungi_argomento_aggiorna_kg, configura_client_sparql
 from utils.registro_log import setup_logger
-from csp.visualizza_risultati import VisualizzatoreRisultati
-from entita.tipo_pokemon import TipoPokemonHelper
+from utils.scrittore_rdf import ScrittoreNQuads, iri_nquads, letterale_nquads, RE_CARATTERI_NON_AMMESSI_IRI
 
 logger = setup_logger()
 
 # === Costanti RDF ===
-XSD_STRING = "<http://www.w3.org/2001/XMLSchema#string>"
-FONTE = "<https://pokemonkg.org/dataset/archetipi-clustering>"
+XSD_STRING = "http://www.w3.org/2001/XMLSchema#string"
+FONTE = "https://pokemonkg.org/dataset/archetipi-clustering"
 ONTO = "https://pokemonkg.org/ontology#"
 BASE_URI_POKEMON = "https://pokemonkg.org/instance/pokemon/"
 
@@ -16,67 +21,132 @@ PERCORSO_CSV = "apprendimento/risorse/Pokemon_archetipi.csv"
 # === File output N-Quads ===
 PERCORSO_OUTPUT_NQ = "risorse/dataset_quadruple_pokemonKG/archetipi_pokemon.nq"
 
-# === Mappa URI Pokémon presenti nel KG ===
-mappa_uri_kg = TipoPokemonHelper.ottieni_mappa_pokemon_tipi()
-nomi_pokemon_kg = set([VisualizzatoreRisultati.normalizza_uri(uri) for uri in mappa_uri_kg])
-
-# === Lettura CSV ===
-df = pd.read_csv(PERCORSO_CSV)
-
-quadruple = []
-pokemon_mancanti = []
-
-for _, row in df.iterrows():
-    nome = str(row["Name"]).strip().lower().replace(" ", "-")
-    archetipo = str(row["Archetipo"]).strip()
-
-    # SubArchetipo può essere NaN → controlliamo con pd.notna()
-    subarchetipo = row["SubArchetipo"] if pd.notna(row["SubArchetipo"]) else None
-
-    if nome not in nomi_pokemon_kg:
-        pokemon_mancanti.append(nome)
-        continue
-
-    uri_pokemon = f"<{BASE_URI_POKEMON}{nome}>"
 
-    # Aggiungi Archetipo
-    quad1 = f"{uri_pokemon} <{ONTO}hasArchetype> \"{archetipo}\"^^{XSD_STRING} {FONTE} ."
-    quadruple.append(quad1)
-
-    # Aggiungi SubArchetipo solo se esiste
-    # Alcuni pokemon non hanno il sub-archetipo
-    if subarchetipo:
-        quad2 = f"{uri_pokemon} <{ONTO}hasSubArchetype> \"{subarchetipo.strip()}\"^^{XSD_STRING} {FONTE} ."
-        quadruple.append(quad2)
-
-# === Scrittura su file N-Quads ===
-with open(PERCORSO_OUTPUT_NQ, "w", encoding="utf-8") as f:
-    f.write("\n".join(quadruple))
-
-logger.info(f"Scrittura completata: {len(quadruple)} triple RDF generate da {len(df)} Pokémon")
-
-# === Pokémon nel CSV ma non trovati nel KG ===
-if pokemon_mancanti:
-    logger.warning(f"⚠ Pokémon nel CSV ma NON trovati nel KG: {len(pokemon_mancanti)}")
-    for p in sorted(pokemon_mancanti):
-        logger.warning(f"- {p}")
-else:
-    logger.info("Tutti i Pokémon del CSV trovati nel KG.")
-
-# === Pokémon nel KG ma non presenti nel CSV ===
-nomi_pokemon_csv = set(str(n).strip().lower().replace(" ", "-") for n in df["Name"])
-pokemon_kg_non_presenti_in_csv = nomi_pokemon_kg - nomi_pokemon_csv
-
-logger.info(f"Totale Pokémon nel CSV: {len(nomi_pokemon_csv)}")
-logger.info(f"Totale Pokémon nel KG: {len(nomi_pokemon_kg)}")
-logger.info(f"Pokémon nel KG ma NON presenti nel CSV: {len(pokemon_kg_non_presenti_in_csv)}")
-
-if pokemon_kg_non_presenti_in_csv:
-    logger.warning("️Ecco alcuni Pokémon presenti nel KG ma non nel CSV:")
-    for p in sorted(pokemon_kg_non_presenti_in_csv):
-        logger.warning(f"- {p}")
-else:
-    logger.info("Tutti i Pokémon del KG sono presenti anche nel CSV.")
+def normalizza_nomi(nomi: pd.Series) -> pd.Series:
+    """Nome del CSV -> nome usato negli URI del KG (minuscolo, spazi sostituiti da trattini)."""
+    return nomi.astype(str).str.strip().str.lower().str.replace(" ", "-", regex=False)
+
+
+def indice_nomi_kg(uri_pokemon: Iterable[str]) -> pd.Index:
+    """Indice dei nomi dei Pokémon del KG, ricavati dall'ultimo segmento dei loro URI."""
+    return pd.Index(pd.unique(np.array([uri.rsplit("/", 1)[-1] for uri in uri_pokemon], dtype=object)))
+
+
+def leggi_archetipi(percorso_csv: str = PERCORSO_CSV) -> pd.DataFrame:
+    """
+    Legge il CSV degli archetipi (solo le colonne necessarie) e aggiunge la colonna
+    'nome' normalizzata. Archetipo e SubArchetipo sono ripuliti dagli spazi;
+    un SubArchetipo assente o vuoto diventa NaN.
+    """
+    df = pd.read_csv(percorso_csv, usecols=["Name", "Archetipo", "SubArchetipo"], dtype=str)
+    df["nome"] = normalizza_nomi(df["Name"])
+    df["Archetipo"] = df["Archetipo"].astype(str).str.strip()
+    df["SubArchetipo"] = df["SubArchetipo"].str.strip().replace("", pd.NA)
+    return df
+
+
+def _serializza_per_valore(valori: pd.Series, serializza) -> pd.Series:
+    """
+    Applica la serializzazione N-Quads una volta per valore distinto e la propaga con map:
+    gli archetipi sono poche decine di stringhe ripetute su tutte le righe.
+    """
+    return valori.map({valore: serializza(valore) for valore in valori.dropna().unique()})
+
+
+def righe_nquads_archetipi(archetipi: pd.DataFrame) -> np.ndarray:
+    """
+    Costruisce le righe N-Quads (hasArchetype e, se presente, hasSubArchetype)
+    per i Pokémon del DataFrame, con operazioni vettoriali sulle colonne.
+    Le righe di ogni Pokémon restano consecutive, nell'ordine del CSV.
+    """
+    # I nomi sono quasi tutti distinti: l'IRI si compone in blocco e l'escape si applica
+    # solo ai (rari) nomi con caratteri non ammessi in un IRI N-Quads
+    soggetti = f"<{BASE_URI_POKEMON}" + archetipi["nome"] + ">"
+    da_correggere = archetipi["nome"].str.contains(RE_CARATTERI_NON_AMMESSI_IRI)
+    if da_correggere.any():
+        soggetti[da_correggere] = _serializza_per_valore(archetipi.loc[da_correggere, "nome"],
+                                                          lambda nome: iri_nquads(BASE_URI_POKEMON + nome))
+    fine_riga = f" {iri_nquads(FONTE)} .\n"
+
+    archetipo = (soggetti + f" {iri_nquads(ONTO + 'hasArchetype')} "
+                 + _serializza_per_valore(archetipi["Archetipo"], lambda v: letterale_nquads(v, XSD_STRING))
+                 + fine_riga)
+    sub_archetipo = (soggetti + f" {iri_nquads(ONTO + 'hasSubArchetype')} "
+                     + _serializza_per_valore(archetipi["SubArchetipo"], lambda v: letterale_nquads(v, XSD_STRING))
+                     + fine_riga)
+
+    # Affianca le due colonne e le legge per righe: archetipo e sotto-archetipo di ogni Pokémon
+    # restano adiacenti; i sotto-archetipi assenti (NaN) vengono scartati
+    righe = np.column_stack([archetipo.to_numpy(dtype=object), sub_archetipo.to_numpy(dtype=object)]).ravel()
+    return righe[pd.notna(righe)]
+
+
+def genera_quadruple_archetipi(uri_pokemon_kg: Iterable[str], percorso_csv: str = PERCORSO_CSV,
+                               percorso_output: str = PERCORSO_OUTPUT_NQ) -> dict[str, list[str] | int]:
+    """
+    Pipeline completa: lettura del CSV, join con i nomi del KG e scrittura delle quadruple.
+    Restituisce i nomi rimasti senza corrispondenza:
+    'mancanti_kg' (nel CSV ma non nel KG) e 'mancanti_csv' (nel KG ma non nel CSV),
+    e il numero di Pokémon distinti 'totale_csv' e 'totale_kg'.
+    """
+    archetipi = leggi_archetipi(percorso_csv)
+    nomi_kg = indice_nomi_kg(uri_pokemon_kg)
+
+    nel_kg = archetipi["nome"].isin(nomi_kg)
+    # I duplicati si scartano sul DataFrame, prima di costruire le righe: il writer non deve
+    # calcolare un hash per ogni riga e può scrivere l'array a blocchi
+    da_scrivere = archetipi[nel_kg].drop_duplicates(["nome", "Archetipo", "SubArchetipo"])
+    with ScrittoreNQuads(percorso_output, deduplica=False) as scrittore:
+        scrittore.scrivi_righe_distinte(righe_nquads_archetipi(da_scrivere))
+    logger.info(f"Scrittura completata: {scrittore.quadruple_scritte} triple RDF generate da {len(archetipi)} Pokémon")
+
+    nomi_csv = pd.Index(archetipi["nome"].unique())
+    return {
+        "mancanti_kg": sorted(archetipi.loc[~nel_kg, "nome"].unique()),
+        "mancanti_csv": sorted(nomi_kg.difference(nomi_csv)),
+        "totale_csv": len(nomi_csv),
+        "totale_kg": len(nomi_kg),
+    }
+
+
+def _leggi_argomenti(argv: list[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Genera le quadruple degli archetipi dei Pokémon del KG")
+    aggiungi_argomento_aggiorna_kg(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None):
+    args = _leggi_argomenti(argv)
+    configura_client_sparql(args.aggiorna_kg)
+    # Import qui: interroga il KG, quindi solo quando lo script viene eseguito
+    from entita.tipo_pokemon import TipoPokemonHelper
+
+    # === Mappa URI Pokémon presenti nel KG ===
+    riepilogo = genera_quadruple_archetipi(TipoPokemonHelper.ottieni_mappa_pokemon_tipi())
+
+    # === Pokémon nel CSV ma non trovati nel KG ===
+    if riepilogo["mancanti_kg"]:
+        logger.warning(f"⚠ Pokémon nel CSV ma NON trovati nel KG: {len(riepilogo['mancanti_kg'])}")
+        for p in riepilogo["mancanti_kg"]:
+            logger.warning(f"- {p}")
+    else:
+        logger.info("Tutti i Pokémon del CSV trovati nel KG.")
+
+    # === Pokémon nel KG ma non presenti nel CSV ===
+    logger.info(f"Totale Pokémon nel CSV: {riepilogo['totale_csv']}")
+    logger.info(f"Totale Pokémon nel KG: {riepilogo['totale_kg']}")
+    logger.info(f"Pokémon nel KG ma NON presenti nel CSV: {len(riepilogo['mancanti_csv'])}")
+
+    if riepilogo["mancanti_csv"]:
+        logger.warning("️Ecco alcuni Pokémon presenti nel KG ma non nel CSV:")
+        for p in riepilogo["mancanti_csv"]:
+            logger.warning(f"- {p}")
+    else:
+        logger.info("Tutti i Pokémon del KG sono presenti anche nel CSV.")
+
+
+if __name__ == "__main__":
+    main()
 
 
 """
@@ -88,4 +158,4 @@ WHERE {
   ?pokemon poke:hasArchetype ?archetipo .
   OPTIONAL { ?pokemon poke:hasSubArchetype ?subarchetipo }
 }
-"""
\ No newline at end of file
+"""
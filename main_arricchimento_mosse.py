@@ -1,58 +1,246 @@
-from config.costanti_globali import QUERY_SPARQL_MOSSE_SENZA_PARAMETRI, OUTPUT_TTL, OUTPUT_MISSING, BASE_DIR
-from utils.client_pokeapi import ottieni_dati_mossa
-from utils.client_sparql import esegui_query_sparql
+import argparse
+import json
+import os
+from typing import NamedTuple
+
+from config.costanti_globali import QUERY_SPARQL_MOSSE_SENZA_PARAMETRI, OUTPUT_TTL, OUTPUT_MISSING, BASE_DIR, \
+    OUTPUT_JOURNAL_MOSSE
+from utils.client_pokeapi import ottieni_client_pokeapi
+from utils.client_sparql import itera_righe_sparql, aggiungi_argomento_aggiorna_kg, configura_client_sparql
 from utils.registro_log import setup_logger
-from utils.scrittore_rdf import scrivi_file_mosse_rdf
+from utils.scrittore_rdf import scrivi_file_mosse_rdf, PREDICATI_MOSSA
+from utils.store_quadruple import leggi_nquads, scomponi_letterale
 from visualizza_risultati import VisualizzatoreRisultati
 
 logger = setup_logger()
 
+# Campo PokeAPI -> (variabile della query che indica se il KG ha già il valore, predicato RDF scritto)
+PROPRIETA_MOSSA = {
+    "power": ("hasPower", PREDICATI_MOSSA["power"]),
+    "accuracy": ("hasAccuracy", PREDICATI_MOSSA["accuracy"]),
+    "pp": ("hasPP", PREDICATI_MOSSA["pp"]),
+}
 
-def main():
-    print(f"BASE_DIR: {BASE_DIR}")
-    print(f"QUERY_FILE: {QUERY_SPARQL_MOSSE_SENZA_PARAMETRI}")
-    logger.info("Esecuzione query_sparql SPARQL per mosse incomplete...")
-    mosse_incomplete = esegui_query_sparql(QUERY_SPARQL_MOSSE_SENZA_PARAMETRI)
-    logger.info(f"Trovate {len(mosse_incomplete)} mosse incomplete")
 
-    risultati = []
-    non_trovate = []
+class RigaMossaIncompletaKG(NamedTuple):
+    """Schema di una riga della query mosse_senza_parametri."""
+    move: str
+    hasPower: bool = True
+    hasAccuracy: bool = True
+    hasPP: bool = True
 
-    for mossa in mosse_incomplete:
-        uri_mossa = mossa["move"]["value"]
-        nome_mossa = VisualizzatoreRisultati.normalizza_uri(uri_mossa)
-        logger.info(f"Recupero dati da PokeAPI per {nome_mossa}...")
-        #Tramite poke API ottengo i dati della mossa
-        dati_api = ottieni_dati_mossa(nome_mossa)
 
-        if dati_api is None:
-            logger.warning(f"Mossa non trovata: {nome_mossa}")
-            non_trovate.append(nome_mossa)
-            continue #salto la mossa e mi segno che c'è stato un problema
+class JournalMosse:
+    """
+    Journal append-only delle mosse già elaborate: una riga JSON per mossa con
+    uri, nome, esito ("trovata" / "non_trovata") e i dati ottenuti.
+    Ogni riga viene scritta appena la mossa è completata, quindi dopo un'interruzione
+    basta rileggere il file per sapere cosa resta da fare. Se una mossa compare più volte
+    vale l'ultima riga; una riga troncata (es. crash durante la scrittura) viene ignorata.
+    """
+
+    def __init__(self, percorso: str):
+        self.percorso = percorso
+        self.voci: dict[str, dict] = self._leggi()
+        self._file = open(percorso, "a", encoding="utf-8")
+
+    def registra(self, voce: dict) -> None:
+        self._file.write(json.dumps(voce, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self.voci[voce["uri"]] = voce
+
+    def chiudi(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "JournalMosse":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.chiudi()
+
+    def _leggi(self) -> dict[str, dict]:
+        voci = {}
+        if not os.path.exists(self.percorso):
+            return voci
+        with open(self.percorso, "r", encoding="utf-8") as f:
+            for numero, riga in enumerate(f, start=1):
+                if not riga.strip():
+                    continue
+                try:
+                    voce = json.loads(riga)
+                    voci[voce["uri"]] = voce
+                except (ValueError, KeyError, TypeError):
+                    logger.warning(f"Riga {numero} del journal illeggibile, ignorata")
+        logger.info(f"Journal {self.percorso}: {len(voci)} mosse già elaborate")
+        return voci
+
+
+def mossa_completata(voce: dict | None, campi_mancanti: list[str]) -> bool:
+    """
+    Una mossa non va rielaborata se PokeAPI l'ha già data per inesistente,
+    oppure se i dati registrati coprono tutti i campi che oggi mancano nel KG.
+    """
+    if voce is None:
+        return False
+    if voce["esito"] == "non_trovata":
+        return True
+    return all(campo in voce["dati"] for campo in campi_mancanti)
+
+
+def interroga_mosse_incomplete() -> dict[str, list[str]]:
+    """Fase 1: URI mossa -> campi PokeAPI ancora mancanti nel KG."""
+    mancanti = {}
+    for riga in itera_righe_sparql(QUERY_SPARQL_MOSSE_SENZA_PARAMETRI, RigaMossaIncompletaKG):
+        # Una mossa con più classi di tipo compare su più righe con gli stessi valori
+        mancanti.setdefault(riga.move, [campo for campo, (variabile, _) in PROPRIETA_MOSSA.items()
+                                        if not getattr(riga, variabile)])
+    return mancanti
+
+
+def leggi_mosse_da_nq(percorso: str) -> dict[str, dict[str, int]]:
+    """URI mossa -> campo -> valore per le quadruple già presenti in un file di output precedente."""
+    campo_per_predicato = {f"<{predicato}>": campo for campo, (_, predicato) in PROPRIETA_MOSSA.items()}
+    mosse: dict[str, dict[str, int]] = {}
+    if not os.path.exists(percorso):
+        return mosse
+    with open(percorso, "r", encoding="utf-8") as f:
+        for s, p, o, _ in leggi_nquads(f):
+            campo = campo_per_predicato.get(p)
+            if campo is None or not s.startswith("<"):
+                continue
+            try:
+                mosse.setdefault(s[1:-1], {})[campo] = int(scomponi_letterale(o)[0])
+            except ValueError:
+                continue
+    return mosse
 
-        triple_da_aggiungere = {"uri": uri_mossa}
-        # trattamento del caso di NONE = 0
-        if mossa["hasPower"]["value"] == "false":
-            power_val = dati_api.get("power")
-            triple_da_aggiungere["power"] = power_val if power_val is not None else 0
 
-        if mossa["hasAccuracy"]["value"] == "false":
-            acc_val = dati_api.get("accuracy")
-            triple_da_aggiungere["accuracy"] = acc_val if acc_val is not None else 0
+def importa_da_output(journal: JournalMosse, mosse_incomplete: dict[str, list[str]]) -> int:
+    """
+    Modalità diff: registra nel journal le mosse già presenti nel file N-Quads esistente
+    e quelle già elencate tra le non trovate, così non vengono richieste di nuovo a PokeAPI
+    e le loro quadruple restano nel file riscritto a fine esecuzione.
+    """
+    importate = importa_da_nq(journal, OUTPUT_TTL)
+    if os.path.exists(OUTPUT_MISSING):
+        with open(OUTPUT_MISSING, "r", encoding="utf-8") as f:
+            nomi_non_trovati = {riga.strip() for riga in f if riga.strip()}
+        for uri in mosse_incomplete:
+            nome_mossa = VisualizzatoreRisultati.normalizza_uri(uri)
+            if nome_mossa in nomi_non_trovati and uri not in journal.voci:
+                journal.registra({"uri": uri, "nome": nome_mossa, "esito": "non_trovata", "dati": {}})
+                importate += 1
+    return importate
 
-        if mossa["hasPP"]["value"] == "false":
-            pp_val = dati_api.get("pp")
-            triple_da_aggiungere["pp"] = pp_val if pp_val is not None else 0
 
-        risultati.append(triple_da_aggiungere)
+def importa_da_nq(journal: JournalMosse, percorso: str) -> int:
+    """Registra nel journal le mosse del file N-Quads non ancora presenti (o incomplete) nel journal."""
+    importate = 0
+    for uri, dati in leggi_mosse_da_nq(percorso).items():
+        voce = journal.voci.get(uri)
+        if voce is not None and voce["esito"] == "trovata" and dati.items() <= voce["dati"].items():
+            continue
+        dati_precedenti = voce["dati"] if voce is not None and voce["esito"] == "trovata" else {}
+        journal.registra({"uri": uri, "nome": VisualizzatoreRisultati.normalizza_uri(uri), "esito": "trovata",
+                          "dati": {**dati_precedenti, **dati}})
+        importate += 1
+    logger.info(f"Mosse importate da {percorso}: {importate}")
+    return importate
 
+
+def recupera_dati_mosse(journal: JournalMosse, da_elaborare: dict[str, list[str]]) -> int:
+    """
+    Fase 2: scarica da PokeAPI le mosse ancora da elaborare e registra ogni esito nel journal
+    appena arriva. Le mosse per cui la richiesta fallisce non vengono registrate e saranno
+    ritentate alla prossima esecuzione. Restituisce il numero di mosse fallite.
+    """
+    uri_per_nome: dict[str, list[str]] = {}
+    for uri in da_elaborare:
+        uri_per_nome.setdefault(VisualizzatoreRisultati.normalizza_uri(uri), []).append(uri)
+
+    fallite = 0
+    for nome_mossa, dati_api in ottieni_client_pokeapi().itera_esiti_mosse(uri_per_nome):
+        if dati_api is None:
+            logger.warning(f"Recupero non riuscito per {nome_mossa}, verrà ritentato alla prossima esecuzione")
+            fallite += len(uri_per_nome[nome_mossa])
+            continue
+        for uri_mossa in uri_per_nome[nome_mossa]:
+            if not dati_api:
+                logger.warning(f"Mossa non trovata: {nome_mossa}")
+                journal.registra({"uri": uri_mossa, "nome": nome_mossa, "esito": "non_trovata", "dati": {}})
+                continue
+            precedente = journal.voci.get(uri_mossa)
+            dati = dict(precedente["dati"]) if precedente is not None and precedente["esito"] == "trovata" else {}
+            # trattamento del caso di NONE = 0
+            for campo in da_elaborare[uri_mossa]:
+                valore = dati_api.get(campo)
+                dati[campo] = valore if valore is not None else 0
+            journal.registra({"uri": uri_mossa, "nome": nome_mossa, "esito": "trovata", "dati": dati})
+    return fallite
+
+
+def scrivi_output(voci: dict[str, dict]) -> None:
+    """
+    Fase 3: riscrive il file N-Quads con tutte le mosse trovate nel journal
+    e unisce le mosse non trovate a quelle già elencate nel file esistente.
+    """
+    risultati = [{"uri": uri, **voce["dati"]} for uri, voce in voci.items() if voce["esito"] == "trovata"]
     scrivi_file_mosse_rdf(risultati, OUTPUT_TTL)
     logger.info(f"File NQ salvato in {OUTPUT_TTL}")
 
+    non_trovate: dict[str, None] = {}
+    if os.path.exists(OUTPUT_MISSING):
+        with open(OUTPUT_MISSING, "r", encoding="utf-8") as f:
+            non_trovate.update(dict.fromkeys(riga.strip() for riga in f if riga.strip()))
+    non_trovate.update(dict.fromkeys(voce["nome"] for voce in voci.values() if voce["esito"] == "non_trovata"))
+    # Una mossa trovata in un'esecuzione successiva non è più da segnalare
+    for voce in voci.values():
+        if voce["esito"] == "trovata":
+            non_trovate.pop(voce["nome"], None)
     with open(OUTPUT_MISSING, "w", encoding="utf-8") as f:
         f.write("\n".join(non_trovate))
     logger.info(f"Mosse non trovate: {len(non_trovate)}")
 
 
+def _leggi_argomenti(argv: list[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Arricchisce le mosse incomplete del KG con i dati di PokeAPI")
+    parser.add_argument("--diff-nq", action="store_true",
+                        help=f"considera già elaborate le mosse presenti in {os.path.basename(OUTPUT_TTL)}")
+    parser.add_argument("--ricomincia", action="store_true",
+                        help="ignora il journal delle esecuzioni precedenti e rielabora tutte le mosse")
+    aggiungi_argomento_aggiorna_kg(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None):
+    args = _leggi_argomenti(argv)
+    configura_client_sparql(args.aggiorna_kg)
+    print(f"BASE_DIR: {BASE_DIR}")
+    print(f"QUERY_FILE: {QUERY_SPARQL_MOSSE_SENZA_PARAMETRI}")
+
+    if args.ricomincia and os.path.exists(OUTPUT_JOURNAL_MOSSE):
+        os.remove(OUTPUT_JOURNAL_MOSSE)
+        logger.info("Journal precedente eliminato")
+
+    logger.info("Esecuzione query_sparql SPARQL per mosse incomplete...")
+    mosse_incomplete = interroga_mosse_incomplete()
+    logger.info(f"Trovate {len(mosse_incomplete)} mosse incomplete")
+
+    with JournalMosse(OUTPUT_JOURNAL_MOSSE) as journal:
+        if args.diff_nq:
+            importa_da_output(journal, mosse_incomplete)
+        da_elaborare = {uri: campi for uri, campi in mosse_incomplete.items()
+                        if not mossa_completata(journal.voci.get(uri), campi)}
+        logger.info(f"Mosse da elaborare: {len(da_elaborare)} "
+                    f"(già completate: {len(mosse_incomplete) - len(da_elaborare)})")
+
+        fallite = recupera_dati_mosse(journal, da_elaborare) if da_elaborare else 0
+        voci = dict(journal.voci)
+
+    scrivi_output(voci)
+    if fallite:
+        logger.warning(f"Mosse da ritentare alla prossima esecuzione: {fallite}")
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,71 @@
+import argparse
+import time
+
+from config.costanti_globali import ENDPOINT_AGGIORNAMENTO_SPARQL, DIMENSIONE_BATCH_CARICAMENTO, \
+    MAX_BATCH_PARALLELI_CARICAMENTO
+from utils.caricatore_rdf import CaricatoreKG, DestinazioneHttp, DestinazioneLocale
+from utils.client_sparql import CacheRisultatiSparql
+from utils.registro_log import setup_logger
+from utils.sparql_locale import file_dataset_progetto, ottieni_store_locale
+from utils.store_quadruple import iri
+
+logger = setup_logger()
+
+
+def _leggi_argomenti(argv: list[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Carica file N-Quads/N-Triples/Turtle nel triplestore, sostituendo i grafi nominati")
+    parser.add_argument("file", nargs="*",
+                        help="file da caricare (default: i dataset di risorse/dataset_quadruple_pokemonKG)")
+    parser.add_argument("--endpoint", default=ENDPOINT_AGGIORNAMENTO_SPARQL,
+                        help="endpoint che accetta POST application/n-quads e SPARQL Update")
+    parser.add_argument("--batch", type=int, default=DIMENSIONE_BATCH_CARICAMENTO,
+                        help="quadruple per richiesta")
+    parser.add_argument("--paralleli", type=int, default=MAX_BATCH_PARALLELI_CARICAMENTO,
+                        help="richieste contemporanee")
+    parser.add_argument("--grafo-predefinito", default=None,
+                        help="IRI del grafo in cui caricare le triple senza grafo (es. i file .ttl)")
+    parser.add_argument("--aggiungi", action="store_true",
+                        help="aggiunge le quadruple senza svuotare prima i grafi nominati")
+    parser.add_argument("--prova", action="store_true",
+                        help="prova a secco: applica il caricamento al KG locale in memoria invece che al triplestore")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None):
+    args = _leggi_argomenti(argv)
+    percorsi = args.file or file_dataset_progetto()
+    grafo_predefinito = iri(args.grafo_predefinito) if args.grafo_predefinito else None
+
+    if args.prova:
+        store = ottieni_store_locale()
+        destinazione = DestinazioneLocale(store)
+        logger.info(f"Prova a secco sul KG locale ({len(store)} triple distinte)")
+    else:
+        destinazione = DestinazioneHttp(args.endpoint, max_connessioni=args.paralleli)
+        logger.info(f"Caricamento verso {args.endpoint}")
+
+    inizio = time.perf_counter()
+    with CaricatoreKG(destinazione, dimensione_batch=args.batch, max_batch_paralleli=args.paralleli,
+                      sostituisci_grafi=not args.aggiungi) as caricatore:
+        inviate = caricatore.carica_file(percorsi, grafo_predefinito)
+    durata = time.perf_counter() - inizio
+
+    for grafo, numero in inviate.items():
+        logger.info(f"Grafo {grafo or '(default)'}: {numero} quadruple")
+    totale = sum(inviate.values())
+    logger.info(f"Caricate {totale} quadruple da {len(percorsi)} file in {durata:.1f}s "
+                f"({totale / max(durata, 1e-9):.0f} quadruple/s)")
+
+    if args.prova:
+        for grafo in inviate:
+            logger.info(f"[prova a secco] Grafo {grafo or '(default)'} nel KG locale: "
+                        f"{destinazione.store.numero_quadruple(grafo)} quadruple")
+    else:
+        # I risultati SPARQL in cache si riferiscono al KG precedente al caricamento
+        CacheRisultatiSparql().svuota()
+        logger.info("Cache dei risultati SPARQL svuotata")
+
+
+if __name__ == "__main__":
+    main()
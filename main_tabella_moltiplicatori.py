@@ -1,6 +1,10 @@
 import pandas as pd
 
 from config.costanti_globali import OUTPUT_TABELLA_MOLTIPLICATORI, FILE_CSV_TABELLA_MOLTIPLICATORI
+from utils.scrittore_rdf import ScrittoreNQuads
+from utils.store_quadruple import RDF_TYPE, XSD
+
+ONTO = "https://pokemonkg.org/ontology#"
 
 
 def main():
@@ -13,26 +17,28 @@ def main():
     Tutti i quad hanno come grafo: <https://pokemonkg.org/dataset/bulbapedia>
     perché sono presi da questa fonte
     """
-    SOURCE_GRAPH = "<https://pokemonkg.org/dataset/bulbapedia>"
+    SOURCE_GRAPH = "https://pokemonkg.org/dataset/bulbapedia"
 
     # Carica la tabella dal CSV (prima colonna = index)
     df = pd.read_csv(FILE_CSV_TABELLA_MOLTIPLICATORI, index_col=0)
 
-    lines = []
-    rel_counter = 1
-    for move_uri, row in df.iterrows():
-        for target_uri, multiplier in row.items():
-            relation_uri = f"<https://pokemonkg.org/instance/damageRel_{rel_counter:03d}>"
-            lines.append(
-                f"{relation_uri} <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <https://pokemonkg.org/ontology#DamageMultiplierRelation> {SOURCE_GRAPH} .")
-            lines.append(f"{relation_uri} <https://pokemonkg.org/ontology#moveType> <{move_uri}> {SOURCE_GRAPH} .")
-            lines.append(f"{relation_uri} <https://pokemonkg.org/ontology#targetType> <{target_uri}> {SOURCE_GRAPH} .")
-            lines.append(
-                f"{relation_uri} <https://pokemonkg.org/ontology#damageMultiplierValue> \"{multiplier}\"^^<http://www.w3.org/2001/XMLSchema#decimal> {SOURCE_GRAPH} .")
-            rel_counter += 1
-
-    with open(OUTPUT_TABELLA_MOLTIPLICATORI, "w", encoding="utf-8") as f:
-        f.write("\n".join(lines))
+    with ScrittoreNQuads(OUTPUT_TABELLA_MOLTIPLICATORI, grafo=SOURCE_GRAPH) as scrittore:
+        rdf_type = scrittore.iri(RDF_TYPE)
+        classe_relazione = scrittore.iri(f"{ONTO}DamageMultiplierRelation")
+        move_type = scrittore.iri(f"{ONTO}moveType")
+        target_type = scrittore.iri(f"{ONTO}targetType")
+        valore_moltiplicatore = scrittore.iri(f"{ONTO}damageMultiplierValue")
+
+        rel_counter = 1
+        for move_uri, row in df.iterrows():
+            for target_uri, multiplier in row.items():
+                relation_uri = scrittore.iri(f"https://pokemonkg.org/instance/damageRel_{rel_counter:03d}")
+                scrittore.scrivi(relation_uri, rdf_type, classe_relazione)
+                scrittore.scrivi(relation_uri, move_type, scrittore.iri(move_uri))
+                scrittore.scrivi(relation_uri, target_type, scrittore.iri(target_uri))
+                scrittore.scrivi(relation_uri, valore_moltiplicatore,
+                                 scrittore.letterale(multiplier, f"{XSD}decimal"))
+                rel_counter += 1
 
     print("File damage_multipliers.nq generato con successo!")
 
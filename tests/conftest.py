@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Come per main_csp: la radice del progetto e csp nel path (i moduli del CSP importano `problemi...`)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for percorso in (BASE_DIR, os.path.join(BASE_DIR, "csp")):
+    if percorso not in sys.path:
+        sys.path.insert(0, percorso)
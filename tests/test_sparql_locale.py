@@ -0,0 +1,124 @@
+"""
+Test del KG locale (utils.store_quadruple e utils.sparql_locale) sul dataset minimo tests/risorse/kg_minimo.nq:
+le query di query_sparql/ usate dal progetto devono dare gli stessi binding che darebbe GraphDB.
+"""
+import os
+
+import pytest
+
+from config.costanti_globali import QUERY_SPARQL_POKEMON_TIPI, QUERY_SPARQL_TUTTE_MOSSE, \
+    QUERY_SPARQL_MOSSE_SENZA_PARAMETRI, QUERY_SPARQL_TABELLA_MOLTIPLICATORI_DANNI
+from utils.sparql_locale import esegui_query_locale
+from utils.store_quadruple import StoreQuadrupleLocale, leggi_nquads
+
+FILE_KG_MINIMO = os.path.join(os.path.dirname(__file__), "risorse", "kg_minimo.nq")
+
+ONTO = "https://pokemonkg.org/ontology#"
+ISTANZA = "https://pokemonkg.org/instance/"
+XSD = "http://www.w3.org/2001/XMLSchema#"
+
+
+def _uri(valore: str) -> dict:
+    return {"type": "uri", "value": valore}
+
+
+def _intero(valore: int) -> dict:
+    return {"type": "literal", "value": str(valore), "datatype": f"{XSD}integer"}
+
+
+def _booleano(valore: bool) -> dict:
+    return {"type": "literal", "value": "true" if valore else "false", "datatype": f"{XSD}boolean"}
+
+
+def _tipo(nome: str) -> dict:
+    return _uri(f"{ONTO}PokéType:{nome}")
+
+
+def _esegui(percorso_query: str, store: StoreQuadrupleLocale) -> list[dict]:
+    with open(percorso_query, encoding="utf-8") as f:
+        return esegui_query_locale(f.read(), store)
+
+
+@pytest.fixture(scope="module")
+def store() -> StoreQuadrupleLocale:
+    store = StoreQuadrupleLocale()
+    store.carica_file(FILE_KG_MINIMO)
+    return store
+
+
+def test_righe_malformate_saltate():
+    with open(FILE_KG_MINIMO, encoding="utf-8") as f:
+        righe = f.readlines()
+    quadruple = list(leggi_nquads(righe))
+    valide = [r for r in righe if r.strip() and not r.startswith("#")]
+    # Le tre righe malformate in fondo al file vengono scartate, le altre lette tutte
+    assert len(quadruple) == len(valide) - 3
+    assert not any("rotta" in s for s, _, _, _ in quadruple)
+
+
+def test_store_per_grafo(store):
+    assert set(store.grafi()) == {"<https://pokemonkg.org/dataset/pokemonkg>",
+                                  "<https://pokemonkg.org/dataset/pokeapi>",
+                                  "<https://pokemonkg.org/dataset/bulbapedia>"}
+    assert store.numero_quadruple("<https://pokemonkg.org/dataset/pokeapi>") == 7
+    assert len(store) == store.numero_quadruple()
+
+
+def test_pokemon_tipi(store):
+    risultati = _esegui(QUERY_SPARQL_POKEMON_TIPI, store)
+    attesi = [
+        {"pokemon": _uri(f"{ISTANZA}pokemon/pikachu"), "type": _tipo("Electric")},
+        {"pokemon": _uri(f"{ISTANZA}pokemon/charizard"), "type": _tipo("Fire")},
+        {"pokemon": _uri(f"{ISTANZA}pokemon/charizard"), "type": _tipo("Flying")},
+    ]
+    # Nessun ORDER BY: conta solo l'insieme dei binding (le mosse hanno hasType ma non sono Species)
+    chiave = lambda b: (b["pokemon"]["value"], b["type"]["value"])
+    assert sorted(risultati, key=chiave) == sorted(attesi, key=chiave)
+
+
+def test_tutte_mosse(store):
+    risultati = _esegui(QUERY_SPARQL_TUTTE_MOSSE, store)
+    # Solo le mosse con tutti e tre i parametri, ordinate per URI
+    assert risultati == [
+        {"move": _uri(f"{ISTANZA}move/flamethrower"), "basePower": _intero(90), "accuracy": _intero(100),
+         "pp": _intero(15), "moveType": _tipo("Fire"), "catMove": _uri(f"{ONTO}SpecialMove")},
+        {"move": _uri(f"{ISTANZA}move/thunderbolt"), "basePower": _intero(90), "accuracy": _intero(100),
+         "pp": _intero(15), "moveType": _tipo("Electric"), "catMove": _uri(f"{ONTO}SpecialMove")},
+    ]
+
+
+def test_mosse_senza_parametri(store):
+    risultati = _esegui(QUERY_SPARQL_MOSSE_SENZA_PARAMETRI, store)
+    # OPTIONAL + FILTER su !BOUND: restano le mosse incomplete, ordinate per categoria e poi per URI
+    assert risultati == [
+        {"move": _uri(f"{ISTANZA}move/tackle"), "typeClass": _uri(f"{ONTO}PhysicalMove"),
+         "hasPower": _booleano(False), "hasAccuracy": _booleano(False), "hasPP": _booleano(False)},
+        {"move": _uri(f"{ISTANZA}move/growl"), "typeClass": _uri(f"{ONTO}StatusMove"),
+         "hasPower": _booleano(False), "hasAccuracy": _booleano(False), "hasPP": _booleano(True)},
+    ]
+
+
+def test_tabella_moltiplicatori(store):
+    risultati = _esegui(QUERY_SPARQL_TABELLA_MOLTIPLICATORI_DANNI, store)
+    assert len(risultati) == 20
+    assert {"attackerType": _uri(f"{ONTO}PokéType_Fire"), "defenderType": _tipo("Grass"),
+            "multiplier": {"type": "literal", "value": "2.0", "datatype": f"{XSD}decimal"}} in risultati
+
+
+def test_matrice_moltiplicatori_normalizza_tipi(store, monkeypatch):
+    import utils.client_sparql as client_sparql
+    import utils.sparql_locale as sparql_locale
+    from entita.tipo_pokemon import ID_TIPO, TipoPokemon
+    from problemi.battaglia_pokemon.problema_scontro import _costruisci_matrice_moltiplicatori
+
+    # Il client condiviso, con backend locale, interroga il KG minimo
+    monkeypatch.setattr(sparql_locale, "_store_locale", store)
+    monkeypatch.setattr(client_sparql, "_client_predefinito", client_sparql.ClientSparql(backend="locale"))
+
+    matrice = _costruisci_matrice_moltiplicatori()
+    fuoco, erba, acqua = (ID_TIPO[t.value] for t in (TipoPokemon.FIRE, TipoPokemon.GRASS, TipoPokemon.WATER))
+    # 'PokéType_Fire' è ricondotto a Fire: 18 tipi, non 19
+    assert matrice.shape == (18, 18)
+    assert matrice[fuoco, erba] == 2.0
+    assert matrice[acqua, fuoco] == 2.0
+    assert matrice[erba, fuoco] == 1.0
@@ -0,0 +1,218 @@
+import hashlib
+import os
+import pickle
+import threading
+import time
+import zlib
+from typing import Any, Iterable, Iterator
+
+from utils.registro_log import setup_logger
+
+logger = setup_logger()
+
+
+class CacheDisco:
+    """
+    Cache persistente su disco: ogni voce è un file binario (pickle compresso con zlib)
+    il cui nome è l'hash SHA-256 della chiave.
+
+    - TTL: una voce più vecchia di `ttl_secondi` viene scartata alla lettura (None = nessuna scadenza)
+    - dimensione: se la cartella supera `dimensione_massima` byte, le voci usate
+      meno di recente vengono eliminate (la lettura aggiorna la data di ultima modifica)
+    - voci a blocchi: apri_scrittura / leggi_a_blocchi salvano e rileggono una voce un blocco alla volta
+      (ogni blocco è un pickle compresso preceduto dalla sua lunghezza), così né chi scrive né chi legge
+      deve tenere in memoria il valore intero
+    """
+
+    ESTENSIONE = ".bin"
+    # Intestazione dei file delle voci a blocchi, per distinguerli dalle voci scritte con scrivi()
+    INTESTAZIONE_BLOCCHI = b"CDB1"
+
+    def __init__(self, cartella: str, ttl_secondi: float | None = None,
+                 dimensione_massima: int | None = None):
+        self.cartella = cartella
+        self.ttl_secondi = ttl_secondi
+        self.dimensione_massima = dimensione_massima
+        self._lock = threading.Lock()
+        os.makedirs(cartella, exist_ok=True)
+
+    @staticmethod
+    def calcola_chiave(*parti: str) -> str:
+        """Hash esadecimale delle parti che identificano una voce."""
+        h = hashlib.sha256()
+        for parte in parti:
+            h.update(parte.encode("utf-8"))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def leggi(self, chiave: str) -> Any | None:
+        """Restituisce il valore associato alla chiave, oppure None se assente o scaduto."""
+        percorso = self._percorso(chiave)
+        try:
+            eta = time.time() - os.path.getmtime(percorso)
+            if self.ttl_secondi is not None and eta > self.ttl_secondi:
+                logger.debug(f"Voce di cache scaduta: {percorso}")
+                self._rimuovi(percorso)
+                return None
+            with open(percorso, "rb") as f:
+                valore = pickle.loads(zlib.decompress(f.read()))
+            # Aggiorna la data di ultimo utilizzo per l'eviction
+            os.utime(percorso)
+            return valore
+        except FileNotFoundError:
+            return None
+        except (OSError, zlib.error, pickle.UnpicklingError, EOFError) as e:
+            logger.warning(f"Voce di cache illeggibile, verrà scartata: {percorso} ({e})")
+            self._rimuovi(percorso)
+            return None
+
+    def scrivi(self, chiave: str, valore: Any) -> None:
+        """Salva il valore in modo atomico e applica l'eviction per dimensione."""
+        percorso = self._percorso(chiave)
+        dati = zlib.compress(pickle.dumps(valore, protocol=pickle.HIGHEST_PROTOCOL))
+        temporaneo = f"{percorso}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporaneo, "wb") as f:
+                f.write(dati)
+            os.replace(temporaneo, percorso)
+        except OSError as e:
+            logger.warning(f"Impossibile scrivere la voce di cache {percorso}: {e}")
+            self._rimuovi(temporaneo)
+            return
+        self._applica_limite_dimensione()
+
+    def apri_scrittura(self, chiave: str) -> "ScrittoreVoceCache":
+        """
+        Scrittura a blocchi di una voce: la voce diventa visibile solo con conferma();
+        chiusa senza conferma (anche per un'eccezione) viene scartata.
+        """
+        return ScrittoreVoceCache(self, self._percorso(chiave))
+
+    def scrivi_a_blocchi(self, chiave: str, blocchi: Iterable[Any]) -> None:
+        with self.apri_scrittura(chiave) as scrittore:
+            for blocco in blocchi:
+                scrittore.aggiungi(blocco)
+            scrittore.conferma()
+
+    def leggi_a_blocchi(self, chiave: str) -> Iterator[Any] | None:
+        """
+        Blocchi di una voce scritta con apri_scrittura, letti uno alla volta;
+        None se la voce è assente, scaduta o non è una voce a blocchi.
+        """
+        percorso = self._percorso(chiave)
+        try:
+            eta = time.time() - os.path.getmtime(percorso)
+            if self.ttl_secondi is not None and eta > self.ttl_secondi:
+                logger.debug(f"Voce di cache scaduta: {percorso}")
+                self._rimuovi(percorso)
+                return None
+            f = open(percorso, "rb")
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"Voce di cache illeggibile: {percorso} ({e})")
+            return None
+        if f.read(len(self.INTESTAZIONE_BLOCCHI)) != self.INTESTAZIONE_BLOCCHI:
+            f.close()
+            logger.warning(f"Voce di cache in un formato diverso, verrà scartata: {percorso}")
+            self._rimuovi(percorso)
+            return None
+        os.utime(percorso)
+        return self._itera_blocchi(f, percorso)
+
+    def _itera_blocchi(self, f, percorso: str) -> Iterator[Any]:
+        with f:
+            while lunghezza := f.read(8):
+                dati = f.read(int.from_bytes(lunghezza, "little"))
+                try:
+                    yield pickle.loads(zlib.decompress(dati))
+                except (zlib.error, pickle.UnpicklingError, EOFError) as e:
+                    # I blocchi già prodotti sono stati consumati: il chiamante deve saperlo
+                    self._rimuovi(percorso)
+                    raise ValueError(f"Voce di cache danneggiata: {percorso} ({e})") from e
+
+    def invalida(self, chiave: str) -> None:
+        self._rimuovi(self._percorso(chiave))
+
+    def svuota(self) -> None:
+        """Elimina tutte le voci della cache."""
+        for voce in self._voci():
+            self._rimuovi(voce.path)
+
+    def _percorso(self, chiave: str) -> str:
+        return os.path.join(self.cartella, chiave + self.ESTENSIONE)
+
+    def _voci(self) -> list[os.DirEntry]:
+        try:
+            with os.scandir(self.cartella) as it:
+                return [e for e in it if e.is_file() and e.name.endswith(self.ESTENSIONE)]
+        except FileNotFoundError:
+            return []
+
+    def _applica_limite_dimensione(self) -> None:
+        if self.dimensione_massima is None:
+            return
+        with self._lock:
+            voci = []
+            for voce in self._voci():
+                try:
+                    stat = voce.stat()
+                except FileNotFoundError:
+                    continue
+                voci.append((stat.st_mtime, stat.st_size, voce.path))
+            totale = sum(dimensione for _, dimensione, _ in voci)
+            # Elimina prima le voci usate meno di recente
+            for _, dimensione, percorso in sorted(voci):
+                if totale <= self.dimensione_massima:
+                    break
+                logger.debug(f"Eviction voce di cache: {percorso}")
+                self._rimuovi(percorso)
+                totale -= dimensione
+
+    @staticmethod
+    def _rimuovi(percorso: str) -> None:
+        try:
+            os.remove(percorso)
+        except FileNotFoundError:
+            pass
+
+
+class ScrittoreVoceCache:
+    """
+    Scrittura a blocchi di una voce di CacheDisco su un file temporaneo,
+    rinominato nel file della voce solo da conferma().
+    """
+
+    def __init__(self, cache: CacheDisco, percorso: str):
+        self._cache = cache
+        self._percorso = percorso
+        self._temporaneo = f"{percorso}.{threading.get_ident()}.tmp"
+        self._file = open(self._temporaneo, "wb")
+        self._file.write(CacheDisco.INTESTAZIONE_BLOCCHI)
+
+    def aggiungi(self, blocco: Any) -> None:
+        dati = zlib.compress(pickle.dumps(blocco, protocol=pickle.HIGHEST_PROTOCOL))
+        self._file.write(len(dati).to_bytes(8, "little"))
+        self._file.write(dati)
+
+    def conferma(self) -> None:
+        try:
+            self._file.close()
+            os.replace(self._temporaneo, self._percorso)
+        except OSError as e:
+            logger.warning(f"Impossibile scrivere la voce di cache {self._percorso}: {e}")
+            CacheDisco._rimuovi(self._temporaneo)
+            return
+        self._cache._applica_limite_dimensione()
+
+    def annulla(self) -> None:
+        """Scarta la voce (nessun effetto dopo conferma)."""
+        if not self._file.closed:
+            self._file.close()
+            CacheDisco._rimuovi(self._temporaneo)
+
+    def __enter__(self) -> "ScrittoreVoceCache":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.annulla()
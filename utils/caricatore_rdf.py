@@ -0,0 +1,164 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterable
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config.costanti_globali import ENDPOINT_AGGIORNAMENTO_SPARQL, DIMENSIONE_BATCH_CARICAMENTO, \
+    MAX_BATCH_PARALLELI_CARICAMENTO, TIMEOUT_CONNESSIONE_SPARQL, TIMEOUT_LETTURA_CARICAMENTO
+from utils.registro_log import setup_logger
+from utils.store_quadruple import StoreQuadrupleLocale, itera_quadruple_file
+
+logger = setup_logger()
+
+Quadrupla = tuple[str, str, str, str | None]
+
+
+class DestinazioneHttp:
+    """
+    Triplestore remoto: le quadruple sono inviate in POST come application/n-quads
+    e i grafi vengono svuotati con SPARQL Update (DROP SILENT GRAPH).
+    Con GraphDB/RDF4J entrambe le operazioni passano per /repositories/<repo>/statements.
+    """
+
+    def __init__(self, endpoint: str = ENDPOINT_AGGIORNAMENTO_SPARQL,
+                 timeout_connessione: float = TIMEOUT_CONNESSIONE_SPARQL,
+                 timeout_lettura: float = TIMEOUT_LETTURA_CARICAMENTO,
+                 max_connessioni: int = MAX_BATCH_PARALLELI_CARICAMENTO):
+        self.endpoint = endpoint
+        self.timeout = (timeout_connessione, timeout_lettura)
+        self._sessione = requests.Session()
+        adattatore = HTTPAdapter(pool_connections=1, pool_maxsize=max_connessioni)
+        self._sessione.mount("http://", adattatore)
+        self._sessione.mount("https://", adattatore)
+
+    def svuota_grafo(self, grafo: str) -> None:
+        response = self._sessione.post(self.endpoint, data=f"DROP SILENT GRAPH {grafo}".encode("utf-8"),
+                                       headers={"Content-Type": "application/sparql-update"}, timeout=self.timeout)
+        response.raise_for_status()
+
+    def invia(self, quadruple: list[Quadrupla]) -> None:
+        corpo = "".join(f"{s} {p} {o} {g} .\n" if g else f"{s} {p} {o} .\n" for s, p, o, g in quadruple)
+        response = self._sessione.post(self.endpoint, data=corpo.encode("utf-8"),
+                                       headers={"Content-Type": "application/n-quads; charset=utf-8"},
+                                       timeout=self.timeout)
+        response.raise_for_status()
+
+    def chiudi(self) -> None:
+        self._sessione.close()
+
+
+class DestinazioneLocale:
+    """
+    Quad store in memoria (vedi utils.store_quadruple): usato per la prova a secco,
+    applica le stesse operazioni del caricamento remoto senza toccare il triplestore.
+    """
+
+    def __init__(self, store: StoreQuadrupleLocale | None = None):
+        self.store = store if store is not None else StoreQuadrupleLocale()
+        self._lock = threading.Lock()
+
+    def svuota_grafo(self, grafo: str) -> None:
+        with self._lock:
+            rimosse = self.store.rimuovi_grafo(grafo)
+        logger.info(f"[prova a secco] Grafo {grafo} svuotato: {rimosse} quadruple rimosse")
+
+    def invia(self, quadruple: list[Quadrupla]) -> None:
+        with self._lock:
+            self.store.aggiungi_tutte(quadruple)
+
+    def chiudi(self) -> None:
+        pass
+
+
+class CaricatoreKG:
+    """
+    Caricamento massivo di file RDF in un triplestore.
+
+    I file sono letti in streaming e inviati a blocchi di `dimensione_batch` quadruple,
+    con al massimo `max_batch_paralleli` richieste in volo: in memoria restano solo i blocchi
+    in attesa, indipendentemente dalla dimensione dei file. Le righe malformate vengono
+    scartate in lettura, così un errore di sintassi non fa rifiutare un intero blocco.
+
+    Con sostituisci_grafi=True ogni grafo nominato viene svuotato la prima volta che compare,
+    prima di inviare i blocchi che lo contengono: ricaricare un file ne rimpiazza il contenuto
+    invece di sommarsi a quello precedente. Le triple senza grafo finiscono in `grafo_predefinito`
+    se indicato, altrimenti nel grafo di default, che non viene mai svuotato.
+    """
+
+    def __init__(self, destinazione: DestinazioneHttp | DestinazioneLocale,
+                 dimensione_batch: int = DIMENSIONE_BATCH_CARICAMENTO,
+                 max_batch_paralleli: int = MAX_BATCH_PARALLELI_CARICAMENTO,
+                 sostituisci_grafi: bool = True):
+        self.destinazione = destinazione
+        self.dimensione_batch = dimensione_batch
+        self.max_batch_paralleli = max_batch_paralleli
+        self.sostituisci_grafi = sostituisci_grafi
+        self._grafi_svuotati: set[str] = set()
+
+    def carica_file(self, percorsi: Iterable[str], grafo_predefinito: str | None = None) -> dict[str | None, int]:
+        """
+        Carica i file indicati e restituisce il numero di quadruple inviate per grafo.
+        Solleva requests.RequestException al primo blocco rifiutato dal triplestore.
+        """
+        inviate: dict[str | None, int] = {}
+        for percorso in percorsi:
+            logger.info(f"Caricamento di {percorso}...")
+            self.carica_quadruple(itera_quadruple_file(percorso), grafo_predefinito, inviate)
+        return inviate
+
+    def carica_quadruple(self, quadruple: Iterable[Quadrupla], grafo_predefinito: str | None = None,
+                         inviate: dict[str | None, int] | None = None) -> dict[str | None, int]:
+        inviate = {} if inviate is None else inviate
+        # Limita i blocchi in volo: la lettura si ferma finché uno dei precedenti non è stato inviato
+        posti_liberi = threading.BoundedSemaphore(self.max_batch_paralleli)
+        futuri: list[Future] = []
+
+        def _invia(blocco: list[Quadrupla]) -> int:
+            try:
+                self.destinazione.invia(blocco)
+                return len(blocco)
+            finally:
+                posti_liberi.release()
+
+        with ThreadPoolExecutor(max_workers=self.max_batch_paralleli, thread_name_prefix="caricamento") as esecutore:
+            def _sottometti(blocco: list[Quadrupla]) -> None:
+                posti_liberi.acquire()
+                futuri.append(esecutore.submit(_invia, blocco))
+                # Interrompe subito il caricamento se un blocco precedente è fallito
+                for futuro in [f for f in futuri if f.done()]:
+                    futuri.remove(futuro)
+                    futuro.result()
+
+            blocco: list[Quadrupla] = []
+            for s, p, o, g in quadruple:
+                g = g or grafo_predefinito
+                if g is not None and self.sostituisci_grafi and g not in self._grafi_svuotati:
+                    # Svuotamento sincrono: nessun blocco già sottomesso contiene questo grafo,
+                    # quelli successivi partono solo a svuotamento completato
+                    self.destinazione.svuota_grafo(g)
+                    self._grafi_svuotati.add(g)
+                blocco.append((s, p, o, g))
+                inviate[g] = inviate.get(g, 0) + 1
+                if len(blocco) >= self.dimensione_batch:
+                    _sottometti(blocco)
+                    blocco = []
+            if blocco:
+                _sottometti(blocco)
+            self._attendi(futuri)
+        return inviate
+
+    @staticmethod
+    def _attendi(futuri: list[Future]) -> None:
+        while futuri:
+            futuri.pop(0).result()
+
+    def chiudi(self) -> None:
+        self.destinazione.chiudi()
+
+    def __enter__(self) -> "CaricatoreKG":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.chiudi()
@@ -1,31 +1,234 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from email.utils import parsedate_to_datetime
+from typing import Iterable, Iterator
+
 import requests
+from requests.adapters import HTTPAdapter
 
+from config.costanti_globali import POKEAPI_BASE_URL, RICHIESTE_AL_SECONDO_POKEAPI, RAFFICA_POKEAPI, \
+    MAX_RICHIESTE_PARALLELE_POKEAPI, MAX_TENTATIVI_POKEAPI, BACKOFF_INIZIALE_POKEAPI, BACKOFF_MASSIMO_POKEAPI, \
+    TIMEOUT_CONNESSIONE_POKEAPI, TIMEOUT_LETTURA_POKEAPI, CACHE_POKEAPI_DIR, TTL_CACHE_POKEAPI
+from utils.cache_disco import CacheDisco
 from utils.registro_log import setup_logger
 
 logger = setup_logger()
 
-POKEAPI_BASE_URL = "https://pokeapi.co/api/v2/move/"
+# Codici HTTP per cui ha senso ritentare la richiesta
+CODICI_DA_RITENTARE = {429, 500, 502, 503, 504}
+
+
+class LimitatoreRichieste:
+    """
+    Token bucket condiviso tra i thread: i gettoni si ricaricano a `richieste_al_secondo`
+    fino a un massimo di `capacita`; ogni richiesta ne consuma uno e, se non ce ne sono,
+    attende il tempo necessario alla ricarica.
+    """
+
+    def __init__(self, richieste_al_secondo: float, capacita: int = 1):
+        self.richieste_al_secondo = richieste_al_secondo
+        self.capacita = capacita
+        self._gettoni = float(capacita)
+        self._ultimo_aggiornamento = time.monotonic()
+        self._lock = threading.Lock()
+
+    def attendi(self) -> None:
+        while True:
+            with self._lock:
+                adesso = time.monotonic()
+                self._gettoni = min(self.capacita,
+                                    self._gettoni + (adesso - self._ultimo_aggiornamento) * self.richieste_al_secondo)
+                self._ultimo_aggiornamento = adesso
+                if self._gettoni >= 1:
+                    self._gettoni -= 1
+                    return
+                attesa = (1 - self._gettoni) / self.richieste_al_secondo
+            time.sleep(attesa)
+
+
+class ClientPokeApi:
+    """
+    Client PokeAPI con sessione HTTP persistente, richieste parallele limitate,
+    rate limiting a token bucket, timeout e ritentativi con backoff esponenziale su 429/5xx
+    (rispettando l'header Retry-After quando presente).
+
+    Le risposte sono salvate in una cache su disco con chiave il nome della mossa:
+    anche le mosse inesistenti (404) vengono ricordate, così una nuova esecuzione
+    non interroga di nuovo PokeAPI per nomi già verificati.
+    """
+
+    def __init__(self, url_base: str = POKEAPI_BASE_URL,
+                 richieste_al_secondo: float = RICHIESTE_AL_SECONDO_POKEAPI,
+                 raffica: int = RAFFICA_POKEAPI,
+                 max_richieste_parallele: int = MAX_RICHIESTE_PARALLELE_POKEAPI,
+                 max_tentativi: int = MAX_TENTATIVI_POKEAPI,
+                 backoff_iniziale: float = BACKOFF_INIZIALE_POKEAPI,
+                 backoff_massimo: float = BACKOFF_MASSIMO_POKEAPI,
+                 timeout_connessione: float = TIMEOUT_CONNESSIONE_POKEAPI,
+                 timeout_lettura: float = TIMEOUT_LETTURA_POKEAPI,
+                 cache: CacheDisco | None = None):
+        self.url_base = url_base if url_base.endswith("/") else url_base + "/"
+        self.max_richieste_parallele = max_richieste_parallele
+        self.max_tentativi = max_tentativi
+        self.backoff_iniziale = backoff_iniziale
+        self.backoff_massimo = backoff_massimo
+        self.timeout = (timeout_connessione, timeout_lettura)
+        self.cache = cache
+        self.limitatore = LimitatoreRichieste(richieste_al_secondo, raffica)
+
+        self._sessione = requests.Session()
+        adattatore = HTTPAdapter(pool_connections=1, pool_maxsize=max_richieste_parallele)
+        self._sessione.mount("http://", adattatore)
+        self._sessione.mount("https://", adattatore)
+        self._sessione.headers.update({"Accept": "application/json"})
+
+    def ottieni_dati_mossa(self, nome_mossa: str) -> dict | None:
+        """
+        Ottiene power, accuracy e pp di una mossa.
+        Restituisce None se la mossa non esiste o se tutti i tentativi falliscono.
+        """
+        return self.ottieni_esito_mossa(nome_mossa) or None
+
+    def ottieni_esito_mossa(self, nome_mossa: str) -> dict | None:
+        """
+        Come ottieni_dati_mossa, ma distingue i due casi negativi:
+        {} se PokeAPI conferma che la mossa non esiste, None se la richiesta non è riuscita
+        (errore di rete o tentativi esauriti) e ha quindi senso riprovare più avanti.
+        """
+        chiave = CacheDisco.calcola_chiave(self.url_base, nome_mossa)
+        if self.cache is not None:
+            voce = self.cache.leggi(chiave)
+            if voce is not None:
+                logger.debug(f"Dati letti dalla cache per {nome_mossa}")
+                # False indica una mossa già verificata come inesistente
+                return voce or {}
+
+        dati = self._scarica(nome_mossa)
+        if dati is None:
+            return None
+        # Una mossa inesistente viene salvata come False: None è riservato agli errori, che non vanno ricordati
+        if self.cache is not None:
+            self.cache.scrivi(chiave, dati or False)
+        return dati
+
+    def itera_esiti_mosse(self, nomi_mosse: Iterable[str]) -> Iterator[tuple[str, dict | None]]:
+        """
+        Scarica in parallelo i dati delle mosse e produce le coppie (nome, esito)
+        man mano che le richieste terminano, quindi non nell'ordine di input.
+        L'esito segue la convenzione di ottieni_esito_mossa.
+        """
+        nomi = list(dict.fromkeys(nomi_mosse))
+        if not nomi:
+            return
+        with ThreadPoolExecutor(max_workers=min(self.max_richieste_parallele, len(nomi)),
+                                thread_name_prefix="pokeapi") as esecutore:
+            futuri = {esecutore.submit(self.ottieni_esito_mossa, nome): nome for nome in nomi}
+            for futuro in as_completed(futuri):
+                yield futuri[futuro], futuro.result()
+
+    def itera_dati_mosse(self, nomi_mosse: Iterable[str]) -> Iterator[tuple[str, dict | None]]:
+        """Come itera_esiti_mosse, con None per tutte le mosse senza dati."""
+        for nome, esito in self.itera_esiti_mosse(nomi_mosse):
+            yield nome, esito or None
+
+    def ottieni_dati_mosse(self, nomi_mosse: Iterable[str]) -> dict[str, dict | None]:
+        """Come itera_dati_mosse, ma restituisce nome -> dati nell'ordine dei nomi ricevuti."""
+        nomi = list(dict.fromkeys(nomi_mosse))
+        risultati = dict(self.itera_dati_mosse(nomi))
+        return {nome: risultati[nome] for nome in nomi}
+
+    def chiudi(self) -> None:
+        self._sessione.close()
+
+    def __enter__(self) -> "ClientPokeApi":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.chiudi()
+
+    def _scarica(self, nome_mossa: str) -> dict | None:
+        """
+        Esegue la richiesta con i ritentativi.
+        Restituisce i dati della mossa, {} se la mossa non esiste, None in caso di errore.
+        """
+        url = f"{self.url_base}{nome_mossa}"
+        for tentativo in range(self.max_tentativi):
+            self.limitatore.attendi()
+            try:
+                response = self._sessione.get(url, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                attesa = self._calcola_backoff(tentativo)
+                logger.warning(f"Errore di rete per {nome_mossa} ({e}), nuovo tentativo tra {attesa:.1f}s")
+                self._attendi_prima_di_ritentare(tentativo, attesa)
+                continue
+            except requests.RequestException as e:
+                logger.error(f"Errore richiesta PokeAPI per {nome_mossa}: {e}")
+                return None
+
+            if response.status_code == 404:
+                logger.warning(f"Mossa non trovata su PokeAPI: {nome_mossa}")
+                return {}
+            if response.status_code in CODICI_DA_RITENTARE:
+                attesa = self._calcola_backoff(tentativo, response.headers.get("Retry-After"))
+                logger.warning(f"PokeAPI ha risposto {response.status_code} per {nome_mossa}, "
+                               f"nuovo tentativo tra {attesa:.1f}s")
+                self._attendi_prima_di_ritentare(tentativo, attesa)
+                continue
+            try:
+                response.raise_for_status()
+                dati = response.json()
+            except (requests.RequestException, ValueError) as e:
+                logger.error(f"Errore richiesta PokeAPI per {nome_mossa}: {e}")
+                return None
+
+            logger.info(f"Dati ottenuti per {nome_mossa}")
+            return {
+                "power": dati.get("power"),
+                "accuracy": dati.get("accuracy"),
+                "pp": dati.get("pp")
+            }
+
+        logger.error(f"Tentativi esauriti per {nome_mossa} dopo {self.max_tentativi} richieste")
+        return None
+
+    def _attendi_prima_di_ritentare(self, tentativo: int, attesa: float) -> None:
+        # Dopo l'ultimo tentativo non c'è niente da attendere
+        if tentativo + 1 < self.max_tentativi:
+            time.sleep(attesa)
+
+    def _calcola_backoff(self, tentativo: int, retry_after: str | None = None) -> float:
+        """Attesa prima del prossimo tentativo: Retry-After se presente, altrimenti backoff esponenziale con jitter."""
+        if retry_after:
+            try:
+                return min(self.backoff_massimo, max(0.0, float(retry_after)))
+            except ValueError:
+                try:
+                    return min(self.backoff_massimo,
+                               max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time()))
+                except (TypeError, ValueError):
+                    pass
+        base = min(self.backoff_massimo, self.backoff_iniziale * 2 ** tentativo)
+        return random.uniform(base / 2, base)
+
+
+_client_predefinito: ClientPokeApi | None = None
+_lock_client = threading.Lock()
+
+
+def ottieni_client_pokeapi() -> ClientPokeApi:
+    """Restituisce il client PokeAPI condiviso dal processo, creandolo se necessario."""
+    global _client_predefinito
+    with _lock_client:
+        if _client_predefinito is None:
+            _client_predefinito = ClientPokeApi(cache=CacheDisco(CACHE_POKEAPI_DIR, ttl_secondi=TTL_CACHE_POKEAPI))
+        return _client_predefinito
+
 
 def ottieni_dati_mossa(nome_mossa):
     """
     Ottiene i dettagli di una mossa da PokeAPI.
     Ritorna un dizionario con power, accuracy e pp.
     """
-    url = f"{POKEAPI_BASE_URL}{nome_mossa}"
-    try:
-        response = requests.get(url)
-        if response.status_code == 404:
-            logger.warning(f"Mossa non trovata su PokeAPI: {nome_mossa}")
-            return None
-        response.raise_for_status()
-
-        dati = response.json()
-        logger.info(f"Dati ottenuti per {nome_mossa}")
-        return {
-            "power": dati.get("power"),
-            "accuracy": dati.get("accuracy"),
-            "pp": dati.get("pp")
-        }
-    except requests.RequestException as e:
-        logger.error(f"Errore richiesta PokeAPI per {nome_mossa}: {e}")
-        return None
+    return ottieni_client_pokeapi().ottieni_dati_mossa(nome_mossa)
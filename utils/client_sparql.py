@@ -1,41 +1,483 @@
-import requests
+import argparse
+import os
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Iterable, Iterator
 
+from config.costanti_globali import ENDPOINT_SPARQL, TIMEOUT_CONNESSIONE_SPARQL, TIMEOUT_LETTURA_SPARQL, \
+    MAX_QUERY_PARALLELE_SPARQL, QUERY_SPARQL_NOMINATE, BACKEND_KG, CACHE_SPARQL_DIR, VERSIONE_DATASET_KG, TTL_CACHE_SPARQL, \
+    DIMENSIONE_MAX_CACHE_SPARQL, AGGIORNA_KG
+from utils.cache_disco import CacheDisco, ScrittoreVoceCache
 from utils.registro_log import setup_logger
+from utils.risultati_sparql import R, SchemaRiga, itera_binding_json
+from utils.sparql_locale import esegui_query_locale
 
 logger = setup_logger()
 
 # Endpoint SPARQL di GraphDB
-ENDPOINT = "http://localhost:7200/repositories/pokemonKG"
+ENDPOINT = ENDPOINT_SPARQL
+
+HEADERS_SPARQL = {
+    "Accept": "application/sparql-results+json",
+    "Content-Type": "application/sparql-query"
+}
+
+# Dimensione dei blocchi letti dalla risposta HTTP quando i risultati sono consumati in streaming
+DIMENSIONE_BLOCCO_STREAMING = 64 * 1024
+
+
+@lru_cache(maxsize=None)
+def _leggi_file_query(percorso_file_query: str) -> str:
+    """
+    Legge il testo di una query da file una sola volta per processo.
+    I file .rq non cambiano durante l'esecuzione.
+    """
+    with open(percorso_file_query, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _errore_di_rete(e: BaseException) -> bool:
+    """True per gli errori HTTP o di rete di requests, importato solo quando serve una sessione HTTP."""
+    requests = sys.modules.get("requests")
+    return requests is not None and isinstance(e, requests.RequestException)
+
+
+class ErroreSparqlIncompleto(RuntimeError):
+    """Lettura in streaming dei risultati interrotta dopo che alcune righe erano già state prodotte."""
+
+
+class CacheRisultatiSparql:
+    """
+    Cache persistente su disco dei risultati SPARQL.
+    La chiave è l'hash del testo della query insieme alla versione esplicita del dataset,
+    quindi cambiare query o VERSIONE_DATASET_KG invalida automaticamente le voci.
+
+    I binding non vengono salvati come JSON ma in forma compatta: l'elenco delle variabili
+    e una tupla per riga con un termine (tipo, valore[, chiave extra, valore extra]) per variabile.
+    Ogni voce è divisa in blocchi di RIGHE_PER_BLOCCO_CACHE righe, ciascuno con le proprie variabili,
+    scritti su disco mentre i risultati arrivano e riletti uno alla volta.
+    """
+
+    RIGHE_PER_BLOCCO_CACHE = 1000
+
+    def __init__(self, cartella: str = CACHE_SPARQL_DIR, versione_dataset: str = VERSIONE_DATASET_KG,
+                 ttl_secondi: float | None = TTL_CACHE_SPARQL,
+                 dimensione_massima: int | None = DIMENSIONE_MAX_CACHE_SPARQL,
+                 forza_aggiornamento: bool = AGGIORNA_KG):
+        self.versione_dataset = versione_dataset
+        # Se True la cache non viene letta ma solo riscritta con i risultati aggiornati
+        self.forza_aggiornamento = forza_aggiornamento
+        self._cache = CacheDisco(cartella, ttl_secondi=ttl_secondi, dimensione_massima=dimensione_massima)
+
+    def leggi(self, query: str) -> list[dict] | None:
+        blocchi = self.leggi_compatta(query)
+        if blocchi is None:
+            return None
+        risultati = []
+        try:
+            for blocco in blocchi:
+                risultati += self._espandi(blocco)
+        except ValueError as e:
+            # Voce danneggiata (già rimossa da CacheDisco): la query viene rieseguita
+            logger.warning(str(e))
+            return None
+        return risultati
+
+    def leggi_compatta(self, query: str) -> Iterator[tuple[tuple[str, ...], list[tuple]]] | None:
+        """Come leggi, ma restituisce i blocchi nella forma compatta (variabili, righe), letti uno alla volta."""
+        if self.forza_aggiornamento:
+            return None
+        return self._cache.leggi_a_blocchi(self._chiave(query))
+
+    def scrivi(self, query: str, risultati: list[dict]) -> None:
+        scrittura = self.apri_scrittura(query)
+        if scrittura is not None:
+            with scrittura:
+                for binding in risultati:
+                    scrittura.aggiungi(binding)
+                scrittura.conferma()
+
+    def apri_scrittura(self, query: str) -> "ScritturaRisultatiSparql | None":
+        """Scrittura incrementale della voce di una query; None se la cache non è scrivibile."""
+        try:
+            return ScritturaRisultatiSparql(self._cache.apri_scrittura(self._chiave(query)),
+                                            self.RIGHE_PER_BLOCCO_CACHE)
+        except OSError as e:
+            logger.warning(f"Cache SPARQL non scrivibile: {e}")
+            return None
+
+    def svuota(self) -> None:
+        self._cache.svuota()
+
+    def _chiave(self, query: str) -> str:
+        return CacheDisco.calcola_chiave(self.versione_dataset, query)
+
+    @staticmethod
+    def _comprimi(risultati: list[dict]) -> tuple[tuple[str, ...], list[tuple]]:
+        variabili: dict[str, None] = {}
+        for binding in risultati:
+            variabili.update(dict.fromkeys(binding))
+        variabili_tuple = tuple(variabili)
+
+        righe = []
+        for binding in risultati:
+            riga = []
+            for variabile in variabili_tuple:
+                termine = binding.get(variabile)
+                if termine is None:
+                    riga.append(None)
+                    continue
+                # I valori ripetuti (tipo, datatype) sono internati: pickle li serializza una volta sola
+                compatto = [sys.intern(termine["type"]), termine["value"]]
+                for chiave, valore in termine.items():
+                    if chiave not in ("type", "value"):
+                        compatto += [sys.intern(chiave), sys.intern(valore)]
+                riga.append(tuple(compatto))
+            righe.append(tuple(riga))
+        return variabili_tuple, righe
+
+    @staticmethod
+    def _espandi(voce: tuple[tuple[str, ...], list[tuple]]) -> list[dict]:
+        variabili, righe = voce
+        risultati = []
+        for riga in righe:
+            binding = {}
+            for variabile, termine in zip(variabili, riga):
+                if termine is None:
+                    continue
+                valore = {"type": termine[0], "value": termine[1]}
+                for i in range(2, len(termine), 2):
+                    valore[termine[i]] = termine[i + 1]
+                binding[variabile] = valore
+            risultati.append(binding)
+        return risultati
+
+
+class ScritturaRisultatiSparql:
+    """
+    Accoda i binding di una query alla sua voce di cache, un blocco compatto alla volta:
+    in memoria resta al più un blocco. Un errore di scrittura scarta la voce ma non interrompe la query.
+    """
+
+    def __init__(self, scrittore: ScrittoreVoceCache, righe_per_blocco: int):
+        self._scrittore: ScrittoreVoceCache | None = scrittore
+        self._righe_per_blocco = righe_per_blocco
+        self._blocco: list[dict] = []
+
+    def aggiungi(self, binding: dict) -> None:
+        if self._scrittore is None:
+            return
+        self._blocco.append(binding)
+        if len(self._blocco) >= self._righe_per_blocco:
+            self._scrivi_blocco()
+
+    def conferma(self) -> None:
+        if self._scrittore is None:
+            return
+        if self._blocco:
+            self._scrivi_blocco()
+        if self._scrittore is not None:
+            self._scrittore.conferma()
+            self._scrittore = None
+
+    def annulla(self) -> None:
+        if self._scrittore is not None:
+            self._scrittore.annulla()
+            self._scrittore = None
+        self._blocco = []
+
+    def _scrivi_blocco(self) -> None:
+        try:
+            self._scrittore.aggiungi(CacheRisultatiSparql._comprimi(self._blocco))
+        except OSError as e:
+            logger.warning(f"Scrittura della cache SPARQL interrotta, la voce verrà scartata: {e}")
+            self.annulla()
+        self._blocco = []
+
+    def __enter__(self) -> "ScritturaRisultatiSparql":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.annulla()
+
+
+class ClientSparql:
+    """
+    Client SPARQL verso GraphDB con sessione HTTP persistente (keep-alive)
+    e pool di connessioni riutilizzate tra una query e l'altra.
+
+    Le query possono essere eseguite in modo sincrono (esegui_query) oppure
+    sottomesse in parallelo su un pool di thread (sottometti_query_nominate),
+    così che il tempo di avvio sia quello della query più lenta e non la somma.
+    Se è presente una cache, i risultati già scaricati vengono letti da disco senza rete.
+
+    Con backend "locale" le query non vanno su GraphDB ma sono risolte dal quad store
+    in memoria costruito dai file N-Quads/Turtle del dataset (vedi utils.sparql_locale).
+    """
+
+    BACKEND_SUPPORTATI = ("graphdb", "locale")
+
+    def __init__(self, endpoint: str = ENDPOINT_SPARQL,
+                 timeout_connessione: float = TIMEOUT_CONNESSIONE_SPARQL,
+                 timeout_lettura: float = TIMEOUT_LETTURA_SPARQL,
+                 max_query_parallele: int = MAX_QUERY_PARALLELE_SPARQL,
+                 cache: CacheRisultatiSparql | None = None,
+                 backend: str = BACKEND_KG):
+        if backend not in self.BACKEND_SUPPORTATI:
+            raise ValueError(f"Backend KG non supportato: {backend} (ammessi: {', '.join(self.BACKEND_SUPPORTATI)})")
+        self.endpoint = endpoint
+        self.backend = backend
+        # Il KG locale risponde in memoria: la cache servirebbe solo a mescolare i risultati dei due backend
+        self.cache = cache if backend == "graphdb" else None
+        self.timeout = (timeout_connessione, timeout_lettura)
+        self.max_query_parallele = max_query_parallele
+
+        # Sessione HTTP creata alla prima query verso l'endpoint (vedi _sessione)
+        self._sessione_http = None
+
+        self._lock = threading.Lock()
+        self._esecutore: ThreadPoolExecutor | None = None
+        # Query precaricate: percorso file -> future ancora da consumare
+        self._query_precaricate: dict[str, Future] = {}
+
+    @property
+    def _sessione(self):
+        """
+        Sessione HTTP verso l'endpoint, creata al primo uso: requests si importa solo qui,
+        così chi usa il KG locale o la cache non ne paga l'import.
+        """
+        with self._lock:
+            if self._sessione_http is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                # Una connessione per ogni query che può essere in volo contemporaneamente
+                sessione = requests.Session()
+                adattatore = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_query_parallele)
+                sessione.mount("http://", adattatore)
+                sessione.mount("https://", adattatore)
+                sessione.headers.update(HEADERS_SPARQL)
+                self._sessione_http = sessione
+            return self._sessione_http
+
+    def esegui_query(self, percorso_file_query: str) -> list[dict]:
+        """
+        Esegue la query contenuta nel file e restituisce i binding JSON.
+        Se la stessa query è stata precaricata, ne attende il risultato
+        invece di inviarla di nuovo. In caso di errore restituisce lista vuota.
+        """
+        with self._lock:
+            futuro = self._query_precaricate.pop(os.path.abspath(percorso_file_query), None)
+        if futuro is not None:
+            return futuro.result()
+        return self._esegui_query_da_file(percorso_file_query)
+
+    def esegui_query_da_stringa(self, query: str) -> list[dict]:
+        """
+        Invia il testo della query all'endpoint (o al KG locale) e restituisce i binding JSON.
+        Solleva requests.RequestException in caso di errore HTTP o di rete.
+        """
+        if self.backend == "locale":
+            return esegui_query_locale(query)
+        response = self._sessione.post(self.endpoint, data=query.encode("utf-8"), timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()["results"]["bindings"]
+
+    def itera_righe(self, percorso_file_query: str, tipo_riga: type[R]) -> Iterator[R]:
+        """
+        Esegue la query contenuta nel file e produce le righe una alla volta come tuple
+        tipizzate secondo lo schema NamedTuple `tipo_riga` (vedi utils.risultati_sparql).
+
+        La risposta di GraphDB viene letta a blocchi e decodificata mentre arriva, senza
+        costruire la lista completa dei binding; se la cache è attiva i binding vengono
+        salvati su disco a blocchi compatti mentre arrivano, e la voce è confermata solo
+        a fine lettura. Le letture dalla cache sono decodificate un blocco alla volta
+        direttamente dalla forma compatta.
+        Come esegui_query, un errore prima della prima riga viene registrato nel log e termina
+        l'iterazione senza righe. Un errore dopo che alcune righe sono già state prodotte solleva
+        invece ErroreSparqlIncompleto: il chiamante non deve scambiare un risultato troncato per completo.
+        """
+        righe_prodotte = 0
+        try:
+            for riga in self._itera_righe(percorso_file_query, SchemaRiga(tipo_riga)):
+                yield riga
+                righe_prodotte += 1
+        except Exception as e:
+            if righe_prodotte:
+                raise ErroreSparqlIncompleto(
+                    f"Risultati di {percorso_file_query} interrotti dopo {righe_prodotte} righe: {e}") from e
+            if _errore_di_rete(e):
+                logger.error(f"Errore durante l'esecuzione della query_sparql SPARQL: {e}")
+            else:
+                logger.error(f"Errore generico in itera_righe: {e}")
+
+    def _itera_righe(self, percorso_file_query: str, schema: SchemaRiga) -> Iterator[R]:
+        with self._lock:
+            futuro = self._query_precaricate.pop(os.path.abspath(percorso_file_query), None)
+        if futuro is not None:
+            yield from map(schema.da_binding, futuro.result())
+            return
+        query = _leggi_file_query(percorso_file_query)
+        if self.backend == "locale":
+            yield from map(schema.da_binding, esegui_query_locale(query))
+            return
+        if self.cache is not None:
+            blocchi = self.cache.leggi_compatta(query)
+            if blocchi is not None:
+                logger.info(f"Risultati letti dalla cache per {percorso_file_query}")
+                for variabili, righe in blocchi:
+                    yield from schema.da_righe_compatte(variabili, righe)
+                return
+        logger.info(f"Esecuzione query_sparql in streaming da file: {percorso_file_query}")
+        # La voce di cache è scritta a blocchi mentre le righe arrivano e confermata solo a fine lettura
+        scrittura = self.cache.apri_scrittura(query) if self.cache is not None else None
+        try:
+            numero_righe = 0
+            with self._sessione.post(self.endpoint, data=query.encode("utf-8"),
+                                     timeout=self.timeout, stream=True) as response:
+                response.raise_for_status()
+                for binding in itera_binding_json(response.iter_content(DIMENSIONE_BLOCCO_STREAMING)):
+                    if scrittura is not None:
+                        scrittura.aggiungi(binding)
+                    numero_righe += 1
+                    yield schema.da_binding(binding)
+            logger.info(f"Query completata con successo, risultati: {numero_righe}")
+            if scrittura is not None:
+                scrittura.conferma()
+        finally:
+            if scrittura is not None:
+                scrittura.annulla()
+
+    def sottometti_query(self, percorso_file_query: str) -> Future:
+        """Sottomette la query al pool di thread e restituisce il future dei binding."""
+        return self._ottieni_esecutore().submit(self._esegui_query_da_file, percorso_file_query)
+
+    def sottometti_query_nominate(self, nomi: Iterable[str] | None = None) -> dict[str, Future]:
+        """
+        Sottomette in parallelo le query nominate (vedi QUERY_SPARQL_NOMINATE).
+        Senza argomenti le sottomette tutte. Restituisce nome -> future.
+        """
+        nomi = list(QUERY_SPARQL_NOMINATE) if nomi is None else list(nomi)
+        for nome in nomi:
+            if nome not in QUERY_SPARQL_NOMINATE:
+                raise ValueError(f"Query nominata sconosciuta: {nome}")
+        return {nome: self.sottometti_query(QUERY_SPARQL_NOMINATE[nome]) for nome in nomi}
+
+    def precarica(self, nomi: Iterable[str] | None = None) -> dict[str, Future]:
+        """
+        Come sottometti_query_nominate, ma registra i future in modo che la prima
+        chiamata successiva a esegui_query sullo stesso file ne riusi il risultato.
+        """
+        futuri = self.sottometti_query_nominate(nomi)
+        with self._lock:
+            for nome, futuro in futuri.items():
+                self._query_precaricate[os.path.abspath(QUERY_SPARQL_NOMINATE[nome])] = futuro
+        return futuri
+
+    def chiudi(self) -> None:
+        """Chiude il pool di thread e la sessione HTTP."""
+        with self._lock:
+            esecutore, self._esecutore = self._esecutore, None
+            sessione, self._sessione_http = self._sessione_http, None
+            self._query_precaricate.clear()
+        if esecutore is not None:
+            esecutore.shutdown(wait=True)
+        if sessione is not None:
+            sessione.close()
+
+    def __enter__(self) -> "ClientSparql":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.chiudi()
+
+    def _ottieni_esecutore(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._esecutore is None:
+                self._esecutore = ThreadPoolExecutor(max_workers=self.max_query_parallele,
+                                                     thread_name_prefix="sparql")
+            return self._esecutore
+
+    def _esegui_query_da_file(self, percorso_file_query: str) -> list[dict]:
+        try:
+            query = _leggi_file_query(percorso_file_query)
+            if self.cache is not None:
+                risultati = self.cache.leggi(query)
+                if risultati is not None:
+                    logger.info(f"Risultati letti dalla cache per {percorso_file_query}: {len(risultati)}")
+                    return risultati
+            logger.info(f"Esecuzione query_sparql da file: {percorso_file_query}")
+            risultati = self.esegui_query_da_stringa(query)
+            logger.info(f"Query completata con successo, risultati: {len(risultati)}")
+            # Solo i risultati ottenuti con successo vengono salvati in cache
+            if self.cache is not None:
+                self.cache.scrivi(query, risultati)
+            return risultati
+        except Exception as e:
+            if _errore_di_rete(e):
+                logger.error(f"Errore durante l'esecuzione della query_sparql SPARQL: {e}")
+            else:
+                logger.error(f"Errore generico in esegui_query_sparql: {e}")
+            return []
+
+
+_client_predefinito: ClientSparql | None = None
+_lock_client = threading.Lock()
+
+
+def ottieni_client_sparql() -> ClientSparql:
+    """Restituisce il client SPARQL condiviso dal processo, creandolo se necessario."""
+    global _client_predefinito
+    with _lock_client:
+        if _client_predefinito is None:
+            _client_predefinito = ClientSparql(cache=CacheRisultatiSparql())
+        return _client_predefinito
+
+
+def configura_client_sparql(aggiorna_kg: bool = AGGIORNA_KG) -> ClientSparql:
+    """
+    Ricrea il client SPARQL condiviso con le opzioni dello script in esecuzione.
+    Va chiamata all'avvio, prima di interrogare il KG: con aggiorna_kg=True la cache
+    dei risultati non viene letta ma solo riscritta.
+    """
+    global _client_predefinito
+    with _lock_client:
+        precedente = _client_predefinito
+        _client_predefinito = ClientSparql(cache=CacheRisultatiSparql(forza_aggiornamento=aggiorna_kg))
+    if precedente is not None:
+        precedente.chiudi()
+    return _client_predefinito
+
+
+def aggiungi_argomento_aggiorna_kg(parser: argparse.ArgumentParser) -> None:
+    """Aggiunge --refresh-kg agli argomenti di uno script che interroga il KG (vedi configura_client_sparql)."""
+    parser.add_argument("--refresh-kg", dest="aggiorna_kg", action="store_true", default=AGGIORNA_KG,
+                        help="ignora i risultati SPARQL in cache e li riscarica (come POKEMONKG_REFRESH_KG=1)")
+
 
 #Metodo principale che utilizziamo
 def esegui_query_sparql(percorso_file_query):
     """
-    Legge una query_sparql SPARQL da file e la esegue contro GraphDB.
+    Legge una query_sparql SPARQL da file e la esegue contro GraphDB
+    usando il client condiviso (sessione persistente).
     Restituisce il risultato in formato JSON.
     """
-    try:
-        with open(percorso_file_query, "r", encoding="utf-8") as f:
-            query = f.read()
-        logger.info(f"Esecuzione query_sparql da file: {percorso_file_query}")
-        headers = {
-            "Accept": "application/sparql-results+json",
-            "Content-Type": "application/sparql-query"
-        }
-        response = requests.post(ENDPOINT, data=query.encode("utf-8"), headers=headers)
-        response.raise_for_status()
+    return ottieni_client_sparql().esegui_query(percorso_file_query)
 
-        risultati = response.json()["results"]["bindings"]
-        logger.info(f"Query completata con successo, risultati: {len(risultati)}")
-        return risultati
-    except requests.RequestException as e:
-        logger.error(f"Errore durante l'esecuzione della query_sparql SPARQL: {e}")
-        return []
-    except Exception as e:
-        logger.error(f"Errore generico in esegui_query_sparql: {e}")
-        return []
+
+def itera_righe_sparql(percorso_file_query: str, tipo_riga: type[R]) -> Iterator[R]:
+    """
+    Come esegui_query_sparql, ma legge la risposta in streaming e produce
+    tuple tipizzate secondo lo schema NamedTuple indicato.
+    """
+    return ottieni_client_sparql().itera_righe(percorso_file_query, tipo_riga)
 
 #ATTenzione: Metodo non utilizzato perché risalente a una vecchia idea di logica
 def esegui_query_sparql_da_stringa(query: str):
+    import requests
+
     headers = {
         "Accept": "application/sparql-results+json",
         "Content-Type": "application/sparql-query_sparql"
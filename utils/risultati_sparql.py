@@ -0,0 +1,161 @@
+"""
+Lettura incrementale dei risultati SPARQL JSON e decodifica tipizzata delle righe.
+
+Lo schema di una riga è una NamedTuple: il nome di ogni campo è la variabile della query,
+l'annotazione indica il tipo Python (int per xsd:integer, float per xsd:decimal, bool, str)
+e l'eventuale valore di default viene usato quando la variabile non è legata.
+"""
+import codecs
+import json
+import re
+import typing
+from typing import Any, Callable, Iterable, Iterator, NamedTuple, TypeVar
+
+R = TypeVar("R", bound=NamedTuple)
+
+_RE_INIZIO_BINDINGS = re.compile(r'"bindings"\s*:\s*\[')
+_RE_SEPARATORI = re.compile(r"[\s,]*")
+
+
+def itera_binding_json(blocchi: Iterable[bytes | str]) -> Iterator[dict]:
+    """
+    Analizza una risposta application/sparql-results+json a blocchi e produce
+    un binding (dizionario variabile -> termine) alla volta, senza materializzare
+    l'intero array "results.bindings": in memoria resta solo il testo non ancora consumato.
+    """
+    decode = json.JSONDecoder().raw_decode
+    salta_separatori = _RE_SEPARATORI.match
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    blocchi = iter(blocchi)
+    buffer = ""
+    pos = 0
+
+    def leggi_altro(minimo: int = 1) -> bool:
+        """Accoda almeno `minimo` caratteri al testo non consumato; False se lo stream è finito."""
+        nonlocal buffer, pos
+        nuovi = []
+        letti = 0
+        for blocco in blocchi:
+            testo = utf8.decode(blocco) if isinstance(blocco, bytes) else blocco
+            nuovi.append(testo)
+            letti += len(testo)
+            if letti >= minimo:
+                break
+        if not letti:
+            return False
+        buffer = buffer[pos:] + "".join(nuovi)
+        pos = 0
+        return True
+
+    # Avanza fino all'inizio dell'array dei binding
+    while True:
+        m = _RE_INIZIO_BINDINGS.search(buffer, pos)
+        if m is not None:
+            pos = m.end()
+            break
+        # Conserva la coda del buffer: la chiave potrebbe essere spezzata tra due blocchi
+        pos = max(pos, len(buffer) - 32)
+        if not leggi_altro():
+            raise ValueError("Risposta SPARQL JSON senza 'results.bindings'")
+
+    while True:
+        pos = salta_separatori(buffer, pos).end()
+        if pos == len(buffer):
+            if not leggi_altro():
+                raise ValueError("Risposta SPARQL JSON troncata")
+            continue
+        if buffer[pos] == "]":
+            return
+        try:
+            binding, pos = decode(buffer, pos)
+        except json.JSONDecodeError:
+            # Oggetto spezzato tra due blocchi: raddoppia il testo disponibile prima di riprovare,
+            # così anche con blocchi piccoli ogni oggetto viene ritentato poche volte
+            if not leggi_altro(len(buffer) - pos):
+                raise ValueError("Risposta SPARQL JSON troncata")
+            continue
+        yield binding
+
+
+def _convertitore(annotazione: Any) -> Callable[[str], Any] | None:
+    """Funzione di conversione per l'annotazione del campo (None se il valore resta una stringa)."""
+    # Optional[X] / X | None -> X
+    argomenti = [a for a in typing.get_args(annotazione) if a is not type(None)]
+    if argomenti and type(None) in typing.get_args(annotazione):
+        annotazione = argomenti[0]
+    if annotazione is bool:
+        return lambda valore: valore in ("true", "1")
+    if annotazione in (int, float):
+        return annotazione
+    return None
+
+
+def _estrattore(leggi: Callable[[Any], str], legato: Callable[[Any], bool] | None,
+                converti: Callable[[str], Any] | None, default: Any) -> Callable[[Any], Any]:
+    """Funzione che estrae un campo da una riga: lettura del valore, conversione ed eventuale default."""
+    if converti is not None:
+        leggi_valore = leggi
+        leggi = lambda b: converti(leggi_valore(b))
+    if legato is None:
+        return leggi
+    return lambda b: leggi(b) if legato(b) else default
+
+
+class SchemaRiga:
+    """
+    Decodificatore preparato per uno schema NamedTuple.
+
+    Per ogni campo viene costruita una volta, per schema, una funzione che legge il valore,
+    lo converte e applica l'eventuale default; ogni riga è poi costruita applicando
+    queste funzioni, senza ricalcolare annotazioni e default per riga.
+    """
+
+    def __init__(self, tipo_riga: type[R]):
+        self.tipo_riga = tipo_riga
+        annotazioni = typing.get_type_hints(tipo_riga)
+        self._campi = []
+        for nome in tipo_riga._fields:
+            self._campi.append((nome, _convertitore(annotazioni.get(nome, str)),
+                                nome in tipo_riga._field_defaults, tipo_riga._field_defaults.get(nome)))
+        self._da_binding = self._prepara(
+            lambda nome: lambda b: b[nome]["value"],
+            lambda nome: lambda b: nome in b,
+        )
+
+    def da_binding(self, binding: dict) -> R:
+        try:
+            return self._da_binding(binding)
+        except KeyError as e:
+            raise ValueError(f"Variabile {e} assente nel risultato e senza default") from None
+
+    def da_righe_compatte(self, variabili: tuple[str, ...], righe: Iterable[tuple]) -> Iterator[R]:
+        """Decodifica le righe nel formato compatto della cache (una tupla di termini per riga)."""
+        colonne = {variabile: i for i, variabile in enumerate(variabili)}
+        for nome, _, ha_default, _ in self._campi:
+            if nome not in colonne and not ha_default:
+                raise ValueError(f"Variabile '{nome}' assente nel risultato e senza default")
+        # Le variabili assenti dalla voce risultano sempre non legate
+        da_riga = self._prepara(
+            lambda nome: (lambda b, c=colonne[nome]: b[c][1]) if nome in colonne else (lambda b: None),
+            lambda nome: (lambda b, c=colonne[nome]: b[c] is not None) if nome in colonne else (lambda b: False),
+        )
+        try:
+            yield from map(da_riga, righe)
+        except TypeError:
+            raise ValueError("Variabile obbligatoria non legata in una riga della cache") from None
+
+    def _prepara(self, valore: Callable[[str], Callable[[Any], str]],
+                 legato: Callable[[str], Callable[[Any], bool]]) -> Callable[[Any], R]:
+        estrattori = tuple(
+            _estrattore(valore(nome), legato(nome) if ha_default else None, converti, default)
+            for nome, converti, ha_default, default in self._campi
+        )
+        nuova, tipo = tuple.__new__, self.tipo_riga
+        return lambda b: nuova(tipo, [estrai(b) for estrai in estrattori])
+
+
+def decodifica_righe(bindings: Iterable[dict], tipo_riga: type[R]) -> Iterator[R]:
+    """Converte un flusso di binding JSON in tuple tipizzate secondo lo schema."""
+    schema = SchemaRiga(tipo_riga)
+    for binding in bindings:
+        yield schema.da_binding(binding)
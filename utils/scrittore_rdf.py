@@ -1,6 +1,171 @@
+import gzip
+import hashlib
+import re
+import sys
+from collections import deque
+from functools import lru_cache
+from typing import Any, Iterable, Sequence
+
 from utils.registro_log import setup_logger
+from utils.store_quadruple import XSD, applica_escape
+
 logger = setup_logger()
 
+# Caratteri accumulati in memoria prima di essere scritti su file
+DIMENSIONE_BLOCCO_NQ = 64 * 1024
+# Hash delle ultime righe scritte ricordati per la deduplicazione (circa 100 byte ciascuno)
+FINESTRA_DEDUPLICA_NQ = 100_000
+
+# Caratteri non ammessi in un IRIREF N-Quads: vanno scritti come \uXXXX
+RE_CARATTERI_NON_AMMESSI_IRI = re.compile(r'[\x00-\x20<>"{}|^`\\]')
+
+
+@lru_cache(maxsize=8192)
+def iri_nquads(valore: str) -> str:
+    """
+    Serializza un IRI come token N-Quads (<...>), con escape dei caratteri non ammessi.
+    I token più usati (predicati, classi, grafi, datatype) restano in cache e internati,
+    quindi vengono costruiti una sola volta.
+    """
+    return sys.intern("<" + RE_CARATTERI_NON_AMMESSI_IRI.sub(lambda m: f"\\u{ord(m.group()):04X}", valore) + ">")
+
+
+def letterale_nquads(valore: Any, datatype: str | None = None, lingua: str | None = None) -> str:
+    """Serializza un letterale N-Quads; i booleani Python diventano "true"/"false"."""
+    if isinstance(valore, bool):
+        valore = "true" if valore else "false"
+    base = f'"{applica_escape(str(valore))}"'
+    if lingua:
+        return f"{base}@{lingua}"
+    if datatype:
+        return f"{base}^^{iri_nquads(datatype)}"
+    return base
+
+
+class ScrittoreNQuads:
+    """
+    Scrittore N-Quads in streaming: le righe sono accumulate in un blocco e scritte
+    su file ogni DIMENSIONE_BLOCCO_NQ caratteri, quindi la memoria non cresce con l'output.
+
+    - i termini si costruiscono con iri() e letterale(), che applicano l'escape corretto
+    - i duplicati sono scartati confrontando un hash a 64 bit di ogni riga invece della stringa intera;
+      per tenere costante la memoria si ricordano solo gli hash delle ultime `finestra_deduplica` righe,
+      quindi un duplicato più lontano viene riscritto (nessuna riga distinta viene mai scartata,
+      salvo collisioni dell'hash). I generatori producono le ripetizioni vicine tra loro e un
+      duplicato sfuggito non cambia il grafo caricato, che è un insieme di quadruple
+    - con un percorso che termina in .gz (o comprimi=True) l'output è compresso con gzip
+    """
+
+    def __init__(self, percorso: str, grafo: str | None = None, comprimi: bool | None = None,
+                 deduplica: bool = True, dimensione_blocco: int = DIMENSIONE_BLOCCO_NQ,
+                 finestra_deduplica: int = FINESTRA_DEDUPLICA_NQ):
+        self.percorso = percorso
+        # Grafo predefinito delle quadruple scritte senza grafo esplicito (None = triple nel grafo di default)
+        self.grafo = iri_nquads(grafo) if grafo else None
+        self.deduplica = deduplica
+        self.dimensione_blocco = dimensione_blocco
+        self.finestra_deduplica = finestra_deduplica
+        self.quadruple_scritte = 0
+        self.duplicate_scartate = 0
+
+        if comprimi is None:
+            comprimi = percorso.endswith(".gz")
+        if comprimi:
+            self._file = gzip.open(percorso, "wt", encoding="utf-8", newline="\n")
+        else:
+            self._file = open(percorso, "w", encoding="utf-8", newline="\n")
+        # Hash della finestra: l'insieme per la ricerca, la coda per scartare il più vecchio
+        self._hash_scritti: set[int] = set()
+        self._ordine_hash: deque[int] = deque()
+        self._blocco: list[str] = []
+        self._caratteri_blocco = 0
+
+    iri = staticmethod(iri_nquads)
+    letterale = staticmethod(letterale_nquads)
+
+    def intero(self, valore: int) -> str:
+        return letterale_nquads(int(valore), f"{XSD}integer")
+
+    def scrivi(self, soggetto: str, predicato: str, oggetto: str, grafo: str | None = None) -> bool:
+        """
+        Scrive una quadrupla di termini già serializzati (vedi iri / letterale).
+        Restituisce False se la stessa riga era già stata scritta.
+        """
+        grafo = grafo or self.grafo
+        riga = (f"{soggetto} {predicato} {oggetto} {grafo} .\n" if grafo
+                else f"{soggetto} {predicato} {oggetto} .\n")
+        return self.scrivi_righe((riga,)) == 1
+
+    def scrivi_righe(self, righe: Iterable[str]) -> int:
+        """
+        Scrive righe N-Quads già complete (terminate da " .\n"), ad esempio costruite
+        in blocco su colonne pandas. Applica la deduplicazione e restituisce
+        il numero di righe effettivamente scritte.
+        """
+        scritte = 0
+        for riga in righe:
+            if self.deduplica:
+                impronta = int.from_bytes(hashlib.blake2b(riga.encode("utf-8"), digest_size=8).digest(), "little")
+                if impronta in self._hash_scritti:
+                    self.duplicate_scartate += 1
+                    continue
+                self._hash_scritti.add(impronta)
+                self._ordine_hash.append(impronta)
+                if len(self._ordine_hash) > self.finestra_deduplica:
+                    self._hash_scritti.discard(self._ordine_hash.popleft())
+            self._blocco.append(riga)
+            self._caratteri_blocco += len(riga)
+            scritte += 1
+            if self._caratteri_blocco >= self.dimensione_blocco:
+                self.flush()
+        self.quadruple_scritte += scritte
+        return scritte
+
+    def scrivi_righe_distinte(self, righe: Sequence[str]) -> int:
+        """
+        Scrive righe N-Quads complete che il chiamante garantisce già distinte (ad esempio dopo
+        un drop_duplicates sul DataFrame di partenza), senza il controllo riga per riga:
+        le righe sono unite e scritte a gruppi di circa `dimensione_blocco` caratteri.
+        Con la deduplicazione attiva si comporta come scrivi_righe.
+        """
+        if self.deduplica:
+            return self.scrivi_righe(righe)
+        if not len(righe):
+            return 0
+        self.flush()
+        # Righe per gruppo stimate dalla prima: le righe di uno stesso generatore hanno lunghezze simili
+        righe_per_gruppo = max(1, self.dimensione_blocco // max(1, len(righe[0])))
+        for inizio in range(0, len(righe), righe_per_gruppo):
+            self._file.write("".join(righe[inizio:inizio + righe_per_gruppo]))
+        self.quadruple_scritte += len(righe)
+        return len(righe)
+
+    def flush(self) -> None:
+        if self._blocco:
+            self._file.write("".join(self._blocco))
+            self._blocco.clear()
+            self._caratteri_blocco = 0
+
+    def chiudi(self) -> None:
+        self.flush()
+        self._file.close()
+
+    def __enter__(self) -> "ScrittoreNQuads":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.chiudi()
+
+
+ONTO = "https://pokemonkg.org/ontology#"
+FONTE_POKEAPI = "https://pokemonkg.org/dataset/pokeapi"
+# Campo del risultato -> predicato RDF
+PREDICATI_MOSSA = {
+    "power": f"{ONTO}basePower",
+    "accuracy": f"{ONTO}accuracy",
+    "pp": f"{ONTO}basePowerPoints",
+}
+
 
 def scrivi_file_mosse_rdf(risultati, percorso_file):
     """
@@ -9,29 +174,13 @@ def scrivi_file_mosse_rdf(risultati, percorso_file):
     { 'uri': <uri_mossa>, 'power': <int opzionale>, 'accuracy': <int opzionale>, 'pp': <int opzionale> }
     """
     try:
-        xsd_integer = "<http://www.w3.org/2001/XMLSchema#integer>"
-        fonte = "<https://pokemonkg.org/dataset/pokeapi>"
         # Evita duplicati
-        quadruple_scritte = set()
-
-        with open(percorso_file, "w", encoding="utf-8") as f:
+        with ScrittoreNQuads(percorso_file, grafo=FONTE_POKEAPI) as scrittore:
             for r in risultati:
-                uri = r["uri"]
-                if "power" in r:
-                    quad = f"<{uri}> <https://pokemonkg.org/ontology#basePower> \"{r['power']}\"^^{xsd_integer} {fonte} ."
-                    if quad not in quadruple_scritte:
-                        f.write(quad + "\n")
-                        quadruple_scritte.add(quad)
-                if "accuracy" in r:
-                    quad = f"<{uri}> <https://pokemonkg.org/ontology#accuracy> \"{r['accuracy']}\"^^{xsd_integer} {fonte} ."
-                    if quad not in quadruple_scritte:
-                        f.write(quad + "\n")
-                        quadruple_scritte.add(quad)
-                if "pp" in r:
-                    quad = f"<{uri}> <https://pokemonkg.org/ontology#basePowerPoints> \"{r['pp']}\"^^{xsd_integer} {fonte} ."
-                    if quad not in quadruple_scritte:
-                        f.write(quad + "\n")
-                        quadruple_scritte.add(quad)
+                uri = scrittore.iri(r["uri"])
+                for campo, predicato in PREDICATI_MOSSA.items():
+                    if campo in r:
+                        scrittore.scrivi(uri, scrittore.iri(predicato), scrittore.intero(r[campo]))
 
         logger.info(f"Scrittura file RDF in formato N-Quads completata: {percorso_file}")
     except Exception as e:
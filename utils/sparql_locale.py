@@ -0,0 +1,552 @@
+"""
+Motore SPARQL in-process sul quad store locale.
+
+Supporta il sottoinsieme di SPARQL 1.1 usato dalle query in query_sparql/:
+PREFIX, SELECT [DISTINCT] con variabili, '*' o (BOUND(?x) AS ?y), pattern di triple con ';' ',' e 'a',
+VALUES, OPTIONAL, FILTER con BOUND / ! / && / ||, ORDER BY [ASC|DESC], LIMIT e OFFSET.
+Le query con costrutti diversi sollevano ValueError.
+"""
+import os
+import re
+import threading
+from typing import Iterator
+
+from config.costanti_globali import DIR_DATASET_KG_LOCALE, FILE_KG_LOCALE_AGGIUNTIVI
+from utils.registro_log import setup_logger
+from utils.store_quadruple import StoreQuadrupleLocale, iri, letterale, termine_a_binding, scomponi_letterale, \
+    rimuovi_escape, RDF_TYPE, XSD
+
+logger = setup_logger()
+
+_RE_TOKEN_SPARQL = re.compile(r'''
+    \s*(?:
+        (?P<commento>\#[^\n]*)
+      | (?P<iri><[^<>"{}|^`\\\s]*>)
+      | (?P<var>[?$][A-Za-z_]\w*)
+      | (?P<stringa>"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')
+      | (?P<lingua>@[A-Za-z][A-Za-z0-9-]*)
+      | (?P<numero>[+-]?(?:\d+\.\d+|\.\d+|\d+)(?:[eE][+-]?\d+)?)
+      | (?P<nome>(?:[A-Za-z][\w-]*)?:(?:[\w:%-]|\.(?=[\w:%-]))*|[A-Za-z][\w-]*)
+      | (?P<punt>\|\||&&|\^\^|[{}().;,!*])
+    )''', re.X)
+
+XSD_BOOLEAN = f"{XSD}boolean"
+_VERO = letterale("true", XSD_BOOLEAN)
+_FALSO = letterale("false", XSD_BOOLEAN)
+_DATATYPE_NUMERICI = {f"{XSD}{t}" for t in ("integer", "decimal", "double", "float", "int", "long", "short",
+                                             "nonNegativeInteger", "positiveInteger")}
+
+
+class _Query:
+    def __init__(self):
+        self.distinct = False
+        # (variabile, espressione o None per una variabile semplice); None = SELECT *
+        self.proiezioni: list[tuple[str, tuple | None]] | None = []
+        self.where: list[tuple] = []
+        self.ordinamento: list[tuple[str, bool]] = []
+        self.limite: int | None = None
+        self.scarto = 0
+
+
+class _ParserSparql:
+    """Parser a discesa ricorsiva per il sottoinsieme di SPARQL supportato."""
+
+    def __init__(self, testo: str):
+        self.token: list[tuple[str, str]] = []
+        pos = 0
+        testo = testo.rstrip()
+        while pos < len(testo):
+            m = _RE_TOKEN_SPARQL.match(testo, pos)
+            if m is None:
+                raise ValueError(f"Costrutto SPARQL non supportato vicino a: {testo[pos:pos + 40]!r}")
+            pos = m.end()
+            if m.lastgroup != "commento":
+                self.token.append((m.lastgroup, m.group(m.lastgroup)))
+        self.pos = 0
+        self.prefissi: dict[str, str] = {}
+
+    # --- Utilità sui token ---
+    def _guarda(self) -> tuple[str, str] | None:
+        return self.token[self.pos] if self.pos < len(self.token) else None
+
+    def _prossimo(self) -> tuple[str, str]:
+        if self.pos >= len(self.token):
+            raise ValueError("Query SPARQL terminata inaspettatamente")
+        tok = self.token[self.pos]
+        self.pos += 1
+        return tok
+
+    def _parola(self, *parole: str) -> bool:
+        tok = self._guarda()
+        return tok is not None and tok[0] == "nome" and tok[1].upper() in parole
+
+    def _simbolo(self, simbolo: str) -> bool:
+        return self._guarda() == ("punt", simbolo)
+
+    def _atteso(self, simbolo: str) -> None:
+        tok = self._prossimo()
+        if tok != ("punt", simbolo) and not (tok[0] == "nome" and tok[1].upper() == simbolo):
+            raise ValueError(f"Atteso '{simbolo}' nella query SPARQL, trovato '{tok[1]}'")
+
+    # --- Grammatica ---
+    def analizza(self) -> _Query:
+        query = _Query()
+        while self._parola("PREFIX", "BASE"):
+            if self._prossimo()[1].upper() == "BASE":
+                raise ValueError("BASE non supportato nel motore SPARQL locale")
+            nome = self._prossimo()[1]
+            self.prefissi[nome[:-1]] = self._prossimo()[1][1:-1]
+
+        if not self._parola("SELECT"):
+            raise ValueError("Il motore SPARQL locale supporta solo query SELECT")
+        self._prossimo()
+        if self._parola("DISTINCT", "REDUCED"):
+            query.distinct = self._prossimo()[1].upper() == "DISTINCT"
+        if self._simbolo("*"):
+            self._prossimo()
+            query.proiezioni = None
+        else:
+            while not self._parola("WHERE") and not self._simbolo("{"):
+                tipo, valore = self._prossimo()
+                if tipo == "var":
+                    query.proiezioni.append((valore[1:], None))
+                elif (tipo, valore) == ("punt", "("):
+                    espressione = self._espressione()
+                    self._atteso("AS")
+                    variabile = self._prossimo()[1][1:]
+                    self._atteso(")")
+                    query.proiezioni.append((variabile, espressione))
+                else:
+                    raise ValueError(f"Proiezione SPARQL non supportata: {valore}")
+        if self._parola("WHERE"):
+            self._prossimo()
+        query.where = self._gruppo()
+
+        while self._guarda() is not None:
+            if self._parola("ORDER"):
+                self._prossimo()
+                self._atteso("BY")
+                while self._guarda() is not None and (self._guarda()[0] == "var" or self._parola("ASC", "DESC")):
+                    if self._parola("ASC", "DESC"):
+                        crescente = self._prossimo()[1].upper() == "ASC"
+                        self._atteso("(")
+                        variabile = self._prossimo()[1][1:]
+                        self._atteso(")")
+                    else:
+                        crescente, variabile = True, self._prossimo()[1][1:]
+                    query.ordinamento.append((variabile, crescente))
+            elif self._parola("LIMIT"):
+                self._prossimo()
+                query.limite = int(self._prossimo()[1])
+            elif self._parola("OFFSET"):
+                self._prossimo()
+                query.scarto = int(self._prossimo()[1])
+            else:
+                raise ValueError(f"Clausola SPARQL non supportata: {self._guarda()[1]}")
+        return query
+
+    def _gruppo(self) -> list[tuple]:
+        """Gruppo { ... }: restituisce la lista degli elementi (bgp, values, optional, filter)."""
+        self._atteso("{")
+        elementi: list[tuple] = []
+        while not self._simbolo("}"):
+            if self._parola("OPTIONAL"):
+                self._prossimo()
+                elementi.append(("optional", self._gruppo()))
+            elif self._parola("FILTER"):
+                self._prossimo()
+                elementi.append(("filter", self._espressione_primaria()))
+            elif self._parola("VALUES"):
+                self._prossimo()
+                elementi.append(("values", self._values()))
+            else:
+                triple = self._triple()
+                if elementi and elementi[-1][0] == "bgp":
+                    elementi[-1][1].extend(triple)
+                else:
+                    elementi.append(("bgp", triple))
+            if self._simbolo("."):
+                self._prossimo()
+        self._prossimo()
+        return elementi
+
+    def _values(self) -> tuple[list[str], list[list[str | None]]]:
+        if self._simbolo("("):
+            self._prossimo()
+            variabili = []
+            while not self._simbolo(")"):
+                variabili.append(self._prossimo()[1][1:])
+            self._prossimo()
+            righe = []
+            self._atteso("{")
+            while not self._simbolo("}"):
+                self._atteso("(")
+                riga = []
+                while not self._simbolo(")"):
+                    riga.append(self._valore_values())
+                self._prossimo()
+                righe.append(riga)
+            self._prossimo()
+            return variabili, righe
+        variabile = self._prossimo()[1][1:]
+        righe = []
+        self._atteso("{")
+        while not self._simbolo("}"):
+            righe.append([self._valore_values()])
+        self._prossimo()
+        return [variabile], righe
+
+    def _valore_values(self) -> str | None:
+        if self._parola("UNDEF"):
+            self._prossimo()
+            return None
+        return self._termine()
+
+    def _triple(self) -> list[tuple[str, str, str]]:
+        triple = []
+        soggetto = self._termine_o_variabile()
+        while True:
+            predicato = self._termine_o_variabile()
+            while True:
+                triple.append((soggetto, predicato, self._termine_o_variabile()))
+                if not self._simbolo(","):
+                    break
+                self._prossimo()
+            if not self._simbolo(";"):
+                break
+            self._prossimo()
+            if self._simbolo(".") or self._simbolo("}"):
+                break
+        return triple
+
+    def _termine_o_variabile(self) -> str:
+        tok = self._guarda()
+        if tok is not None and tok[0] == "var":
+            self._prossimo()
+            return "?" + tok[1][1:]
+        return self._termine()
+
+    def _termine(self) -> str:
+        tipo, valore = self._prossimo()
+        if tipo == "iri":
+            return valore
+        if tipo == "nome":
+            if valore == "a":
+                return iri(RDF_TYPE)
+            if valore in ("true", "false"):
+                return letterale(valore, XSD_BOOLEAN)
+            if ":" not in valore:
+                raise ValueError(f"Parola chiave SPARQL non supportata: {valore}")
+            prefisso, _, locale = valore.partition(":")
+            if prefisso not in self.prefissi:
+                raise ValueError(f"Prefisso SPARQL non dichiarato: {prefisso}")
+            return iri(self.prefissi[prefisso] + locale)
+        if tipo == "numero":
+            if re.fullmatch(r"[+-]?\d+", valore):
+                return letterale(valore, f"{XSD}integer")
+            return letterale(valore, f"{XSD}double" if "e" in valore.lower() else f"{XSD}decimal")
+        if tipo == "stringa":
+            lessicale = rimuovi_escape(valore[1:-1])
+            if self._guarda() is not None and self._guarda()[0] == "lingua":
+                return letterale(lessicale, lingua=self._prossimo()[1][1:])
+            if self._simbolo("^^"):
+                self._prossimo()
+                return letterale(lessicale, self._termine()[1:-1])
+            return letterale(lessicale)
+        raise ValueError(f"Termine SPARQL non supportato: {valore}")
+
+    # --- Espressioni ---
+    def _espressione(self) -> tuple:
+        sinistra = self._congiunzione()
+        while self._simbolo("||"):
+            self._prossimo()
+            sinistra = ("or", sinistra, self._congiunzione())
+        return sinistra
+
+    def _congiunzione(self) -> tuple:
+        sinistra = self._unaria()
+        while self._simbolo("&&"):
+            self._prossimo()
+            sinistra = ("and", sinistra, self._unaria())
+        return sinistra
+
+    def _unaria(self) -> tuple:
+        if self._simbolo("!"):
+            self._prossimo()
+            return ("not", self._unaria())
+        return self._espressione_primaria()
+
+    def _espressione_primaria(self) -> tuple:
+        if self._simbolo("("):
+            self._prossimo()
+            espressione = self._espressione()
+            self._atteso(")")
+            return espressione
+        if self._parola("BOUND"):
+            self._prossimo()
+            self._atteso("(")
+            variabile = self._prossimo()[1][1:]
+            self._atteso(")")
+            return ("bound", variabile)
+        if self._guarda() is not None and self._guarda()[0] == "var":
+            return ("var", self._prossimo()[1][1:])
+        return ("const", self._termine())
+
+
+class MotoreSparqlLocale:
+    """
+    Valuta query SPARQL sullo StoreQuadrupleLocale e restituisce i binding
+    nello stesso formato JSON dell'endpoint (lista di dizionari variabile -> termine).
+    Le soluzioni intermedie legano le variabili agli ID interi dello store.
+    """
+
+    def __init__(self, store: StoreQuadrupleLocale):
+        self.store = store
+
+    def esegui(self, testo_query: str) -> list[dict]:
+        query = _ParserSparql(testo_query).analizza()
+        # Termini della query assenti dallo store: ID negativi locali alla query
+        self._termini_locali: dict[str, int] = {}
+        self._id_locali: dict[int, str] = {}
+
+        soluzioni = list(self._valuta_gruppo(query.where, [{}]))
+        if query.proiezioni is None:
+            variabili = []
+            for soluzione in soluzioni:
+                variabili.extend(v for v in soluzione if v not in variabili)
+            query.proiezioni = [(v, None) for v in variabili]
+
+        # Estensione con le espressioni del SELECT e conversione degli ID in termini
+        righe = []
+        for soluzione in soluzioni:
+            riga = {v: self._termine(i) for v, i in soluzione.items()}
+            for variabile, espressione in query.proiezioni:
+                if espressione is not None:
+                    riga[variabile] = _VERO if self._vero(espressione, soluzione) else _FALSO
+            righe.append(riga)
+
+        for variabile, crescente in reversed(query.ordinamento):
+            righe.sort(key=lambda r: _chiave_ordinamento(r.get(variabile)), reverse=not crescente)
+
+        risultati = []
+        visti = set()
+        binding_cache: dict[str, dict] = {}
+        for riga in righe:
+            proiettata = tuple(riga.get(v) for v, _ in query.proiezioni)
+            if query.distinct:
+                if proiettata in visti:
+                    continue
+                visti.add(proiettata)
+            binding = {}
+            for (variabile, _), termine in zip(query.proiezioni, proiettata):
+                if termine is not None:
+                    if termine not in binding_cache:
+                        binding_cache[termine] = termine_a_binding(termine)
+                    binding[variabile] = binding_cache[termine]
+            risultati.append(binding)
+
+        fine = None if query.limite is None else query.scarto + query.limite
+        return risultati[query.scarto:fine]
+
+    # --- Termini ---
+    def _id(self, termine: str) -> int:
+        id_termine = self.store.id_termine(termine)
+        if id_termine is not None:
+            return id_termine
+        if termine not in self._termini_locali:
+            id_locale = -1 - len(self._termini_locali)
+            self._termini_locali[termine] = id_locale
+            self._id_locali[id_locale] = termine
+        return self._termini_locali[termine]
+
+    def _termine(self, id_termine: int) -> str:
+        return self._id_locali[id_termine] if id_termine < 0 else self.store.termine(id_termine)
+
+    # --- Valutazione ---
+    def _valuta_gruppo(self, elementi: list[tuple], soluzioni: list[dict]) -> Iterator[dict]:
+        filtri = [e[1] for e in elementi if e[0] == "filter"]
+        # Tra due OPTIONAL i join sono commutativi: VALUES prima, così legano le variabili del BGP
+        segmento: list[tuple] = []
+        for elemento in elementi + [("fine", None)]:
+            tipo = elemento[0]
+            if tipo in ("bgp", "values"):
+                segmento.append(elemento)
+                continue
+            if tipo == "filter":
+                continue
+            segmento.sort(key=lambda e: e[0] != "values")
+            for tipo_seg, contenuto in segmento:
+                if tipo_seg == "values":
+                    soluzioni = list(self._unisci_values(contenuto, soluzioni))
+                else:
+                    soluzioni = list(self._valuta_bgp(contenuto, soluzioni))
+            segmento = []
+            if tipo == "optional":
+                soluzioni = list(self._left_join(elemento[1], soluzioni))
+
+        for soluzione in soluzioni:
+            if all(self._vero(f, soluzione) for f in filtri):
+                yield soluzione
+
+    def _left_join(self, gruppo: list[tuple], soluzioni: list[dict]) -> Iterator[dict]:
+        for soluzione in soluzioni:
+            estese = list(self._valuta_gruppo(gruppo, [soluzione]))
+            if estese:
+                yield from estese
+            else:
+                yield soluzione
+
+    def _unisci_values(self, values: tuple[list[str], list[list[str | None]]],
+                       soluzioni: list[dict]) -> Iterator[dict]:
+        variabili, righe = values
+        righe_id = [[None if t is None else self._id(t) for t in riga] for riga in righe]
+        for soluzione in soluzioni:
+            for riga in righe_id:
+                nuova = dict(soluzione)
+                compatibile = True
+                for variabile, valore in zip(variabili, riga):
+                    if valore is None:
+                        continue
+                    if nuova.setdefault(variabile, valore) != valore:
+                        compatibile = False
+                        break
+                if compatibile:
+                    yield nuova
+
+    def _valuta_bgp(self, triple: list[tuple[str, str, str]], soluzioni: list[dict]) -> Iterator[dict]:
+        if not soluzioni:
+            return
+        piano = self._pianifica(triple, set(soluzioni[0]))
+        for soluzione in soluzioni:
+            yield from self._unisci_pattern(piano, 0, soluzione)
+
+    def _pianifica(self, triple: list[tuple[str, str, str]], legate: set[str]) -> list[tuple]:
+        """
+        Ordina i pattern in modo greedy: prima quelli con più posizioni già legate
+        e, a parità, quelli con meno triple corrispondenti secondo gli indici.
+        """
+        piano = []
+        legate = set(legate)
+        rimanenti = [tuple(None if t.startswith("?") else self._id(t) for t in tripla) + (tripla,)
+                     for tripla in triple]
+
+        def costo(pattern):
+            s, p, o, tripla = pattern
+            posizioni_legate = sum(1 for t in tripla if not t.startswith("?") or t[1:] in legate)
+            stima = self.store.stima(*(None if x is None or x < 0 else x for x in (s, p, o)))
+            return -posizioni_legate, stima
+
+        while rimanenti:
+            migliore = min(rimanenti, key=costo)
+            rimanenti.remove(migliore)
+            piano.append(migliore)
+            legate.update(t[1:] for t in migliore[3] if t.startswith("?"))
+        return piano
+
+    def _unisci_pattern(self, piano: list[tuple], indice: int, soluzione: dict) -> Iterator[dict]:
+        if indice == len(piano):
+            yield soluzione
+            return
+        *costanti, tripla = piano[indice]
+        pattern = []
+        for costante, termine in zip(costanti, tripla):
+            valore = soluzione.get(termine[1:]) if costante is None else costante
+            if valore is not None and valore < 0:
+                return  # termine assente dallo store: nessuna corrispondenza
+            pattern.append(valore)
+        for corrispondenza in self.store.trova(*pattern):
+            nuova = soluzione
+            compatibile = True
+            for valore_pattern, termine, valore in zip(pattern, tripla, corrispondenza):
+                if valore_pattern is None:
+                    variabile = termine[1:]
+                    if nuova is soluzione:
+                        nuova = dict(soluzione)
+                    # Una variabile ripetuta nello stesso pattern deve legarsi allo stesso termine
+                    if nuova.setdefault(variabile, valore) != valore:
+                        compatibile = False
+                        break
+            if compatibile:
+                yield from self._unisci_pattern(piano, indice + 1, nuova)
+
+    def _vero(self, espressione: tuple, soluzione: dict) -> bool:
+        tipo = espressione[0]
+        if tipo == "or":
+            return self._vero(espressione[1], soluzione) or self._vero(espressione[2], soluzione)
+        if tipo == "and":
+            return self._vero(espressione[1], soluzione) and self._vero(espressione[2], soluzione)
+        if tipo == "not":
+            return not self._vero(espressione[1], soluzione)
+        if tipo == "bound":
+            return espressione[1] in soluzione
+        termine = self._termine(soluzione[espressione[1]]) if tipo == "var" and espressione[1] in soluzione \
+            else espressione[1] if tipo == "const" else None
+        return _valore_booleano_effettivo(termine)
+
+
+def _valore_booleano_effettivo(termine: str | None) -> bool:
+    """Effective Boolean Value di un termine (variabile non legata o IRI -> falso)."""
+    if termine is None or not termine.startswith('"'):
+        return False
+    valore, datatype, _ = scomponi_letterale(termine)
+    if datatype == XSD_BOOLEAN:
+        return valore == "true"
+    if datatype in _DATATYPE_NUMERICI:
+        try:
+            return float(valore) != 0
+        except ValueError:
+            return False
+    return valore != ""
+
+
+def _chiave_ordinamento(termine: str | None) -> tuple:
+    """Ordine SPARQL: non legato < blank node < IRI < letterali (numerici per valore)."""
+    if termine is None:
+        return (0,)
+    if termine.startswith("_:"):
+        return (1, termine[2:])
+    if termine.startswith("<"):
+        return (2, termine[1:-1])
+    valore, datatype, _ = scomponi_letterale(termine)
+    if datatype in _DATATYPE_NUMERICI:
+        try:
+            return (3, 0, float(valore), "")
+        except ValueError:
+            pass
+    return (3, 1, 0.0, valore)
+
+
+_store_locale: StoreQuadrupleLocale | None = None
+_lock_store = threading.Lock()
+
+
+def file_dataset_progetto() -> list[str]:
+    """File RDF prodotti dal progetto (arricchimenti, schema, allineamenti)."""
+    estensioni = (".nq", ".nt", ".ttl", ".nq.gz", ".nt.gz", ".ttl.gz")
+    return sorted(
+        os.path.join(DIR_DATASET_KG_LOCALE, nome) for nome in os.listdir(DIR_DATASET_KG_LOCALE)
+        if nome.endswith(estensioni)
+    )
+
+
+def file_kg_locale() -> list[str]:
+    """File caricati nel KG locale: i dataset del progetto più quelli indicati via ambiente."""
+    return file_dataset_progetto() + FILE_KG_LOCALE_AGGIUNTIVI
+
+
+def ottieni_store_locale() -> StoreQuadrupleLocale:
+    """Restituisce il quad store locale condiviso, caricandolo dai file alla prima richiesta."""
+    global _store_locale
+    with _lock_store:
+        if _store_locale is None:
+            store = StoreQuadrupleLocale()
+            for percorso in file_kg_locale():
+                store.carica_file(percorso)
+            logger.info(f"KG locale pronto: {len(store)} triple distinte")
+            _store_locale = store
+        return _store_locale
+
+
+def esegui_query_locale(query: str, store: StoreQuadrupleLocale | None = None) -> list[dict]:
+    """Esegue una query SPARQL sul KG locale (quello condiviso se non indicato)."""
+    return MotoreSparqlLocale(store if store is not None else ottieni_store_locale()).esegui(query)
@@ -0,0 +1,411 @@
+import gzip
+import re
+from typing import Iterable, Iterator
+
+from utils.registro_log import setup_logger
+
+logger = setup_logger()
+
+XSD = "http://www.w3.org/2001/XMLSchema#"
+RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+XSD_STRING = f"{XSD}string"
+
+# I termini RDF sono rappresentati come stringhe in forma N-Triples canonica:
+#   IRI        -> <https://...>
+#   letterale  -> "valore", "valore"@it, "valore"^^<datatype>
+#   blank node -> _:b0
+_RE_TERMINE_NQ = re.compile(
+    r'\s*(<[^>]*>|_:[^\s<"]+|"(?:[^"\\]|\\.)*"(?:@[A-Za-z][A-Za-z0-9-]*|\^\^<[^>]*>)?|\.)'
+)
+_RE_LETTERALE = re.compile(r'^"((?:[^"\\]|\\.)*)"(?:@([A-Za-z][A-Za-z0-9-]*)|\^\^<([^>]*)>)?$', re.S)
+_RE_ESCAPE = re.compile(r'\\(?:u([0-9A-Fa-f]{4})|U([0-9A-Fa-f]{8})|(.))', re.S)
+_ESCAPE_SEMPLICI = {"t": "\t", "b": "\b", "n": "\n", "r": "\r", "f": "\f", '"': '"', "'": "'", "\\": "\\"}
+
+
+def rimuovi_escape(testo: str) -> str:
+    """Converte le sequenze di escape N-Triples/Turtle (\\n, \\", \\uXXXX...) nei caratteri corrispondenti."""
+    if "\\" not in testo:
+        return testo
+
+    def _sostituisci(m: re.Match) -> str:
+        if m.group(1) or m.group(2):
+            return chr(int(m.group(1) or m.group(2), 16))
+        return _ESCAPE_SEMPLICI.get(m.group(3), m.group(3))
+
+    return _RE_ESCAPE.sub(_sostituisci, testo)
+
+
+def applica_escape(testo: str) -> str:
+    """Applica l'escape minimo richiesto per un letterale N-Triples."""
+    return (testo.replace("\\", "\\\\").replace('"', '\\"')
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+def iri(valore: str) -> str:
+    return f"<{valore}>"
+
+
+def letterale(valore: str, datatype: str | None = None, lingua: str | None = None) -> str:
+    """Costruisce un letterale in forma canonica (xsd:string esplicito equivale al letterale semplice)."""
+    base = f'"{applica_escape(valore)}"'
+    if lingua:
+        return f"{base}@{lingua.lower()}"
+    if datatype and datatype != XSD_STRING:
+        return f"{base}^^<{datatype}>"
+    return base
+
+
+def scomponi_letterale(termine: str) -> tuple[str, str | None, str | None]:
+    """Restituisce (valore senza escape, datatype, lingua) di un letterale in forma N-Triples."""
+    m = _RE_LETTERALE.match(termine)
+    if m is None:
+        raise ValueError(f"Letterale RDF non valido: {termine}")
+    return rimuovi_escape(m.group(1)), m.group(3), m.group(2)
+
+
+def canonizza(termine: str) -> str:
+    """Riporta un termine letto da file alla forma canonica usata nello store."""
+    if termine.startswith('"'):
+        valore, datatype, lingua = scomponi_letterale(termine)
+        return letterale(valore, datatype, lingua)
+    return termine
+
+
+def termine_a_binding(termine: str) -> dict:
+    """Converte un termine nel formato di binding dei risultati SPARQL JSON."""
+    if termine.startswith("<"):
+        return {"type": "uri", "value": termine[1:-1]}
+    if termine.startswith("_:"):
+        return {"type": "bnode", "value": termine[2:]}
+    valore, datatype, lingua = scomponi_letterale(termine)
+    binding = {"type": "literal", "value": valore}
+    if lingua:
+        binding["xml:lang"] = lingua
+    elif datatype:
+        binding["datatype"] = datatype
+    return binding
+
+
+def leggi_nquads(righe: Iterable[str]) -> Iterator[tuple[str, str, str, str | None]]:
+    """
+    Legge righe N-Quads (o N-Triples) e produce quadruple (s, p, o, grafo) in forma canonica.
+    Le righe malformate vengono saltate e segnalate nel log.
+    """
+    scartate = 0
+    for numero, riga in enumerate(righe, start=1):
+        riga = riga.strip()
+        if not riga or riga.startswith("#"):
+            continue
+        termini = []
+        pos = 0
+        while pos < len(riga):
+            m = _RE_TERMINE_NQ.match(riga, pos)
+            if m is None:
+                break
+            termini.append(m.group(1))
+            pos = m.end()
+        if pos < len(riga) or not termini or termini[-1] != "." or len(termini) not in (4, 5):
+            scartate += 1
+            logger.debug(f"Riga N-Quads malformata ({numero}) ignorata: {riga[:120]}")
+            continue
+        try:
+            s, p, o = termini[0], termini[1], canonizza(termini[2])
+        except ValueError:
+            scartate += 1
+            continue
+        yield s, p, o, termini[3] if len(termini) == 5 else None
+    if scartate:
+        logger.warning(f"Righe N-Quads malformate ignorate: {scartate}")
+
+
+class _LettoreTurtle:
+    """
+    Parser Turtle minimale sufficiente per gli schemi del progetto:
+    @prefix/PREFIX, nomi prefissati, 'a', liste di predicati (;) e oggetti (,),
+    letterali con lingua o datatype, numeri e booleani. Le triple finiscono nel grafo di default.
+    """
+
+    _RE_TOKEN = re.compile(r'''
+        \s*(?:
+            (?P<commento>\#[^\n]*)
+          | (?P<iri><[^>]*>)
+          | (?P<stringa>"""(?:[^"\\]|\\.|"(?!""))*"""|"(?:[^"\\\n]|\\.)*")
+          | (?P<lingua>@[A-Za-z][A-Za-z0-9-]*)
+          | (?P<datatype>\^\^)
+          | (?P<numero>[+-]?(?:\d+\.\d+|\.\d+|\d+)(?:[eE][+-]?\d+)?)
+          | (?P<blank>_:[\w-]+)
+          | (?P<nome>(?:[A-Za-z][\w-]*)?:(?:[\w:%-]|\.(?=[\w:%-]))*|[A-Za-z][\w-]*)
+          | (?P<punt>[.;,\[\]()])
+        )''', re.X)
+
+    def __init__(self, testo: str):
+        self.token: list[tuple[str, str]] = []
+        pos = 0
+        testo = testo.rstrip()
+        while pos < len(testo):
+            m = self._RE_TOKEN.match(testo, pos)
+            if m is None:
+                raise ValueError(f"Token Turtle non riconosciuto vicino a: {testo[pos:pos + 40]!r}")
+            pos = m.end()
+            if m.lastgroup != "commento":
+                self.token.append((m.lastgroup, m.group(m.lastgroup)))
+        self.pos = 0
+        self.prefissi: dict[str, str] = {}
+
+    def _prossimo(self) -> tuple[str, str]:
+        tok = self.token[self.pos]
+        self.pos += 1
+        return tok
+
+    def _guarda(self) -> tuple[str, str] | None:
+        return self.token[self.pos] if self.pos < len(self.token) else None
+
+    def _espandi(self, nome: str) -> str:
+        prefisso, _, locale = nome.partition(":")
+        if prefisso not in self.prefissi:
+            raise ValueError(f"Prefisso Turtle non dichiarato: {prefisso}")
+        return iri(self.prefissi[prefisso] + locale)
+
+    def _termine(self) -> str:
+        tipo, valore = self._prossimo()
+        if tipo == "iri":
+            return valore
+        if tipo == "blank":
+            return valore
+        if tipo == "nome":
+            if valore == "a":
+                return iri(RDF_TYPE)
+            if valore in ("true", "false"):
+                return letterale(valore, f"{XSD}boolean")
+            return self._espandi(valore)
+        if tipo == "numero":
+            if re.fullmatch(r"[+-]?\d+", valore):
+                return letterale(valore, f"{XSD}integer")
+            return letterale(valore, f"{XSD}double" if "e" in valore.lower() else f"{XSD}decimal")
+        if tipo == "stringa":
+            lessicale = valore[3:-3] if valore.startswith('"""') else valore[1:-1]
+            lessicale = rimuovi_escape(lessicale)
+            successivo = self._guarda()
+            if successivo and successivo[0] == "lingua":
+                self._prossimo()
+                return letterale(lessicale, lingua=successivo[1][1:])
+            if successivo and successivo[0] == "datatype":
+                self._prossimo()
+                return letterale(lessicale, self._termine()[1:-1])
+            return letterale(lessicale)
+        raise ValueError(f"Termine Turtle non supportato: {valore}")
+
+    def triple(self) -> Iterator[tuple[str, str, str]]:
+        while self._guarda() is not None:
+            tipo, valore = self._guarda()
+            if tipo == "lingua" and valore in ("@prefix", "@base") or tipo == "nome" and valore.upper() == "PREFIX":
+                self._prossimo()
+                nome = self._prossimo()[1]
+                self.prefissi[nome[:-1]] = self._prossimo()[1][1:-1]
+                if self._guarda() == ("punt", "."):
+                    self._prossimo()
+                continue
+
+            soggetto = self._termine()
+            while True:
+                predicato = self._termine()
+                while True:
+                    yield soggetto, predicato, self._termine()
+                    if self._guarda() != ("punt", ","):
+                        break
+                    self._prossimo()
+                separatore = self._prossimo()
+                if separatore == ("punt", ";"):
+                    # ';' finale prima del punto è ammesso
+                    if self._guarda() == ("punt", "."):
+                        self._prossimo()
+                        break
+                    continue
+                if separatore != ("punt", "."):
+                    raise ValueError(f"Separatore Turtle inatteso: {separatore[1]}")
+                break
+
+
+def leggi_turtle(testo: str) -> Iterator[tuple[str, str, str, None]]:
+    for s, p, o in _LettoreTurtle(testo).triple():
+        yield s, p, o, None
+
+
+def itera_quadruple_file(percorso: str) -> Iterator[tuple[str, str, str, str | None]]:
+    """
+    Legge un file .nq/.nt/.ttl (anche compresso .gz) e produce le quadruple in forma canonica.
+    N-Quads e N-Triples sono letti riga per riga; il Turtle viene letto per intero.
+    """
+    apri = gzip.open if percorso.endswith(".gz") else open
+    nome = percorso[:-3] if percorso.endswith(".gz") else percorso
+    with apri(percorso, "rt", encoding="utf-8") as f:
+        if nome.endswith(".ttl"):
+            yield from leggi_turtle(f.read())
+        else:
+            yield from leggi_nquads(f)
+
+
+class StoreQuadrupleLocale:
+    """
+    Quad store in memoria con termini internati come interi.
+
+    Ogni termine distinto riceve un ID; le triple (unione di tutti i grafi, come il grafo
+    di default di GraphDB) sono indicizzate in tre permutazioni annidate:
+      SPO: s -> p -> {o}    POS: p -> o -> {s}    OSP: o -> s -> {p}
+    così qualsiasi pattern con almeno un termine fissato è risolto con accessi diretti.
+    Per ogni grafo si conservano le sue triple, così da poterlo sostituire o eliminare.
+    """
+
+    def __init__(self):
+        self._id_termine: dict[str, int] = {}
+        self._termini: list[str] = []
+        self._spo: dict[int, dict[int, set[int]]] = {}
+        self._pos: dict[int, dict[int, set[int]]] = {}
+        self._osp: dict[int, dict[int, set[int]]] = {}
+        # grafo -> triple contenute; il grafo di default ha ID -1
+        self._grafi: dict[int, set[tuple[int, int, int]]] = {}
+        # Numero di grafi in cui compare ciascuna tripla
+        self._molteplicita: dict[tuple[int, int, int], int] = {}
+
+    # --- Termini ---
+    def interna(self, termine: str) -> int:
+        id_termine = self._id_termine.get(termine)
+        if id_termine is None:
+            id_termine = len(self._termini)
+            self._id_termine[termine] = id_termine
+            self._termini.append(termine)
+        return id_termine
+
+    def id_termine(self, termine: str) -> int | None:
+        """ID del termine, oppure None se non compare nello store."""
+        return self._id_termine.get(termine)
+
+    def termine(self, id_termine: int) -> str:
+        return self._termini[id_termine]
+
+    # --- Modifica ---
+    def aggiungi(self, s: str, p: str, o: str, grafo: str | None = None) -> bool:
+        """Aggiunge una quadrupla. Restituisce False se era già presente nel grafo."""
+        tripla = (self.interna(s), self.interna(p), self.interna(o))
+        id_grafo = -1 if grafo is None else self.interna(grafo)
+        triple_grafo = self._grafi.setdefault(id_grafo, set())
+        if tripla in triple_grafo:
+            return False
+        triple_grafo.add(tripla)
+        conteggio = self._molteplicita.get(tripla, 0)
+        self._molteplicita[tripla] = conteggio + 1
+        if conteggio == 0:
+            self._indicizza(*tripla)
+        return True
+
+    def aggiungi_tutte(self, quadruple: Iterable[tuple[str, str, str, str | None]]) -> int:
+        return sum(1 for s, p, o, g in quadruple if self.aggiungi(s, p, o, g))
+
+    def rimuovi_grafo(self, grafo: str | None) -> int:
+        """Elimina tutte le quadruple di un grafo e restituisce quante erano."""
+        id_grafo = -1 if grafo is None else self._id_termine.get(grafo)
+        triple_grafo = self._grafi.pop(id_grafo, set()) if id_grafo is not None else set()
+        for tripla in triple_grafo:
+            conteggio = self._molteplicita[tripla] - 1
+            if conteggio:
+                self._molteplicita[tripla] = conteggio
+            else:
+                del self._molteplicita[tripla]
+                self._deindicizza(*tripla)
+        return len(triple_grafo)
+
+    def carica_file(self, percorso: str) -> int:
+        """Carica un file .nq/.nt/.ttl (anche compresso .gz) e restituisce le quadruple aggiunte."""
+        aggiunte = self.aggiungi_tutte(itera_quadruple_file(percorso))
+        logger.info(f"Caricate {aggiunte} quadruple da {percorso}")
+        return aggiunte
+
+    # --- Interrogazione ---
+    def trova(self, s: int | None, p: int | None, o: int | None) -> Iterator[tuple[int, int, int]]:
+        """Triple (come ID) che corrispondono al pattern; None indica una variabile."""
+        if s is not None:
+            per_p = self._spo.get(s, {})
+            if p is not None:
+                oggetti = per_p.get(p, ())
+                if o is not None:
+                    if o in oggetti:
+                        yield s, p, o
+                    return
+                for ogg in oggetti:
+                    yield s, p, ogg
+                return
+            if o is not None:
+                for pred in self._osp.get(o, {}).get(s, ()):
+                    yield s, pred, o
+                return
+            for pred, oggetti in per_p.items():
+                for ogg in oggetti:
+                    yield s, pred, ogg
+            return
+        if p is not None:
+            per_o = self._pos.get(p, {})
+            if o is not None:
+                for sog in per_o.get(o, ()):
+                    yield sog, p, o
+                return
+            for ogg, soggetti in per_o.items():
+                for sog in soggetti:
+                    yield sog, p, ogg
+            return
+        if o is not None:
+            for sog, predicati in self._osp.get(o, {}).items():
+                for pred in predicati:
+                    yield sog, pred, o
+            return
+        for tripla in self._molteplicita:
+            yield tripla
+
+    def stima(self, s: int | None, p: int | None, o: int | None) -> int:
+        """Stima (per eccesso) del numero di triple che corrispondono al pattern."""
+        if s is not None:
+            per_p = self._spo.get(s, {})
+            if p is not None:
+                return len(per_p.get(p, ()))
+            return sum(len(v) for v in per_p.values())
+        if p is not None:
+            per_o = self._pos.get(p, {})
+            if o is not None:
+                return len(per_o.get(o, ()))
+            return sum(len(v) for v in per_o.values())
+        if o is not None:
+            return sum(len(v) for v in self._osp.get(o, {}).values())
+        return len(self._molteplicita)
+
+    def quadruple(self) -> Iterator[tuple[str, str, str, str | None]]:
+        for id_grafo, triple_grafo in self._grafi.items():
+            grafo = None if id_grafo == -1 else self._termini[id_grafo]
+            for s, p, o in triple_grafo:
+                yield self._termini[s], self._termini[p], self._termini[o], grafo
+
+    def grafi(self) -> list[str | None]:
+        return [None if g == -1 else self._termini[g] for g in self._grafi]
+
+    def numero_quadruple(self, grafo: str | None = ...) -> int:
+        """Numero di quadruple nello store, oppure nel solo grafo indicato."""
+        if grafo is ...:
+            return sum(len(t) for t in self._grafi.values())
+        id_grafo = -1 if grafo is None else self._id_termine.get(grafo)
+        return len(self._grafi.get(id_grafo, ()))
+
+    def __len__(self) -> int:
+        """Numero di triple distinte (unione dei grafi)."""
+        return len(self._molteplicita)
+
+    def _indicizza(self, s: int, p: int, o: int) -> None:
+        self._spo.setdefault(s, {}).setdefault(p, set()).add(o)
+        self._pos.setdefault(p, {}).setdefault(o, set()).add(s)
+        self._osp.setdefault(o, {}).setdefault(s, set()).add(p)
+
+    def _deindicizza(self, s: int, p: int, o: int) -> None:
+        for indice, a, b, c in ((self._spo, s, p, o), (self._pos, p, o, s), (self._osp, o, s, p)):
+            livello = indice[a]
+            livello[b].discard(c)
+            if not livello[b]:
+                del livello[b]
+                if not livello:
+                    del indice[a]